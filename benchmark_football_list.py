@@ -0,0 +1,406 @@
+# Script for benchmarking generate_football_list.py offline against a recorded set of pages
+from lxml import etree
+import copy
+import json
+import lxml.html
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import generate_football_list as football
+
+# Useful globals, bench_sizes are the player pool sizes each benchmark is run at. The recorded
+# pages live in corpus_dir (a synthetic set is committed, see Synthesize_Corpus) and every
+# benchmark run is appended to results_file, which is local to each machine and not committed
+# since timings from different machines can't be compared. A stage counts as a regression if it
+# is regression_ratio times slower than the last run and at least regression_floor seconds slower
+# (so tiny stages don't flag on noise).
+bench_sizes = [500, 2000, 10000]
+script_dir = os.path.dirname(os.path.abspath(__file__))
+corpus_dir = os.path.join(script_dir, "benchmark_pages")
+results_file = os.path.join(script_dir, "benchmark_results.jsonl")
+regression_ratio = 1.25
+regression_floor = 0.05
+yahoo_url = "https://football.fantasysports.yahoo.com/f1/draftanalysis"
+yahoo_page_url = "https://football.fantasysports.yahoo.com/f1/draftanalysis?tab=SD&pos=ALL&sort=DA_AP&count={}"
+
+# Settings for the synthetic corpus that is committed in benchmark_pages/ so the benchmarks run
+# without recording anything first. The corpus is generated from a fixed seed so regenerating
+# it gives the same pages. synthetic_positions is drawn from for each ADP spot, and
+# synthetic_stat_means is a typical week for each stat, scaled by each player's own skill.
+synthetic_players = 120
+synthetic_seed = 2020
+synthetic_positions = ["RB"] * 5 + ["WR"] * 5 + ["TE"] * 2 + ["QB"] * 2 + ["K", "DEF"]
+synthetic_first_names = ["Aaron", "Chris", "DJ", "Derrick", "Josh", "Justin", "Kenny", "Marcus", "Mike", "Tyler"]
+synthetic_last_names = ["Allen", "Brown", "Davis", "Green", "Harris", "Jackson", "Johnson", "Moore", "Smith", "Williams",
+                        "Beckham Jr.", "Mahomes II"]
+synthetic_stat_means = {"rush_att": 12, "rush_yds": 55, "rush_td": 0.4, "rec": 4, "rec_yds": 45, "rec_td": 0.3,
+                        "pass_cmp": 22, "pass_yds": 250, "pass_td": 1.6, "pass_int": 0.8, "xpm": 2.5, "fga": 2}
+
+# Stand-in server handler for the benchmarks. Scaled up Yahoo and PFR season table pages are
+# served from memory, and gamelog requests for the copies of a player (which have an "x<copy>"
+# suffix on their href) are served the recorded gamelog of the original player.
+class Replay_Handler(football.Local_Page_Handler):
+  pages = {}
+
+  def do_GET(self):
+    body = self.pages.get("https:/" + self.path)
+    if body is not None:
+      self.send_page(body)
+      return
+    self.path = re.sub("x\\d+(/gamelog/)", "\\1", self.path)
+    football.Local_Page_Handler.do_GET(self)
+
+# Reads a recorded page out of the corpus, or None if it wasn't recorded
+def Read_Recorded(url):
+  page_file = football.Fixture_Path(corpus_dir, url)
+  if not os.path.isfile(page_file):
+    return None
+  with open(page_file, "rb") as page:
+    return page.read()
+
+# Returns the body rows (rows with td cells) of a table in a recorded page as lxml elements
+def Recorded_Rows(text, table_id):
+  doc = lxml.html.fromstring(text.replace("<!--", "").replace("-->", ""))
+  tables = doc.xpath("//table[@id='{}']".format(table_id))
+  return tables[0].xpath(".//tr[td]") if tables else []
+
+def Table_Page(table_id, rows):
+  return "<html><body><table id=\"{}\"><tbody>{}</tbody></table></body></html>".format(table_id, "".join(rows))
+
+# Builds the Yahoo draft analysis pages and PFR season tables for a pool of the given size out of
+# the recorded pages. The recorded players are repeated as many times as needed, with a copy
+# number added to each copy's first name on Yahoo and in the PFR csk, and to its PFR href, so
+# every copy still resolves to its own (replayed) gamelog.
+def Build_Scaled_Pages(players):
+  recorded = []
+  page_url = yahoo_url
+  while True:
+    text = Read_Recorded(page_url)
+    rows = Recorded_Rows(text, "draftanalysistable") if text else []
+    if not rows:
+      break
+    recorded.extend(rows)
+    page_url = yahoo_page_url.format(len(recorded))
+  if not recorded:
+    print "No recorded Yahoo pages in {}, record some with \"record\" first.".format(corpus_dir)
+    sys.exit(1)
+
+  pages = {}
+  yahoo_rows = []
+  for spot in range(players):
+    row = recorded[spot % len(recorded)]
+    copy_num = spot // len(recorded)
+    if copy_num:
+      row = copy.deepcopy(row)
+      for name in row.xpath(".//a[contains(@class, 'name')]"):
+        tokens = (name.text or "").split(" ", 1)
+        name.text = tokens[0] + str(copy_num) + (" " + tokens[1] if len(tokens) > 1 else "")
+    yahoo_rows.append(etree.tostring(row))
+  for start in range(0, players, 50):
+    url = yahoo_url if start == 0 else yahoo_page_url.format(start)
+    pages[url] = Table_Page("draftanalysistable", yahoo_rows[start:start + 50])
+
+  copies = (players + len(recorded) - 1) // len(recorded)
+  for table_name in ["rushing", "receiving", "passing"]:
+    url = football.Season_Table_Url(table_name, football.curr_year - 1)
+    text = Read_Recorded(url)
+    if text is None:
+      continue
+    table_rows = []
+    for row in Recorded_Rows(text, table_name):
+      table_rows.append(etree.tostring(row))
+      for copy_num in range(1, copies):
+        row_copy = copy.deepcopy(row)
+        for cell in row_copy.xpath(".//td[@data-stat='player']"):
+          if "," in cell.get("csk", ""):
+            cell.set("csk", cell.get("csk") + str(copy_num))
+          for link in cell.xpath(".//a"):
+            link.set("href", link.get("href") + "x" + str(copy_num))
+        table_rows.append(etree.tostring(row_copy))
+    pages[url] = Table_Page(table_name, table_rows)
+  return pages
+
+# Times a single call, returning (seconds, result). Output from the pipeline is thrown away
+# while it runs since it prints every player.
+def Time_Call(func, *args):
+  stdout = sys.stdout
+  sys.stdout = open(os.devnull, "w")
+  try:
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+  finally:
+    sys.stdout.close()
+    sys.stdout = stdout
+
+# Runs every benchmark for one player pool size and returns a dict of stage -> seconds:
+#   - yahoo: Add_Yahoo_Stats over the scaled draft analysis pages
+#   - index_build/matching: building the PFR season table indexes and matching every player
+#   - gamelog_fetch/gamelog_parse: downloading the gamelogs from the stand-in and parsing them
+#   - scoring: ranking and scoring every position
+#   - write_csv: writing the raw and positional CSVs
+#   - end_to_end: a full run of the pipeline
+def Run_Size(players, work_dir):
+  football.total_players = players
+  football.pfr_indexes.clear()
+  Replay_Handler.pages = Build_Scaled_Pages(players)
+  timings = {}
+  table = football.PlayerTable()
+  timings["yahoo"], result = Time_Call(football.Add_Yahoo_Stats, table)
+
+  tables = {"RB": "rushing", "WR": "receiving", "TE": "receiving", "QB": "passing"}
+  timings["index_build"], indexes = Time_Call(lambda: dict((name, football.Load_PFR_Index(name)) for name in set(tables.values())))
+  rows = [row for pos in tables for row in table.rows(pos)]
+  def Match():
+    for row in rows:
+      table.pfr_href[row] = football.Find_PFR_Entry(indexes[tables[table.pos[row]]], table.names[row])
+  timings["matching"], result = Time_Call(Match)
+
+  urls = [football.Gamelog_Url(table.pfr_href[row], football.curr_year - 1) if table.pfr_href[row] else None for row in rows]
+  timings["gamelog_fetch"], pages = Time_Call(football.Fetch_Pages, [url for url in urls if url])
+  def Parse():
+    for row, url in zip(rows, urls):
+      table.set_stats(row, football.Gamelog_Stats(pages.get(url) if url else None, football.pos_stat_labels[table.pos[row]]))
+  timings["gamelog_parse"], result = Time_Call(Parse)
+
+  def Score():
+    for pos in tables:
+      football.Rank_Players(table, table.rows(pos), football.pos_stat_labels[pos])
+      football.Score_Players(table, table.rows(pos), football.pos_stat_labels[pos])
+  timings["scoring"], result = Time_Call(Score)
+  timings["write_csv"], result = Time_Call(lambda: [football.Write_CSV(table, sort_type) for sort_type in [0, 1]])
+
+  football.pfr_indexes.clear()
+  timings["end_to_end"], result = Time_Call(football.Run_Pipeline, 1, False, [])
+  for name in os.listdir(work_dir):
+    os.remove(os.path.join(work_dir, name))
+  return dict((stage, round(seconds, 4)) for stage, seconds in timings.items())
+
+# Returns the current git commit, if there is one
+def Git_Commit():
+  try:
+    return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=script_dir).strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+# Loads the last stored benchmark run, or None if there isn't one
+def Last_Result():
+  if not os.path.isfile(results_file):
+    return None
+  last = None
+  with open(results_file) as results:
+    for line in results:
+      if line.strip():
+        last = json.loads(line)
+  return last
+
+# Prints the timings for each size next to the last stored run, flagging regressions.
+# Returns the number of regressions found.
+def Compare_Results(result, previous):
+  regressions = 0
+  for size in sorted(result["sizes"], key=int):
+    print "{} players:".format(size)
+    old = (previous or {}).get("sizes", {}).get(size, {})
+    for stage, seconds in sorted(result["sizes"][size].items()):
+      line = "   {:<16} {:>9.3f}s".format(stage, seconds)
+      if stage in old:
+        line += "   (last {:.3f}s)".format(old[stage])
+        if seconds > old[stage] * regression_ratio and seconds - old[stage] > regression_floor:
+          line += "   REGRESSION"
+          regressions += 1
+      print line
+  return regressions
+
+# Records the corpus by running the real pipeline once with --record pointed at corpus_dir
+def Record_Corpus():
+  work_dir = tempfile.mkdtemp()
+  os.chdir(work_dir)
+  try:
+    football.record_dir = corpus_dir
+    football.Run_Pipeline(1, False, [])
+  finally:
+    os.chdir(script_dir)
+    shutil.rmtree(work_dir)
+  print "Recorded pages written to {}".format(corpus_dir)
+
+# Writes a page into the corpus for the URL it stands in for
+def Write_Corpus_Page(url, text):
+  page_file = football.Fixture_Path(corpus_dir, url)
+  if not os.path.isdir(os.path.dirname(page_file)):
+    os.makedirs(os.path.dirname(page_file))
+  with open(page_file, "wb") as page:
+    page.write(text)
+
+# Builds a PFR style table with a header row, the given body rows and an optional totals row in
+# the tfoot. PFR hides some tables in HTML comments, hidden does the same.
+def Stat_Table(table_id, rows, footer=None, hidden=False, table_class=None):
+  attrs = "id=\"{}\"".format(table_id) if table_id else "class=\"{}\"".format(table_class)
+  table = "<table {}><thead><tr><th>Rk</th></tr></thead><tbody>{}</tbody>{}</table>".format(
+    attrs, "".join(rows), "<tfoot>{}</tfoot>".format(footer) if footer else "")
+  return "<div><!--\n{}\n--></div>".format(table) if hidden else table
+
+# Builds a table row out of (data-stat, value) cells, the first one a th like on PFR
+def Stat_Row(cells):
+  return "<tr>" + "".join("<{0} data-stat=\"{1}\">{2}</{0}>".format("th" if spot == 0 else "td", key, value)
+                          for spot, (key, value) in enumerate(cells)) + "</tr>"
+
+# Builds a player's PFR gamelog for the given stat labels: 17 weeks with a bye week, every week
+# drawn around the player's skill, and a season totals row in the tfoot
+def Synthetic_Gamelog(rng, labels, skill):
+  bye = rng.randint(4, 14)
+  rows = []
+  totals = dict((label, 0) for label in labels)
+  for week in range(1, 18):
+    if week == bye:
+      continue
+    cells = [("game_num", len(rows) + 1), ("week_num", week)]
+    for label in labels:
+      if label == "fgm":
+        value = rng.randint(0, cells[-1][1])
+      else:
+        value = max(0, int(round(rng.gauss(synthetic_stat_means[label] * skill, synthetic_stat_means[label] * 0.5))))
+      totals[label] += value
+      cells.append((label, value))
+    rows.append(Stat_Row(cells))
+  footer = Stat_Row([("game_num", "")] + [(label, totals[label]) for label in labels])
+  return "<html><body>{}</body></html>".format(Stat_Table("stats", rows, footer))
+
+# Writes a small synthetic corpus that looks like the recorded one: the Yahoo draft analysis
+# pages, last season's PFR season tables and player gamelogs, team gamelogs for the defenses and
+# the Football Outsiders DVOA table. About one player in twelve is left out of the PFR tables so
+# the unmatched paths are exercised too. Any pages already in the corpus are replaced.
+def Synthesize_Corpus(players):
+  rng = random.Random(synthetic_seed)
+  year = football.curr_year - 1
+  if os.path.isdir(corpus_dir):
+    shutil.rmtree(corpus_dir)
+  teams = sorted(football.pfr_team_pages)
+  defenses = list(teams)
+  rng.shuffle(defenses)
+  names = set()
+  yahoo_rows = []
+  season_rows = {"rushing": [], "receiving": [], "passing": [], "kicking": []}
+  season_tables = {"RB": "rushing", "WR": "receiving", "TE": "receiving", "QB": "passing", "K": "kicking"}
+  for spot in range(players):
+    pos = rng.choice(synthetic_positions)
+    team = rng.choice(teams)
+    if pos == "DEF" and defenses:
+      team = defenses.pop()
+      name = team + " Defense"
+    else:
+      pos = "WR" if pos == "DEF" else pos
+      name = rng.choice(synthetic_first_names) + " " + rng.choice(synthetic_last_names)
+      while name in names:
+        name = rng.choice(synthetic_first_names) + " " + rng.choice(synthetic_last_names) + " " + rng.choice(synthetic_last_names)
+    names.add(name)
+    yahoo_rows.append("<tr><td><div><a class=\"Nowrap name F-link\" href=\"#\">{}</a> <span class=\"Fz-xxs\">{} - {}</span></div>"
+                      "</td><td class=\"Ta-end\"><div>{:.1f}</div></td><td class=\"Ta-end\"><div>{}%</div></td>"
+                      "<td class=\"Alt Last\"><div>{:.1f}</div></td></tr>".format(
+                        name, team, pos, spot + 1 + rng.random(), rng.randint(50, 100), spot // 12 + 1 + rng.random()))
+    if pos == "DEF" or spot % 12 == 11:
+      continue
+
+    tokens = name.replace("DJ", "D.J.").split(" ", 1)
+    href = "/players/{}/{}{}{:02d}".format(tokens[1][0], tokens[1][:4], re.sub("[^A-Za-z]", "", tokens[0])[:2], spot % 100)
+    pfr_team = football.team_aliases.get(team, [team])[0]
+    cells = [("ranker", len(season_rows[season_tables[pos]]) + 1)]
+    row = Stat_Row(cells + [("team", pfr_team), ("pos", pos)])
+    player = "<td data-stat=\"player\" csk=\"{},{}\"><a href=\"{}\">{} {}</a></td>".format(tokens[1], tokens[0], href, tokens[0], tokens[1])
+    if pos == "K":
+      row = row.replace("</tr>", "".join("<td data-stat=\"fgm{}\">{}</td>".format(bucket, rng.randint(0, 9)) for bucket in range(1, 6)) + "</tr>")
+    season_rows[season_tables[pos]].append(row.replace("</th>", "</th>" + player, 1))
+    labels = [label for label in football.pos_stat_labels[pos] if label in synthetic_stat_means]
+    if pos == "K":
+      labels.append("fgm")
+    Write_Corpus_Page(football.Gamelog_Url(href, year), Synthetic_Gamelog(rng, labels, rng.uniform(0.3, 1.4)))
+
+  for start in range(0, players, 50):
+    url = yahoo_url if start == 0 else yahoo_page_url.format(start)
+    Write_Corpus_Page(url, "<html><body>{}</body></html>".format(Stat_Table("draftanalysistable", yahoo_rows[start:start + 50])))
+  for table_name, rows in season_rows.items():
+    hidden = table_name != "rushing"
+    Write_Corpus_Page(football.Season_Table_Url(table_name, year), "<html><body>{}</body></html>".format(Stat_Table(table_name, rows, hidden=hidden)))
+
+  dvoa_rows = []
+  for team in teams:
+    url = football.Team_Gamelog_Url(team, year)
+    if team not in defenses:
+      games = []
+      opponents = []
+      for week in range(1, 17):
+        games.append(Stat_Row([("game_num", week), ("week_num", week), ("pts_def", rng.randint(0, 42))]))
+        opponents.append(Stat_Row([("game_num", week), ("week_num", week), ("pass_sacked", rng.randint(0, 6)),
+                                   ("pass_int", rng.randint(0, 3)), ("fumbles_lost", rng.randint(0, 2))]))
+      Write_Corpus_Page(url, "<html><body>{}{}</body></html>".format(Stat_Table("gamelog{}".format(year), games),
+                                                                    Stat_Table("gamelog_opp{}".format(year), opponents, hidden=True)))
+    dvoa_rows.append("<tr>" + "".join("<td>{}</td>".format(value) for value in
+                                      [len(dvoa_rows) + 1, football.team_aliases.get(team, [team])[0], "", "", "", "", "",
+                                       rng.randint(1, 32), "", rng.randint(1, 32)]) + "</tr>")
+  Write_Corpus_Page("https://www.footballoutsiders.com/stats/nfl/team-defense/" + str(year),
+                    "<html><body>{}</body></html>".format(Stat_Table(None, dvoa_rows, table_class="sticky-headers sortable stats")))
+  print "Synthetic pages for {} players written to {}".format(players, corpus_dir)
+
+# Function for if incorrect or "help" parameter is passed to the script
+def Print_Help():
+  print "Permitted arguments for this script:"
+  print "   > no arguments: run the benchmarks against the recorded pages and store the results"
+  print "   > \"record\": record a new set of pages from the live sites into benchmark_pages/"
+  print "   > \"synthetic\": regenerate the committed synthetic pages in benchmark_pages/"
+  print "   > \"--sizes <n,n,...>\": player pool sizes to benchmark (default 500,2000,10000)"
+  print "   > \"--no-save\": don't store the results of this run"
+  print "   > \"-h\": print this help message"
+
+# Main function that does a small argument check for a small set of options
+def main():
+  global bench_sizes
+  save = True
+  args = sys.argv[1:]
+  while args:
+    arg = args.pop(0)
+    if arg == "-h":
+      Print_Help()
+      return
+    elif arg == "record":
+      Record_Corpus()
+      return
+    elif arg == "synthetic":
+      Synthesize_Corpus(synthetic_players)
+      return
+    elif arg == "--sizes" and args and re.match("^\\d+(,\\d+)*$", args[0]):
+      bench_sizes = [int(size) for size in args.pop(0).split(",")]
+    elif arg == "--no-save":
+      save = False
+    else:
+      print "Invalid input."
+      Print_Help()
+      return
+
+  football.Start_Local_Server(corpus_dir, Replay_Handler)
+  work_dir = tempfile.mkdtemp()
+  os.chdir(work_dir)
+  result = {"time": int(time.time()), "commit": Git_Commit(), "sizes": {}}
+  try:
+    for size in bench_sizes:
+      print "Benchmarking {} players".format(size)
+      result["sizes"][str(size)] = Run_Size(size, work_dir)
+  finally:
+    os.chdir(script_dir)
+    shutil.rmtree(work_dir)
+
+  regressions = Compare_Results(result, Last_Result())
+  if save:
+    with open(results_file, "a") as results:
+      results.write(json.dumps(result, sort_keys=True) + "\n")
+    print "Results appended to {}".format(results_file)
+  if regressions:
+    print "{} stage(s) regressed since the last run".format(regressions)
+    sys.exit(1)
+
+# Entry point of script
+if __name__ == "__main__":
+  main()
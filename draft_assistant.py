@@ -0,0 +1,365 @@
+# Script for running a live draft assistant off of the player table saved by
+# generate_football_list.py
+import BaseHTTPServer
+import heapq
+import json
+import math
+import os
+import sys
+import threading
+import urlparse
+import numpy as np
+import generate_football_list as football
+
+# Useful globals, port is the local port the assistant listens on and num_teams/draft_slot
+# describe the draft (a snake draft, draft_slot is our 1-based spot in the first round).
+# Projected availability treats each player's draft spot as normally distributed around their
+# ADP, with a standard deviation of adp_sd_scale x ADP (but at least adp_sd_floor picks).
+port = 8765
+num_teams = 12
+draft_slot = 1
+adp_sd_scale = 0.2
+adp_sd_floor = 2.0
+
+# Returns the values players can be sorted by, as key -> array over the table rows (bigger is
+# better). "points" is average points per game, "risk" the simulated risk adjusted points and
+# "adp" is average draft position (negated so the earliest pick comes first). "vor" is season
+# points: VOR is season points minus the replacement level at the player's position, so within a
+# position it sorts the same way no matter how the replacement levels move during the draft.
+def Sort_Values(table):
+  return {"points": table.column("points", (3,))[:, 0].copy(),
+          "risk": table.column("sim_points", (6,))[:, 5].copy(),
+          "vor": table.column("points", (3,))[:, 0] * football.Load_League_Settings()["roster"]["season_weeks"],
+          "adp": -table.column("avg_pick")}
+
+# Returns the overall pick number of a draft slot in a round of a snake draft (both 1-based)
+def Slot_Pick(round_num, slot, teams):
+  if round_num % 2:
+    return (round_num - 1) * teams + slot
+  return round_num * teams - slot + 1
+
+# Returns the next pick for a draft slot at or after the given overall pick
+def Next_Pick(now, slot, teams):
+  round_num = (now - 1) // teams + 1
+  pick = Slot_Pick(round_num, slot, teams)
+  return pick if pick >= now else Slot_Pick(round_num + 1, slot, teams)
+
+# Returns the chance that a player with the given ADP is still on the board at a pick, given
+# that they are still on the board now
+def Available_Chance(adp, now, pick):
+  sd = max(adp_sd_floor, adp_sd_scale * adp)
+  survive_now = 0.5 * math.erfc((now - 0.5 - adp) / (sd * math.sqrt(2)))
+  survive_pick = 0.5 * math.erfc((pick - 0.5 - adp) / (sd * math.sqrt(2)))
+  return min(1.0, survive_pick / max(survive_now, 1e-12))
+
+# In-memory draft state. Every sort key has a max heap of (-value, row) per position plus one
+# over every player, built once at startup. Drafted players are dropped from the heaps lazily
+# when they reach the top, so pulling the best n available players is O(n log players). Undoing
+# a pick pushes the player back onto their heaps. Everything is done under a single lock since
+# requests are handled on their own threads.
+# VOR is kept as the replacement level at each position (see football.Player_Values), and a pick
+# or undo only redoes the levels of the positions it can move: the picked player's own, or every
+# flex position for a flex player since they share the flex spots. The levels only depend on the
+# top starting + flex spots + 1 available players at those positions, which come off the "vor"
+# heaps, so that is O((slots + flex) log players). Tiers only change at the picked player's
+# position (a level moving shifts every VOR there by the same amount), which is a k-means over
+# that position's players. The best "vor" players overall are merged from the best of each
+# position, and ADP gaps are worked out when a player is reported, O(players) each.
+class DraftBoard:
+  def __init__(self, table, teams, slot):
+    self.table = table
+    self.teams = teams
+    self.slot = slot
+    self.values = Sort_Values(table)
+    self.drafted = {}
+    self.drafted_vor = {}
+    self.picks = []
+    self.available = np.ones(table.size, dtype=bool)
+    self.pos_num = np.array([football.positions.index(pos) for pos in table.pos], dtype=int)
+    self.drafted_counts = np.zeros(len(football.positions), dtype=int)
+    self.levels = np.zeros(len(football.positions))
+    self.tiers = np.zeros(table.size, dtype=int)
+    self.lock = threading.Lock()
+    self.name_rows = {}
+    for row in range(table.size):
+      self.name_rows.setdefault(football.Normalize_Name(table.names[row]), []).append(row)
+    self.heaps = {}
+    for key, values in self.values.items():
+      for pos in football.positions + ["ALL"]:
+        if key == "vor" and pos == "ALL":
+          continue
+        rows = range(table.size) if pos == "ALL" else table.rows(pos)
+        heap = [(-values[row], row) for row in rows]
+        heapq.heapify(heap)
+        self.heaps[(key, pos)] = heap
+    for pos in football.positions:
+      self.update_levels(pos)
+      self.update_tiers(pos)
+
+  # Returns the rows of the best n players still available on a heap. Has to be called under the
+  # lock.
+  def top_rows(self, heap, n):
+    popped = []
+    rows = []
+    while heap and len(rows) < n:
+      entry = heapq.heappop(heap)
+      if entry[1] in self.drafted:
+        continue
+      popped.append(entry)
+      # An undone pick can leave a player on the heap twice
+      if entry[1] not in rows:
+        rows.append(entry[1])
+    for entry in popped:
+      heapq.heappush(heap, entry)
+    return rows
+
+  # Returns a player's VOR: season points over their position's replacement level, or what it
+  # was when they were drafted. Has to be called under the lock.
+  def vor(self, row):
+    if row in self.drafted_vor:
+      return self.drafted_vor[row]
+    return self.values["vor"][row] - self.levels[self.pos_num[row]]
+
+  # Redoes the replacement levels that a pick or undo at a position can move, from the best
+  # players left at those positions (see football.Replacement_Levels). Has to be called under
+  # the lock.
+  def update_levels(self, pos):
+    roster = football.Load_League_Settings()["roster"]
+    group = roster["flex_positions"] if pos in roster["flex_positions"] else [pos]
+    slots = np.array([self.teams * roster["starters"].get(name, 0) for name in football.positions])
+    extra = np.maximum(self.drafted_counts - slots, 0)
+    flex_slots = max(0, self.teams * roster["flex"] - sum(extra[football.positions.index(name)] for name in roster["flex_positions"]))
+    slots = np.maximum(slots - self.drafted_counts, 0)
+    rows = []
+    for name in group:
+      rows.extend(self.top_rows(self.heaps[("vor", name)], slots[football.positions.index(name)] + flex_slots + 1))
+    rows = np.array(rows, dtype=int)
+    levels = football.Replacement_Levels(self.values["vor"][rows], self.pos_num[rows], np.ones(len(rows), dtype=bool),
+                                         slots, flex_slots, roster["flex_positions"])
+    for name in group:
+      self.levels[football.positions.index(name)] = levels[football.positions.index(name)]
+
+  # Re-tiers the available players at a position by VOR (see football.Tier_Players). Has to be
+  # called under the lock.
+  def update_tiers(self, pos):
+    rows = self.table.rows(pos)
+    vor = self.values["vor"][rows] - self.levels[football.positions.index(pos)]
+    tier_counts = football.Load_League_Settings()["tiers"]
+    self.tiers[rows] = football.Tier_Players(vor, self.pos_num[rows], self.available[rows], tier_counts)
+
+  # Returns the rows of the best n players still available at a position (or "ALL") by a sort key
+  def best(self, key, pos, n):
+    if key not in self.values:
+      raise ValueError("unknown sort key " + key)
+    if pos not in football.positions + ["ALL"]:
+      raise ValueError("unknown position " + pos)
+    with self.lock:
+      if key != "vor" or pos != "ALL":
+        return self.top_rows(self.heaps[(key, pos)], n)
+      rows = [row for name in football.positions for row in self.top_rows(self.heaps[("vor", name)], n)]
+      return sorted(rows, key=lambda row: (-self.vor(row), row))[:n]
+
+  # Marks a player as drafted with the current pick and returns the pick number
+  def pick(self, row):
+    with self.lock:
+      if row in self.drafted:
+        raise ValueError(self.table.names[row] + " was already drafted")
+      self.drafted_vor[row] = self.vor(row)
+      self.picks.append(row)
+      self.drafted[row] = len(self.picks)
+      self.available[row] = False
+      self.drafted_counts[self.pos_num[row]] += 1
+      self.update_levels(self.table.pos[row])
+      self.update_tiers(self.table.pos[row])
+      return len(self.picks)
+
+  # Takes back the last pick and returns the player's row, or None if nothing has been picked
+  def undo(self):
+    with self.lock:
+      if not self.picks:
+        return None
+      row = self.picks.pop()
+      del self.drafted[row]
+      del self.drafted_vor[row]
+      self.available[row] = True
+      self.drafted_counts[self.pos_num[row]] -= 1
+      for key, values in self.values.items():
+        for pos in [self.table.pos[row], "ALL"]:
+          if (key, pos) in self.heaps:
+            heapq.heappush(self.heaps[(key, pos)], (-values[row], row))
+      self.update_levels(self.table.pos[row])
+      self.update_tiers(self.table.pos[row])
+      return row
+
+  # Finds a player's row by name, narrowed down by position and/or team if the name is shared
+  def find(self, name, pos=None, team=None):
+    rows = [row for row in self.name_rows.get(football.Normalize_Name(name), [])
+            if (pos is None or self.table.pos[row] == pos) and (team is None or self.table.teams[row] == team.upper())]
+    if not rows:
+      raise ValueError("no player named {}".format(name))
+    if len(rows) > 1:
+      raise ValueError("more than one player named {}, give a pos or team".format(name))
+    return rows[0]
+
+  # Returns our next pick at or after the current one
+  def next_pick(self):
+    with self.lock:
+      return Next_Pick(len(self.picks) + 1, self.slot, self.teams)
+
+  # Returns everything the API reports for a player. The ADP gap is the player's ADP rank minus
+  # their VOR rank among the available players (ties go to the earlier row, like the stable sorts
+  # in football.Player_Values), and 0 for drafted players.
+  def player(self, row, pick=None):
+    table = self.table
+    sim_points = table.column("sim_points", (6,))[row]
+    avg_pick = table.column("avg_pick")
+    with self.lock:
+      gap = 0
+      if self.available[row]:
+        vor = self.values["vor"] - self.levels[self.pos_num]
+        earlier = np.arange(table.size) < row
+        adp_rank = np.count_nonzero(self.available & ((avg_pick < avg_pick[row]) | ((avg_pick == avg_pick[row]) & earlier)))
+        vor_rank = np.count_nonzero(self.available & ((vor > vor[row]) | ((vor == vor[row]) & earlier)))
+        gap = adp_rank - vor_rank
+      info = {"row": row, "name": table.names[row], "team": table.teams[row], "pos": table.pos[row],
+              "pos_rank": table.pos_count[row], "avg_pick": float(avg_pick[row]),
+              "avg_round": float(table.column("avg_round")[row]), "points": float(self.values["points"][row]),
+              "floor": float(sim_points[0]), "ceiling": float(sim_points[2]), "risk_adjusted": float(sim_points[5]),
+              "vor": round(float(self.vor(row)), 2), "adp_gap": int(gap), "tier": int(self.tiers[row]),
+              "drafted": self.drafted.get(row)}
+      if pick is not None:
+        info["available_chance"] = round(Available_Chance(info["avg_pick"], len(self.picks) + 1, pick), 4)
+    return info
+
+  # Returns the current state of the draft
+  def state(self):
+    with self.lock:
+      return {"current_pick": len(self.picks) + 1, "next_pick": Next_Pick(len(self.picks) + 1, self.slot, self.teams),
+              "teams": self.teams, "slot": self.slot,
+              "picks": [{"pick": spot + 1, "name": self.table.names[row], "pos": self.table.pos[row]} for spot, row in enumerate(self.picks)]}
+
+# Request handler for the draft assistant API. Every response is JSON and connections are kept
+# alive (HTTP/1.1) so clients polling the board don't pay for a new connection every time.
+# Responses are buffered and sent in one write with Nagle turned off, otherwise the separate
+# header and body writes stall on delayed ACKs for ~40ms per request.
+#   GET /players?pos=RB&sort=points&n=10   best available players (pos defaults to ALL)
+#   GET /available?pos=RB&pick=30&n=10     the same, with each player's chance to last until
+#                                          the given pick (defaults to our next pick)
+#   GET /state                             current pick, our next pick and every pick so far
+#   POST /pick {"name": ..., "pos": ..., "team": ...} or {"row": ...}   marks a player drafted
+#   POST /undo                             takes back the last pick
+class Draft_Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+  wbufsize = -1
+  disable_nagle_algorithm = True
+  board = None
+
+  def do_GET(self):
+    parts = urlparse.urlsplit(self.path)
+    query = dict((key, values[-1]) for key, values in urlparse.parse_qs(parts.query).items())
+    try:
+      n = int(query.get("n", 10))
+      pos = query.get("pos", "ALL").upper()
+      if parts.path == "/players":
+        rows = self.board.best(query.get("sort", "points"), pos, n)
+        self.send_json(200, {"players": [self.board.player(row) for row in rows]})
+      elif parts.path == "/available":
+        pick = int(query.get("pick", self.board.next_pick()))
+        rows = self.board.best(query.get("sort", "points"), pos, n)
+        self.send_json(200, {"pick": pick, "players": [self.board.player(row, pick) for row in rows]})
+      elif parts.path == "/state":
+        self.send_json(200, self.board.state())
+      else:
+        self.send_json(404, {"error": "unknown path " + parts.path})
+    except ValueError as e:
+      self.send_json(400, {"error": str(e)})
+
+  def do_POST(self):
+    try:
+      body = self.rfile.read(int(self.headers.getheader("Content-Length") or 0))
+      request = json.loads(body) if body else {}
+      if not isinstance(request, dict):
+        raise ValueError("request body has to be a JSON object")
+      if self.path == "/pick":
+        for field in ["name", "pos", "team"]:
+          if request.get(field) is not None and not isinstance(request[field], basestring):
+            raise ValueError("{} has to be a string".format(field))
+        if "row" in request:
+          if isinstance(request["row"], bool) or not isinstance(request["row"], (int, long)):
+            raise ValueError("row has to be a whole number")
+          row = request["row"]
+          if not 0 <= row < self.board.table.size:
+            raise ValueError("no player in row {}".format(row))
+        else:
+          row = self.board.find(request.get("name", ""), request.get("pos"), request.get("team"))
+        pick = self.board.pick(row)
+        self.send_json(200, {"pick": pick, "player": self.board.player(row), "next_pick": self.board.next_pick()})
+      elif self.path == "/undo":
+        row = self.board.undo()
+        self.send_json(200, {"undone": self.board.player(row) if row is not None else None})
+      else:
+        self.send_json(404, {"error": "unknown path " + self.path})
+    except ValueError as e:
+      self.send_json(400, {"error": str(e)})
+
+  def send_json(self, status, data):
+    body = json.dumps(data)
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+# Function for if incorrect or "help" parameter is passed to the script
+def Print_Help():
+  print "Permitted arguments for this script:"
+  print "   > no arguments: serve the draft assistant for the last run of generate_football_list.py"
+  print "   > \"--state <file>\": load the player table from <file> instead of this year's saved run"
+  print "   > \"--port <n>\": port to listen on (default 8765)"
+  print "   > \"--teams <n>\": number of teams in the draft (default 12)"
+  print "   > \"--slot <n>\": our spot in the first round of the draft (default 1)"
+  print "   > \"-h\": print this help message"
+
+# Main function that does a small argument check for a small set of options
+def main():
+  global port, num_teams, draft_slot
+  state_file = football.State_File()
+  args = sys.argv[1:]
+  while args:
+    arg = args.pop(0)
+    if arg == "-h":
+      Print_Help()
+      return
+    elif arg == "--state" and args:
+      state_file = args.pop(0)
+    elif arg == "--port" and args and args[0].isdigit():
+      port = int(args.pop(0))
+    elif arg == "--teams" and args and args[0].isdigit():
+      num_teams = int(args.pop(0))
+    elif arg == "--slot" and args and args[0].isdigit():
+      draft_slot = int(args.pop(0))
+    else:
+      print "Invalid input."
+      Print_Help()
+      return
+
+  if not os.path.isfile(state_file):
+    print "No saved player table at {}, run generate_football_list.py first.".format(state_file)
+    return
+  if not 1 <= draft_slot <= num_teams:
+    print "Draft slot has to be between 1 and the number of teams."
+    return
+  Draft_Handler.board = DraftBoard(football.PlayerTable.load(state_file), num_teams, draft_slot)
+  server = football.Local_Server(("127.0.0.1", port), Draft_Handler)
+  print "Draft assistant for {} players listening on http://127.0.0.1:{}".format(Draft_Handler.board.table.size, port)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    server.server_close()
+
+# Entry point of script
+if __name__ == "__main__":
+  main()
@@ -1,157 +1,816 @@
 # Script for generating a CSV list of players for fantasy football
-from bs4 import BeautifulSoup
-from bs4 import SoupStrainer
+from lxml import etree
+import BaseHTTPServer
+import collections
+import contextlib
+import cProfile
+import cPickle
 import csv
+import difflib
+import email.utils
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
 import time
 import numpy as np
 import os
+import Queue
+import random
 import requests
+import requests.adapters
 import re
+import SocketServer
 import struct
 import sys
+import threading
 import time
 import unidecode
+import urlparse
+
+# pyarrow is only needed for the Arrow and Parquet exports
+try:
+  import pyarrow
+  import pyarrow.parquet
+except ImportError:
+  pyarrow = None
 
 # Useful globals, curr_year determines which year's stats are pulled
 # and total_players caps the player list to something useful for a 15 round draft.
 curr_year = 2020
 total_players = 500
-pos_dict = {'RB':1, 'WR':1, 'TE':1, 'QB':1, 'K':1, 'DEF':1}
+positions = ['RB', 'WR', 'TE', 'QB', 'K', 'DEF']
 rb_stat_labels = ["rush_att", "rush_yds","rec", "rec_yds", "rush_td"]
 wr_stat_labels = ["rec", "rec_yds", "rec_td"]
 qb_stat_labels = ["pass_cmp", "pass_yds", "pass_td", "pass_int"]
-player_list = []
-sorted_player_dict = {'RB':[], 'WR':[], 'TE':[], 'QB':[], 'K':[], 'DEF':[]}
-
-# Generic class to define a player when parsing and storing stats
-class Player:
-  def __init__ (self):
-    self.name = ""
-    self.team = ""
-    self.position = ""
-    self.avg_pick = 0.0
-    self.avg_round = 0.0
-    self.pos_count = ""
-    self.pfr_stats = None
-    self.pfr_ranks = None
-    self.points = [0.0, 0.0]
-
-  def set_name(self, name):
-    self.name = name
-  def set_team(self, team):
-    self.team = team.upper()
-  def set_pick(self, pick):
-    self.avg_pick = pick
-  def set_round(self, avg_round):
-    self.avg_round = avg_round
-  def set_pos(self, pos):
-    self.position = pos
-    self.pos_count = pos + str(pos_dict[pos])
-    pos_dict[pos] += 1
-  def set_pfr_stats(self, stats):
-    self.pfr_stats = stats
-  def set_pfr_ranks(self, ranks):
-    self.pfr_ranks = ranks
-  def set_points(self, points):
-    self.points = points
-
-  def get_pos(self):
-    return self.position
-  def get_name(self):
-    return self.name
-  def get_pfr_stats(self):
-    return self.pfr_stats
-  def get_pfr_ranks(self):
-    return self.pfr_ranks
-  def get_points(self):
-    return self.points
-
-  def print_all(self):
-    print("name: %s, avg pick: %.02f, avg round: %.02f, position: %s, pos count: %s" % (self.name, self.avg_pick, self.avg_round, self.position, self.pos_count))
-
-# Defenses are treated as a special case so they have been given their own class
-# instead of a child class of player.
-class Defense:
-  def __init__ (self):
-    self.name = ""
-    self.team = ""
-    self.avg_pick = 0.0
-    self.avg_round = 0.0
-    self.pos_count = ""
-    self.total_dvoa = None
-    self.run_dvoa = None
-    self.pass_dvoa = None
-
-  def set_name(self, name):
-    self.name = name
-  def set_team(self, team):
-    self.team = team.upper()
-  def set_pick(self, pick):
-    self.avg_pick = pick
-  def set_round(self, avg_round):
-    self.avg_round = avg_round
-  def set_pos(self, pos):
-    self.pos_count = pos + str(pos_dict[pos])
-    pos_dict[pos] += 1
-  def set_dvoa(self, ranks):
-    self.total_dvoa = ranks[0]
-    self.pass_dvoa = ranks[1]
-    self.run_dvoa = ranks[2]
-
-  def get_pos(self):
-    return "DEF"
-  def get_team(self):
-    return self.team
-  def get_name(self):
-    return self.name
-  def get_dvoa(self):
-    return [self.total_dvoa, self.pass_dvoa, self.run_dvoa]
-
-  def print_all(self):
-    print("name: %s, avg pick: %.02f, avg round: %.02f, position: %s, pos count: %s" % (self.name, self.avg_pick, self.avg_round, self.position, self.pos_count))
+k_stat_labels = ["xpm", "fgm", "fga", "fg_dist_pts"]
+def_stat_labels = ["pts_def", "def_sacks", "def_to", "pa_pts"]
+pos_stat_labels = {'RB':rb_stat_labels, 'WR':wr_stat_labels, 'TE':wr_stat_labels, 'QB':qb_stat_labels, 'K':k_stat_labels, 'DEF':def_stat_labels}
+all_stat_labels = [label for pos, labels in sorted(pos_stat_labels.items()) for label in labels]
+all_stat_labels = sorted(set(all_stat_labels), key=all_stat_labels.index)
+
+# Fetch settings for the gamelog pages. fetch_workers bounds the thread pool, host_limit caps
+# the number of requests in flight to any one host and polite_delay spaces out requests to the
+# same host (in seconds) so PFR doesn't get hammered. local_base is set when running against
+# the local stand-in server instead of the real sites. fetch_hosts are the sites pages come from.
+fetch_hosts = ["football.fantasysports.yahoo.com", "www.pro-football-reference.com", "www.footballoutsiders.com"]
+fetch_workers = 8
+host_limit = 4
+polite_delay = 0.5
+local_base = None
+record_dir = None
+
+# Retry settings for every request. fetch_timeout is the (connect, read) timeout in seconds.
+# Failed connections, timeouts and the statuses in retry_statuses are retried up to
+# fetch_retries times with exponential backoff starting at backoff_base seconds, or after the
+# server's Retry-After (capped at max_retry_wait seconds) when it sends one.
+fetch_timeout = (10, 30)
+fetch_retries = 4
+backoff_base = 1.0
+max_retry_wait = 300
+retry_statuses = (429, 500, 502, 503, 504)
+
+# Monte Carlo settings. sim_count is the number of weeks simulated for every player (0 turns the
+# simulation off) and sim_batch caps how many draws (players x sims) are held in memory at once.
+sim_count = 100000
+sim_batch = 1000000
+sim_headers = ["Floor (p10)", "Median (p50)", "Ceiling (p90)", "Boom Rate", "Bust Rate", "Risk Adj Points"]
+
+# On-disk response cache. Page bodies are stored by the sha1 of their content and an index maps
+# each URL to its body and HTTP validators. cache_max_bytes bounds the size of the stored bodies,
+# with the least recently used URLs evicted first. In offline mode pages are only ever served
+# from the cache. Alongside the index, cache_lru has every URL in least recently used order,
+# cache_bodies each stored body's size and how many URLs share it, and cache_bytes the size of
+# all the stored bodies, so storing and evicting a page never has to scan the whole index.
+cache_dir = os.path.join(os.getcwd(), ".football_cache")
+cache_max_bytes = 512 * 1024 * 1024
+cache_index = None
+cache_lru = collections.OrderedDict()
+cache_bodies = {}
+cache_bytes = 0
+cache_lock = threading.Lock()
+offline = False
+
+# Collects timing and request numbers for a run: wall/CPU time per pipeline stage, request count,
+# bytes and latency per host, cache outcomes and time spent parsing pages. Everything is recorded
+# under a lock since the fetch threads report into it. report() summarizes it all as a dict that
+# can be dumped as JSON.
+class RunMetrics:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.stages = []
+    self.hosts = {}
+    self.cache = {"hit": 0, "miss": 0, "revalidated": 0, "offline_miss": 0}
+    self.parse = {"pages": 0, "rows": 0, "seconds": 0.0}
+
+  @contextlib.contextmanager
+  def stage(self, name):
+    wall = time.time()
+    cpu = sum(os.times()[:2])
+    try:
+      yield
+    finally:
+      with self.lock:
+        self.stages.append({"stage": name, "wall_seconds": round(time.time() - wall, 4),
+                            "cpu_seconds": round(sum(os.times()[:2]) - cpu, 4)})
+
+  def record_request(self, url, status, nbytes, latency):
+    host = urlparse.urlsplit(url).netloc
+    with self.lock:
+      stats = self.hosts.setdefault(host, {"requests": 0, "errors": 0, "retries": 0, "bytes": 0, "latencies": []})
+      stats["requests"] += 1
+      stats["errors"] += 0 if status in (200, 304) else 1
+      stats["bytes"] += nbytes
+      stats["latencies"].append(latency)
+
+  def record_retry(self, url):
+    host = urlparse.urlsplit(url).netloc
+    with self.lock:
+      stats = self.hosts.setdefault(host, {"requests": 0, "errors": 0, "retries": 0, "bytes": 0, "latencies": []})
+      stats["retries"] += 1
+
+  def record_cache(self, outcome):
+    with self.lock:
+      self.cache[outcome] += 1
+
+  def record_parse(self, seconds, rows):
+    with self.lock:
+      self.parse["pages"] += 1
+      self.parse["rows"] += rows
+      self.parse["seconds"] += seconds
+
+  def merge_parse(self, parse):
+    with self.lock:
+      for key, value in parse.items():
+        self.parse[key] += value
+
+  def report(self):
+    hosts = {}
+    for host, stats in self.hosts.items():
+      latencies = np.array(stats["latencies"])
+      hosts[host] = {"requests": stats["requests"], "errors": stats["errors"], "retries": stats["retries"], "bytes": stats["bytes"]}
+      for pct in [50, 90, 99]:
+        hosts[host]["latency_p{}".format(pct)] = round(float(np.percentile(latencies, pct)), 4) if len(latencies) else None
+    lookups = self.cache["hit"] + self.cache["revalidated"] + self.cache["miss"] + self.cache["offline_miss"]
+    cache = dict(self.cache)
+    cache["hit_rate"] = round(float(self.cache["hit"] + self.cache["revalidated"]) / lookups, 4) if lookups else None
+    parse = dict(self.parse)
+    parse["seconds_per_page"] = round(self.parse["seconds"] / self.parse["pages"], 6) if self.parse["pages"] else None
+    return {"stages": self.stages, "hosts": hosts, "cache": cache, "parse": parse}
+
+  def print_summary(self):
+    print "Stage timings:"
+    for stage in self.stages:
+      print "   {:<24} wall {:>8.2f}s  cpu {:>8.2f}s".format(stage["stage"], stage["wall_seconds"], stage["cpu_seconds"])
+    for host, stats in sorted(self.report()["hosts"].items()):
+      print "   {}: {} requests, {} retries, {} bytes, p50 {}s, p90 {}s".format(host, stats["requests"], stats["retries"], stats["bytes"], stats["latency_p50"], stats["latency_p90"])
+
+run_metrics = RunMetrics()
+
+# Columnar store for every player in a run. Each field is a column indexed by row number: the
+# strings are kept in lists and the numbers in numpy arrays, which grow by doubling as players
+# are added. Numeric columns are made on first use with column(), ie "avg_pick", "points"
+# (avg total, avg without TDs, volatility) and "<label>_mean", "<label>_std", "<label>_rank" for
+# each stat label. Each position keeps the rows of its players in ADP order so positional views
+# are just index arrays into the columns. weeks holds each player's weekly stat lines from last
+# season, and current_weeks the ones from this season so far as a dict of week key -> stat line
+# (filled in by weekly updates, see Week_Key).
+# A new table is made for each run so nothing is shared between runs in the same process.
+class PlayerTable:
+  def __init__(self):
+    self.size = 0
+    self.capacity = 0
+    self.names = []
+    self.teams = []
+    self.pos = []
+    self.pos_count = []
+    self.pfr_href = []
+    self.dvoa = []
+    self.weeks = []
+    self.current_weeks = []
+    self.columns = {}
+    self.pos_rows = dict((pos, []) for pos in positions)
+    self.pos_views = {}
+
+  # Returns a view of a numeric column for the current rows, making it if it doesn't exist yet.
+  # shape is the shape of a single row's entry.
+  def column(self, name, shape=(), dtype=float):
+    if name not in self.columns:
+      self.columns[name] = np.zeros((self.capacity,) + shape, dtype=dtype)
+    return self.columns[name][:self.size]
+
+  # Appends a player and returns their row number. Positional rank (ie "RB12") is the player's
+  # order within their position.
+  def add_player(self, name, team, pos, avg_pick, avg_round):
+    if self.size == self.capacity:
+      self.capacity = max(64, self.capacity * 2)
+      for name_key, values in self.columns.items():
+        grown = np.zeros((self.capacity,) + values.shape[1:], dtype=values.dtype)
+        grown[:self.size] = values[:self.size]
+        self.columns[name_key] = grown
+    row = self.size
+    self.size += 1
+    self.names.append(name)
+    self.teams.append(team.upper())
+    self.pos.append(pos)
+    self.pos_rows[pos].append(row)
+    self.pos_count.append(pos + str(len(self.pos_rows[pos])))
+    self.pfr_href.append(None)
+    self.dvoa.append(None)
+    self.weeks.append(None)
+    self.current_weeks.append(None)
+    self.pos_views.pop(pos, None)
+    self.column("avg_pick")[row] = avg_pick
+    self.column("avg_round")[row] = avg_round
+    return row
+
+  # Returns the rows of every player at a position as an index array
+  def rows(self, pos):
+    if pos not in self.pos_views:
+      self.pos_views[pos] = np.array(self.pos_rows[pos], dtype=int)
+    return self.pos_views[pos]
+
+  # Stores a dict of label -> [mean, std] for a player
+  def set_stats(self, row, stats):
+    for label, stat in stats.items():
+      self.column(label + "_mean")[row] = stat[0]
+      self.column(label + "_std")[row] = stat[1]
+
+  # Returns rows x labels arrays of the means and standard deviations for the given rows
+  def stat_matrices(self, rows, labels):
+    means = np.zeros((len(rows), len(labels)))
+    stds = np.zeros((len(rows), len(labels)))
+    for col, label in enumerate(labels):
+      means[:, col] = self.column(label + "_mean")[rows]
+      stds[:, col] = self.column(label + "_std")[rows]
+    return means, stds
+
+  # Copies everything known about another table's player except their ADP, which is what
+  # changes between runs
+  def copy_player(self, row, other, other_row):
+    self.pfr_href[row] = other.pfr_href[other_row]
+    self.dvoa[row] = other.dvoa[other_row]
+    self.weeks[row] = other.weeks[other_row]
+    self.current_weeks[row] = other.current_weeks[other_row]
+    for name, values in other.columns.items():
+      if name not in ("avg_pick", "avg_round"):
+        self.column(name, values.shape[1:], values.dtype)[row] = values[other_row]
+
+  # Saves the table to disk so a later run can pick up where this one left off
+  def save(self, path):
+    state = {"names": self.names, "teams": self.teams, "pos": self.pos, "pfr_href": self.pfr_href,
+             "dvoa": self.dvoa, "weeks": self.weeks, "current_weeks": self.current_weeks, "avg_pick": list(self.column("avg_pick")), "avg_round": list(self.column("avg_round")),
+             "columns": dict((name, values[:self.size]) for name, values in self.columns.items())}
+    with open(path + ".tmp", "wb") as state_file:
+      cPickle.dump(state, state_file, cPickle.HIGHEST_PROTOCOL)
+    os.rename(path + ".tmp", path)
+
+  # Loads a table saved with save()
+  @staticmethod
+  def load(path):
+    with open(path, "rb") as state_file:
+      state = cPickle.load(state_file)
+    table = PlayerTable()
+    for row in range(len(state["names"])):
+      table.add_player(state["names"][row], state["teams"][row], state["pos"][row], state["avg_pick"][row], state["avg_round"][row])
+    table.pfr_href = state["pfr_href"]
+    table.dvoa = state["dvoa"]
+    table.weeks = state.get("weeks", [None] * table.size)
+    table.current_weeks = state.get("current_weeks", [None] * table.size)
+    for name, values in state["columns"].items():
+      table.column(name, values.shape[1:], values.dtype)[:] = values
+    return table
+
+  def print_all(self, row):
+    print "name: %s, avg pick: %.02f, avg round: %.02f, position: %s, pos count: %s" % (self.names[row], self.column("avg_pick")[row], self.column("avg_round")[row], self.pos[row], self.pos_count[row])
+
+# Maps a real page URL to a file path under the given directory, ie:
+#   https://www.pro-football-reference.com/players/M/McCaCh01/gamelog/2019/
+#     -> <root>/www.pro-football-reference.com/players/M/McCaCh01/gamelog/2019/index.html
+# Query strings are folded into the file name so the paged Yahoo URLs get their own files.
+def Fixture_Path(root, url):
+  parts = urlparse.urlsplit(url)
+  rel = parts.netloc + parts.path
+  if rel.endswith("/"):
+    rel += "index.html"
+  if parts.query:
+    rel += "_" + re.sub("[^A-Za-z0-9=]+", "_", parts.query)
+  return os.path.join(root, *rel.split("/"))
+
+# Request handler for the local stand-in server. The requested path is "/<host><path>" so the
+# original URL can be rebuilt and looked up with Fixture_Path.
+class Local_Page_Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+  root = None
+
+  def do_GET(self):
+    page_file = Fixture_Path(self.root, "https:/" + self.path)
+    if not os.path.isfile(page_file):
+      self.send_error(404)
+      return
+    with open(page_file, "rb") as page:
+      self.send_page(page.read())
+
+  def send_page(self, body):
+    self.send_response(200)
+    self.send_header("Content-Type", "text/html; charset=utf-8")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+class Local_Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+
+# Starts a local HTTP server on a background thread that serves saved pages out of root_dir
+# in place of Yahoo, PFR and Football Outsiders. Used to run the script offline, so there is
+# no need for the politeness delay. A subclass of Local_Page_Handler can be passed in to serve
+# pages some other way (ie the benchmarks' scaled up page sets).
+def Start_Local_Server(root_dir, handler=Local_Page_Handler):
+  global local_base, polite_delay
+  polite_delay = 0.0
+  handler.root = root_dir
+  server = Local_Server(("127.0.0.1", 0), handler)
+  thread = threading.Thread(target=server.serve_forever)
+  thread.daemon = True
+  thread.start()
+  local_base = "http://127.0.0.1:{}".format(server.server_address[1])
+  print "Serving pages from {} at {}".format(root_dir, local_base)
+  return server
+
+# Rewrites a URL to point at the local stand-in server when one is running
+def Local_Url(url):
+  if local_base is None:
+    return url
+  parts = urlparse.urlsplit(url)
+  local_url = local_base + "/" + parts.netloc + parts.path
+  if parts.query:
+    local_url += "?" + parts.query
+  return local_url
+
+# Returns how long (in seconds) a cached copy of a page stays fresh, or None if it never expires.
+# Yahoo ADP moves constantly during draft season so it is refreshed hourly. Anything from a past
+# season (season tables, gamelogs, DVOA) is final and is kept indefinitely.
+def Cache_TTL(url):
+  if "yahoo.com" in url:
+    return 60 * 60
+  season = re.search("/(\d{4})(/|\.htm|$)", urlparse.urlsplit(url).path)
+  if season and int(season.group(1)) < curr_year:
+    return None
+  return 6 * 60 * 60
+
+def Cache_Body_Path(digest):
+  return os.path.join(cache_dir, digest[:2], digest)
+
+# Loads the cache index from disk the first time it is needed and builds the LRU order and body
+# sizes from it
+def Load_Cache():
+  global cache_index, cache_bytes
+  with cache_lock:
+    if cache_index is None:
+      index_file = os.path.join(cache_dir, "index.json")
+      index = {}
+      if os.path.isfile(index_file):
+        with open(index_file) as index_json:
+          index = json.load(index_json)
+      cache_index = {}
+      cache_lru.clear()
+      cache_bodies.clear()
+      cache_bytes = 0
+      for url in sorted(index, key=lambda key: index[key]["used"]):
+        Add_Cache_Entry(url, index[url])
+  return cache_index
+
+# Adds a URL's entry to the cache index, replacing any entry it already had, as the most recently
+# used. Has to be called under cache_lock.
+def Add_Cache_Entry(url, entry):
+  global cache_bytes
+  if url in cache_index:
+    Drop_Cache_Entry(url)
+  cache_index[url] = entry
+  cache_lru[url] = None
+  body = cache_bodies.setdefault(entry["sha1"], {"size": entry["size"], "urls": 0})
+  body["urls"] += 1
+  if body["urls"] == 1:
+    cache_bytes += body["size"]
+
+# Removes a URL's entry from the cache index. Returns the sha1 of its body if no other URL shares
+# it, so the body can be removed too. Has to be called under cache_lock.
+def Drop_Cache_Entry(url):
+  global cache_bytes
+  digest = cache_index.pop(url)["sha1"]
+  del cache_lru[url]
+  body = cache_bodies[digest]
+  body["urls"] -= 1
+  if body["urls"]:
+    return None
+  del cache_bodies[digest]
+  cache_bytes -= body["size"]
+  return digest
+
+# Moves a URL to the most recently used end of the LRU order. Has to be called under cache_lock.
+def Touch_Cache_Entry(url):
+  if url in cache_lru:
+    del cache_lru[url]
+    cache_lru[url] = None
+
+# Writes the cache index back to disk
+def Save_Cache():
+  if cache_index is None:
+    return
+  if not os.path.isdir(cache_dir):
+    os.makedirs(cache_dir)
+  index_file = os.path.join(cache_dir, "index.json")
+  with cache_lock:
+    with open(index_file + ".tmp", "w") as index:
+      json.dump(cache_index, index)
+  os.rename(index_file + ".tmp", index_file)
+
+# Returns the cached body for an index entry, or None if the body file has gone missing
+def Read_Cached_Body(entry):
+  body_file = Cache_Body_Path(entry["sha1"])
+  if not os.path.isfile(body_file):
+    return None
+  with open(body_file, "rb") as body:
+    return body.read().decode("utf-8")
+
+# Stores a page body in the cache, then evicts the least recently used URLs until the stored
+# bodies fit in cache_max_bytes. Bodies shared by several URLs are only removed with the last one.
+def Store_Cached_Page(url, text, headers):
+  body = text.encode("utf-8")
+  digest = hashlib.sha1(body).hexdigest()
+  body_file = Cache_Body_Path(digest)
+  if not os.path.isfile(body_file):
+    if not os.path.isdir(os.path.dirname(body_file)):
+      try:
+        os.makedirs(os.path.dirname(body_file))
+      except OSError:
+        pass
+    with open(body_file + "." + str(threading.current_thread().ident), "wb") as out:
+      out.write(body)
+    os.rename(body_file + "." + str(threading.current_thread().ident), body_file)
+
+  with cache_lock:
+    now = time.time()
+    Add_Cache_Entry(url, {"sha1": digest, "size": len(body), "fetched": now, "used": now,
+                          "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")})
+    while cache_bytes > cache_max_bytes and cache_lru:
+      old_digest = Drop_Cache_Entry(next(iter(cache_lru)))
+      if old_digest is None:
+        continue
+      try:
+        os.remove(Cache_Body_Path(old_digest))
+      except OSError:
+        pass
+
+# Makes the actual GET request (through the local stand-in server if one is running) and records
+# its latency and size against the real host
+def Timed_Get(url, headers=None):
+  bucket = Host_Bucket(urlparse.urlsplit(url).netloc)
+  for attempt in range(fetch_retries + 1):
+    if bucket is not None:
+      bucket.acquire()
+    start = time.time()
+    try:
+      page = Http_Session().get(Local_Url(url), headers=headers, timeout=fetch_timeout)
+    except (requests.ConnectionError, requests.Timeout) as err:
+      if attempt == fetch_retries:
+        raise
+      delay = Backoff_Delay(attempt)
+      print "   {} failed ({}), retrying in {:.1f}s".format(url, err, delay)
+    else:
+      run_metrics.record_request(url, page.status_code, len(page.content), time.time() - start)
+      if page.status_code not in retry_statuses or attempt == fetch_retries:
+        return page
+      delay = Retry_After(page)
+      if delay is not None and bucket is not None:
+        bucket.pause(delay)
+      delay = Backoff_Delay(attempt) if delay is None else delay
+      print "   {} returned {}, retrying in {:.1f}s".format(url, page.status_code, delay)
+    run_metrics.record_retry(url)
+    time.sleep(delay)
+
+# Returns the session every request goes through, made on first use. It keeps a connection pool
+# for each of the fetch_hosts, and each pool keeps connections alive between requests with room
+# for one per fetch thread.
+http_session = None
+session_lock = threading.Lock()
+def Http_Session():
+  global http_session
+  with session_lock:
+    if http_session is None:
+      http_session = requests.Session()
+      adapter = requests.adapters.HTTPAdapter(pool_connections=len(fetch_hosts), pool_maxsize=fetch_workers)
+      http_session.mount("http://", adapter)
+      http_session.mount("https://", adapter)
+  return http_session
+
+# Per-host token bucket rate limiter. Tokens refill at rate per second up to burst and every
+# request takes one, waiting for it if the bucket is empty. pause() stops every request to the
+# host for a while, ie when it answers with a Retry-After.
+class TokenBucket:
+  def __init__(self, rate, burst):
+    self.rate = rate
+    self.burst = burst
+    self.tokens = burst
+    self.stamp = time.time()
+    self.lock = threading.Lock()
+
+  def acquire(self):
+    while True:
+      with self.lock:
+        now = time.time()
+        if now >= self.stamp:
+          self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+          self.stamp = now
+          if self.tokens >= 1:
+            self.tokens -= 1
+            return
+          wait = (1 - self.tokens) / self.rate
+        else:
+          wait = self.stamp - now
+      time.sleep(wait)
 
+  def pause(self, seconds):
+    with self.lock:
+      self.tokens = 0.0
+      self.stamp = max(self.stamp, time.time() + seconds)
+
+# Returns the rate limiter for a host, which allows one request per polite_delay seconds. There
+# is no limit (None) when polite_delay is 0, ie against the local stand-in server.
+host_buckets = {}
+def Host_Bucket(host):
+  if polite_delay <= 0:
+    return None
+  with session_lock:
+    if host not in host_buckets:
+      host_buckets[host] = TokenBucket(1.0 / polite_delay, 1)
+    return host_buckets[host]
+
+# Returns how long (in seconds) a response's Retry-After header asks to wait, or None if it
+# doesn't have one. The header is either a number of seconds or an HTTP date.
+def Retry_After(page):
+  value = page.headers.get("Retry-After")
+  if not value:
+    return None
+  if value.strip().isdigit():
+    return min(float(value), max_retry_wait)
+  date = email.utils.parsedate_tz(value)
+  if date is None:
+    return None
+  return min(max(0.0, email.utils.mktime_tz(date) - time.time()), max_retry_wait)
+
+# Exponential backoff with jitter for the given retry attempt (0 based)
+def Backoff_Delay(attempt):
+  return backoff_base * (2 ** attempt) * (0.5 + random.random())
+
+# Fetches a single page and returns its text, or None if the request didn't succeed. When
+# recording, every page is also saved under record_dir in the layout the local stand-in server
+# reads from, so a run can be replayed offline later with --local.
+def Fetch_Page(url, max_age=None):
+  text = Load_Page(url, max_age)
+  if record_dir is not None and text is not None:
+    page_file = Fixture_Path(record_dir, url)
+    if not os.path.isdir(os.path.dirname(page_file)):
+      try:
+        os.makedirs(os.path.dirname(page_file))
+      except OSError:
+        pass
+    with open(page_file, "wb") as out:
+      out.write(text.encode("utf-8"))
+  return text
+
+# Loads a page for Fetch_Page. Pages are served from the on-disk cache while they are fresh.
+# Stale pages are revalidated with their ETag/Last-Modified so an unchanged page costs a 304
+# instead of a full download. max_age (in seconds) can be used to treat cached copies as stale
+# sooner than their TTL. The cache is bypassed when running against the local stand-in server.
+def Load_Page(url, max_age=None):
+  if local_base is not None:
+    page = Timed_Get(url)
+    if page.status_code != 200:
+      print "   Failed to fetch {} ({})".format(url, page.status_code)
+      return None
+    return page.text
+
+  index = Load_Cache()
+  with cache_lock:
+    entry = index.get(url)
+  cached = Read_Cached_Body(entry) if entry else None
+  if cached is not None:
+    ttl = Cache_TTL(url)
+    if max_age is not None and (ttl is None or max_age < ttl):
+      ttl = max_age
+    if offline or ttl is None or time.time() - entry["fetched"] < ttl:
+      with cache_lock:
+        entry["used"] = time.time()
+        Touch_Cache_Entry(url)
+      run_metrics.record_cache("hit")
+      return cached
+  elif offline:
+    print "   {} is not cached, skipping it in offline mode".format(url)
+    run_metrics.record_cache("offline_miss")
+    return None
+
+  headers = {}
+  if cached is not None and entry["etag"]:
+    headers["If-None-Match"] = entry["etag"]
+  if cached is not None and entry["last_modified"]:
+    headers["If-Modified-Since"] = entry["last_modified"]
+  page = Timed_Get(url, headers)
+  if page.status_code == 304 and cached is not None:
+    with cache_lock:
+      entry["fetched"] = entry["used"] = time.time()
+      Touch_Cache_Entry(url)
+    run_metrics.record_cache("revalidated")
+    return cached
+  run_metrics.record_cache("miss")
+  if page.status_code != 200:
+    print "   Failed to fetch {} ({})".format(url, page.status_code)
+    return None
+  Store_Cached_Page(url, page.text, page.headers)
+  return page.text
+
+# Fetches a list of pages concurrently and yields (url, text) for each one as soon as it's done,
+# without holding on to any of them. A bounded pool of worker threads pulls URLs off a queue.
+# Each host gets a semaphore that limits how many of its pages are in flight at once, and
+# requests to the same host are spaced out by the host's rate limiter in Timed_Get. Finished
+# pages wait in a queue of at most fetch_workers pages, so when the caller falls behind the
+# workers wait for it instead of piling pages up in memory. If the caller stops early the
+# workers are stopped too.
+def Stream_Pages(urls):
+  url_queue = Queue.Queue()
+  for url in set(urls):
+    url_queue.put(url)
+  done_queue = Queue.Queue(max(1, fetch_workers))
+  host_locks = {}
+  lock = threading.Lock()
+  stop = threading.Event()
+
+  def worker():
+    while not stop.is_set():
+      try:
+        url = url_queue.get_nowait()
+      except Queue.Empty:
+        return
+      host = urlparse.urlsplit(url).netloc
+      with lock:
+        if host not in host_locks:
+          host_locks[host] = threading.Semaphore(host_limit)
+      with host_locks[host]:
+        try:
+          text = Fetch_Page(url)
+        except requests.RequestException as err:
+          print "   Failed to fetch {} ({})".format(url, err)
+          text = None
+      while not stop.is_set():
+        try:
+          done_queue.put((url, text), timeout=0.1)
+          break
+        except Queue.Full:
+          pass
+
+  threads = [threading.Thread(target=worker) for x in range(min(fetch_workers, url_queue.qsize()))]
+  for thread in threads:
+    thread.start()
+  try:
+    while True:
+      # Workers only exit after handing off their last page, so once they're all done an empty
+      # queue means every page has been yielded
+      if not any(thread.is_alive() for thread in threads) and done_queue.empty():
+        break
+      try:
+        page = done_queue.get(timeout=0.1)
+      except Queue.Empty:
+        continue
+      yield page
+  finally:
+    stop.set()
+    for thread in threads:
+      thread.join()
+    Save_Cache()
+
+# Fetches a list of pages concurrently (see Stream_Pages) and returns a dict of url -> page text.
+# If on_page is given it's called with (url, text) as soon as each page is done.
+def Fetch_Pages(urls, on_page=None):
+  pages = {}
+  for url, text in Stream_Pages(urls):
+    if on_page is not None:
+      on_page(url, text)
+    pages[url] = text
+  return pages
+
+# Builds the PFR gamelog URL for a player page href for the given year
+def Gamelog_Url(href, year):
+  return "https://www.pro-football-reference.com" + str(href) + "/gamelog/" + str(year) + "/"
+
+# Returns True if a table element has the given id and/or all of the given classes
+def Table_Matches(table, table_id, table_class):
+  if table_id is not None and table.get("id") != table_id:
+    return False
+  if table_class is not None:
+    classes = (table.get("class") or "").split()
+    if any(cls not in classes for cls in table_class.split()):
+      return False
+  return True
+
+# Turns a table row element into a dict. Every cell and element inside the row with a data-stat
+# or class attribute is keyed by it (first one wins) with its text as the value, and td cells are
+# also keyed by their column number. For keyed cells the csk sort key and first link are kept
+# under "<key>@csk" and "<key>@href". Rows without any td cells (header rows) return None.
+def Row_Dict(tr):
+  row = {}
+  column = 0
+  for elem in tr.iterdescendants():
+    if not isinstance(elem.tag, basestring):
+      continue
+    key = elem.get("data-stat") or elem.get("class")
+    text = None
+    if key and key not in row:
+      text = u"".join(elem.itertext()).strip()
+      row[key] = text
+    if elem.tag == "td":
+      row[column] = text if text is not None else u"".join(elem.itertext()).strip()
+      column += 1
+    if key and elem.tag in ("td", "th"):
+      if elem.get("csk") is not None:
+        row[key + "@csk"] = elem.get("csk")
+      link = elem.find(".//a")
+      if link is not None:
+        row[key + "@href"] = link.get("href")
+  return row if column else None
+
+# Streams the body rows of a table out of a page as dicts (see Row_Dict) in a single pass with
+# lxml's incremental parser, instead of building a full document tree and searching it over
+# and over. The table is picked by id and/or class. PFR hides some of its tables inside HTML
+# comments, so comment markers are stripped before parsing. Only tbody rows come out: thead and
+# tfoot rows (ie the season totals under a PFR gamelog) are skipped. Elements are cleared as
+# soon as they have been read so memory stays flat no matter how big the page is. Only time spent
+# inside the parser (not in the code consuming the rows) is counted towards the run's parse time.
+def Extract_Table_Rows(html, table_id=None, table_class=None):
+  if not html:
+    return
+  if isinstance(html, unicode):
+    html = html.encode("utf-8")
+  start = time.time()
+  parse_time = 0.0
+  row_count = 0
+  html = html.replace("<!--", "").replace("-->", "")
+  in_table = False
+  in_head_or_foot = False
+  parser = etree.iterparse(io.BytesIO(html), events=("start", "end"), html=True, encoding="utf-8")
+  try:
+    for event, elem in parser:
+      if event == "start":
+        if elem.tag == "table" and not in_table:
+          in_table = Table_Matches(elem, table_id, table_class)
+        elif elem.tag in ("thead", "tfoot") and in_table:
+          in_head_or_foot = True
+        continue
+
+      if not in_table:
+        elem.clear()
+      elif elem.tag in ("thead", "tfoot"):
+        in_head_or_foot = False
+      elif elem.tag == "tr":
+        row = None if in_head_or_foot else Row_Dict(elem)
+        elem.clear()
+        while elem.getprevious() is not None:
+          del elem.getparent()[0]
+        if row is not None:
+          row_count += 1
+          parse_time += time.time() - start
+          start = None
+          yield row
+          start = time.time()
+      elif elem.tag == "table":
+        break
+  finally:
+    # Also recorded when the caller stops taking rows part way through the table
+    if start is not None:
+      parse_time += time.time() - start
+    run_metrics.record_parse(parse_time, row_count)
 
 # Function that scrapes the players and their draft stats from the Yahoo Draft Analysis Page.
 # The webscraping here is entirely dependent on the 'table' element in the webpage that 
 # hasn't really changed, which allows this function to stay pretty stable.
-def Add_Yahoo_Stats():
-  print "Adding Players from Yahoo"
+# Players are yielded as (name, team, pos, avg pick, avg round) in ADP order, and the next page
+# is only fetched once every player on the last one has been taken.
+def Yahoo_Players(max_age=None):
   player_count = 0
   new_page = "https://football.fantasysports.yahoo.com/f1/draftanalysis"
-  table_strainer=SoupStrainer("table", id="draftanalysistable")
   while (player_count < total_players) and not (player_count % 50):
-    page = requests.get(new_page)
-    soup = BeautifulSoup(page.text, parse_only=table_strainer)
-    body = soup.tbody
+    page = Fetch_Page(new_page, max_age)
+    if page is None:
+      break
 
-    for player in body.contents:
-      pos_raw = player.find("span", class_="Fz-xxs")
-      pos_strip = u''.join((pos_raw.text)).encode('utf-8').strip()
+    for player in Extract_Table_Rows(page, table_id="draftanalysistable"):
+      pos_strip = player["Fz-xxs"].encode('utf-8').strip()
       team = re.search("(.+?) -", pos_strip).group(1)
       pos_strip = re.search("- (.+$)", pos_strip).group(1)
-      if pos_strip == "DEF":
-        temp = Defense()
-        player_list.append(temp)
-      else:
-        temp = Player()
-        player_list.append(temp)
-      player_list[player_count].set_team(team)
-      player_list[player_count].set_pos(pos_strip)
-
-      name = player.find("a", class_="Nowrap name F-link")
-      name_strip = u''.join((name.text)).encode('utf-8').strip()
-      name_clean = unidecode.unidecode(name_strip.decode('utf-8'))
-      player_list[player_count].set_name(name_clean)
-
-      find_pick = player.find("td", class_="Ta-end")
-      pick_strip = u''.join((find_pick.div.text)).encode('utf-8').strip()
-      player_list[player_count].set_pick(float(pick_strip))
-
-      find_round = player.find("td", class_="Alt Last")
-      round_strip = u''.join((find_round.div.text)).encode('utf-8').strip()
-      player_list[player_count].set_round(float(round_strip))
-    
-      sorted_player_dict[pos_strip].append(player_list[player_count])
+      name_clean = unidecode.unidecode(player["Nowrap name F-link"])
+      yield name_clean, team, pos_strip, float(player["Ta-end"]), float(player["Alt Last"])
       player_count += 1
       if player_count == total_players:
         break
@@ -159,272 +818,1161 @@ def Add_Yahoo_Stats():
     # An ad hoc way to get the next page of players in the table
     new_page = "https://football.fantasysports.yahoo.com/f1/draftanalysis?tab=SD&pos=ALL&sort=DA_AP&count={}".format(player_count)
 
-# This function is used to extract a specific player's PFR page ID from a general table of all players.
-# The table is searched for the target player using a specific element in each entry that is regular 
-# (ie omits things like "III" or "Jr" which aren't always consistent with Yahoo) and extracts the page
-# identifier from the same element.
-def Find_PFR_Entry(soup, target_name):
-  split_name = target_name.split(" ")
-  target_name = split_name[1] + "," + split_name[0]
-  pfr = soup.find_all('td', csk=target_name)
-  if len(pfr) == 1:
-    return pfr[0].find_all("a")
-  else:
-    if len(split_name[0]) == 2 and split_name[0].isupper():
-      split_name[0] = split_name[0][0] + "." +  split_name[0][1] + "."
-      target_name = split_name[1] + "," + split_name[0]
-      pfr = soup.find_all('td', csk=target_name)
-      if len(pfr) == 1:
-        return pfr[0].find_all("a")
-    return None
+# Adds every player from the Yahoo Draft Analysis Page to the table
+def Add_Yahoo_Stats(table, max_age=None):
+  print "Adding Players from Yahoo"
+  for player in Yahoo_Players(max_age):
+    table.add_player(*player)
 
-# Function that scrapes RB stats a pro football reference based on the rushing stats page.
-def Add_RB_PFR_Stats():
-  print "Adding RB PFR Data"
-  rb_page = "https://www.pro-football-reference.com/years/"+ str(curr_year-1) + "/rushing.htm"
-  table_strainer=SoupStrainer("table", id="rushing")
-  rb_page = requests.get(rb_page)
-  rb_soup = BeautifulSoup(rb_page.text, parse_only=table_strainer)
-
-  for player in sorted_player_dict["RB"]:
-    name = player.get_name()
-    print name
-    if re.search(" (.+?) ", name) != None:
-      name = re.search("(.+?) ", name).group(1) + " " + re.search(" (.+?) ", name).group(1)
-    pfr = Find_PFR_Entry(rb_soup, name)
-
-    rb_data_dict = {}
-    rb_rank_dict = {}
-    if pfr and len(pfr) == 1:
-      pfr_page = "https://www.pro-football-reference.com" + str(pfr[0].attrs.get("href") + "/gamelog/" + str(curr_year - 1) + "/")
-      game_strainer = SoupStrainer("table", id="stats")
-      game_page = requests.get(pfr_page)
-      game_soup = BeautifulSoup(game_page.text, parse_only=game_strainer)
-      game_body = game_soup.tbody
-      for label in rb_stat_labels:
-        arr = []
-        rb_data_dict[label] = game_body.find_all("td", {"data-stat": label})
-        if len(rb_data_dict[label]) > 0:
-          for week in rb_data_dict[label]:
-            if week.text.isnumeric():
-              arr.append(float(week.text))
-            else:
-              arr.append(0.0)
-        else:
-          arr = [0.0]
-        rb_data_dict[label] = [round(np.mean(arr), 2), round(np.std(arr), 2)]
-        rb_rank_dict[label] = [1, 1]
-    else:
-      for label in rb_stat_labels:
-        rb_data_dict[label] = [0, 0]
-        rb_rank_dict[label] = [0, 0]
-    player.set_pfr_stats(rb_data_dict)          
-    player.set_pfr_ranks(rb_rank_dict)          
+# Normalizes a player name so that Yahoo and PFR spellings line up: accents are stripped, the
+# name is lowercased, punctuation is dropped (so "D.J." and "DJ" match) and suffixes like "Jr"
+# or "III" which aren't always consistent between the two sites are removed.
+name_suffixes = set(["jr", "sr", "ii", "iii", "iv", "v"])
+def Normalize_Name(name):
+  name = unidecode.unidecode(unicode(name)).lower()
+  name = re.sub("[.'`]", "", name)
+  tokens = re.sub("[^a-z0-9]+", " ", name).split()
+  while len(tokens) > 2 and tokens[-1] in name_suffixes:
+    tokens.pop()
+  return " ".join(tokens)
+
+# Team codes that Yahoo, PFR and Football Outsiders don't agree on (or that changed when a team
+# moved), by Yahoo code
+team_aliases = {"GB": ["GNB"], "KC": ["KAN"], "NE": ["NWE"], "NO": ["NOR"], "SF": ["SFO"], "TB": ["TAM"],
+                "LV": ["LVR", "OAK"], "LAR": ["LA", "STL"], "LAC": ["SD", "SDG"], "WAS": ["WSH"]}
+def Team_Codes(team):
+  return [team.upper()] + team_aliases.get(team.upper(), [])
+
+# Returns the set of letter trigrams of a normalized name (padded so the first and last letters
+# count), used to block fuzzy matching down to names that share some of them
+def Name_Grams(name):
+  padded = " " + name + " "
+  return set(padded[spot:spot + 3] for spot in range(len(padded) - 2))
+
+# Builds an index of the players in a season table's rows in a single pass: every player with
+# their normalized name, team, position, PFR player page href and season table row, plus lookups
+# from normalized name and from name trigram to the players that have them. Each player cell has
+# a regular "Last,First" csk attribute which is used for the name.
+def Build_PFR_Index(rows):
+  index = {"entries": [], "names": {}, "grams": {}}
+  seen = set()
+  for row in rows:
+    csk = row.get("player@csk")
+    href = row.get("player@href")
+    if href is None or href in seen or csk is None or "," not in csk:
+      continue
+    seen.add(href)
+    last, first = csk.split(",", 1)
+    entry = {"name": Normalize_Name(first + " " + last), "href": href, "team": row.get("team", "").upper(),
+             "pos": re.sub("[^A-Z]", "", row.get("pos", "").upper()), "row": row}
+    index["names"].setdefault(entry["name"], []).append(len(index["entries"]))
+    for gram in Name_Grams(entry["name"]):
+      index["grams"].setdefault(gram, []).append(len(index["entries"]))
+    index["entries"].append(entry)
+  return index
+
+# PFR season table indexes by table name and season, built once and shared between passes
+# (the WR and TE passes both use the receiving table). Defaults to last season's tables.
+pfr_indexes = {}
+def Load_PFR_Index(table, year=None):
+  if year is None:
+    year = curr_year - 1
+  key = (table, year)
+  if key not in pfr_indexes:
+    page = Fetch_Page(Season_Table_Url(table, year))
+    pfr_indexes[key] = Build_PFR_Index(Extract_Table_Rows(page, table_id=table))
+  return pfr_indexes[key]
+
+# Builds the URL of a PFR season table (rushing, receiving, passing or kicking) for the given year
+def Season_Table_Url(table, year):
+  return "https://www.pro-football-reference.com/years/" + str(year) + "/" + table + ".htm"
+
+# Fuzzy matching settings. Names are only compared in full against the fuzzy_shortlist players
+# that share the most trigrams with them (and at least fuzzy_min_grams of them). A fuzzy match
+# needs a similarity of fuzzy_threshold, the same team and no conflicting position, and has to
+# beat the next best candidate by fuzzy_margin.
+fuzzy_shortlist = 20
+fuzzy_min_grams = 0.5
+fuzzy_threshold = 0.8
+fuzzy_margin = 0.05
+
+# Returns True if a PFR index entry's team / position agree with a Yahoo player's. PFR leaves the
+# position blank for some players, which doesn't count against them.
+def Entry_Team_Matches(entry, team):
+  return team is not None and entry["team"] in Team_Codes(team)
+
+def Entry_Pos_Conflicts(entry, pos):
+  return pos is not None and entry["pos"] != "" and pos not in entry["pos"]
+
+# Returns the keys a normalized name is looked up under in a season table index: the full name,
+# then the first and last names without any middle names
+def Name_Keys(name):
+  tokens = name.split(" ")
+  return [name] + ([tokens[0] + " " + tokens[-1]] if len(tokens) > 2 else [])
+
+# Returns True if more than one player in a season table index goes by a player's name (ie Mike
+# Williams on LAC and on TB), going by the first of the name's keys that's in the index
+def Name_Shared(index, target_name):
+  for key in Name_Keys(Normalize_Name(target_name)):
+    if key in index["names"]:
+      return len(index["names"][key]) > 1
+  return False
+
+# Looks up a player in a season table index, returning (href, status, candidates). status is:
+#   - "exact": the normalized name (or the first and last names, dropping middle names) matched
+#     a single player, or several and only one of them has the same team and/or position
+#   - "fuzzy": no name matched exactly but one player's name is close enough (see above)
+#   - "ambiguous": more than one player could be the match, or the closest name is on another
+#     team or plays another position. The closest few are listed in candidates.
+#   - "unmatched": nobody in the table is close (ie a rookie)
+# href is None unless the match is exact or fuzzy.
+def Match_PFR_Entry(index, target_name, team=None, pos=None):
+  name = Normalize_Name(target_name)
+  for key in Name_Keys(name):
+    entries = [index["entries"][entry_id] for entry_id in index["names"].get(key, [])]
+    if len(entries) == 1:
+      return entries[0]["href"], "exact", []
+    if entries:
+      for narrowed in [[entry for entry in entries if Entry_Team_Matches(entry, team)],
+                       [entry for entry in entries if not Entry_Pos_Conflicts(entry, pos)]]:
+        if len(narrowed) == 1:
+          return narrowed[0]["href"], "exact", []
+      return None, "ambiguous", [entry["href"] for entry in entries]
+
+  grams = Name_Grams(name)
+  shared = {}
+  for gram in grams:
+    for entry_id in index["grams"].get(gram, []):
+      shared[entry_id] = shared.get(entry_id, 0) + 1
+  shortlist = sorted([entry_id for entry_id, count in shared.items() if count >= fuzzy_min_grams * len(grams)],
+                     key=lambda entry_id: -shared[entry_id])[:fuzzy_shortlist]
+  scored = []
+  for entry_id in shortlist:
+    entry = index["entries"][entry_id]
+    scored.append((difflib.SequenceMatcher(None, name, entry["name"]).ratio(), entry))
+  scored = sorted([(score, entry) for score, entry in scored if score >= fuzzy_threshold], key=lambda scored_entry: -scored_entry[0])
+  if not scored:
+    return None, "unmatched", []
+  best_score, best = scored[0]
+  if (Entry_Team_Matches(best, team) and not Entry_Pos_Conflicts(best, pos) and
+      (len(scored) == 1 or best_score - scored[1][0] >= fuzzy_margin)):
+    return best["href"], "fuzzy", []
+  return None, "ambiguous", [entry["href"] for score, entry in scored if best_score - score < fuzzy_margin][:5]
+
+# This function is used to look up a specific player's PFR page ID in a season table index.
+# Returns None if the player isn't found or the match is ambiguous.
+def Find_PFR_Entry(index, target_name, team=None, pos=None):
+  return Match_PFR_Entry(index, target_name, team, pos)[0]
+
+# Persistent map of Yahoo player (position and normalized name) -> PFR player page href. Once a
+# player has been matched their href is read straight out of the map on later runs. Names that
+# more than one player in the season table goes by are keyed with the Yahoo team as well, so
+# namesakes don't share an entry. The map is a plain JSON file, so a wrong match can be fixed by
+# editing or removing its entry, and a player can be pinned to "no PFR page" by setting them to
+# null. Players that can't be matched, and every fuzzy match, are collected in identity_issues for
+# the run's report.
+identity_map = None
+identity_issues = []
+def Identity_Map_File():
+  return os.path.join(os.getcwd(), "football_identity_map.json")
+
+def Identity_Key(name, pos, team=None):
+  key = pos + ":" + Normalize_Name(name)
+  return key if team is None else key + ":" + team.upper()
+
+def Load_Identity_Map():
+  global identity_map
+  if identity_map is None:
+    identity_map = {}
+    if os.path.isfile(Identity_Map_File()):
+      with open(Identity_Map_File()) as map_file:
+        identity_map = json.load(map_file)
+  return identity_map
+
+def Save_Identity_Map():
+  if identity_map is None:
+    return
+  with open(Identity_Map_File() + ".tmp", "w") as map_file:
+    json.dump(identity_map, map_file, indent=1, sort_keys=True)
+  os.rename(Identity_Map_File() + ".tmp", Identity_Map_File())
+
+# Resolves a player in the table to their PFR player page href through the identity map, falling
+# back to matching them in a season table index (and saving the match in the map)
+def Resolve_PFR_Player(table, row, index):
+  ids = Load_Identity_Map()
+  team = table.teams[row] if Name_Shared(index, table.names[row]) else None
+  key = Identity_Key(table.names[row], table.pos[row], team)
+  if key in ids:
+    return ids[key]
+  href, status, candidates = Match_PFR_Entry(index, table.names[row], table.teams[row], table.pos[row])
+  if href is not None:
+    ids[key] = href
+  if status != "exact":
+    identity_issues.append(["pfr", table.names[row], table.pos[row], table.teams[row], status, href or "", " ".join(candidates)])
+  return href
 
+# Writes the players that couldn't be matched (or were matched fuzzily) this run to a CSV in the
+# local directory so they can be checked and fixed in the identity map
+def Write_Identity_Report():
+  if not identity_issues:
+    return
+  report_file = os.path.join(os.getcwd(), "football_unresolved_{}_{}.csv".format(curr_year, int(time.time())))
+  with open(report_file, "wb") as csvfile:
+    file_writer = csv.writer(csvfile, delimiter=',')
+    file_writer.writerow(["Source", "Name", "Pos", "Team", "Status", "Matched", "Candidates"])
+    for issue in identity_issues:
+      file_writer.writerow(issue)
+  counts = {}
+  for issue in identity_issues:
+    counts[issue[4]] = counts.get(issue[4], 0) + 1
+  print "Identity report {} written ({}).".format(report_file, ", ".join("{} {}".format(count, status) for status, count in sorted(counts.items())))
+
+# Checkpoint of the gamelogs parsed so far this run, so an interrupted run can pick up where it
+# stopped. Every parsed gamelog is appended to the checkpoint file as a JSON line as soon as it's
+# done and the file is removed once a run finishes. Entries are keyed by gamelog URL and the
+# stat labels they were parsed with.
+checkpoint = None
+checkpoint_lock = threading.Lock()
+def Checkpoint_File():
+  return os.path.join(os.getcwd(), "football_checkpoint_{}.jsonl".format(curr_year))
+
+# Loads the checkpoint left by an interrupted run, if there is one
+def Load_Checkpoint():
+  global checkpoint
+  with checkpoint_lock:
+    if checkpoint is None:
+      checkpoint = {}
+      if os.path.isfile(Checkpoint_File()):
+        with open(Checkpoint_File()) as lines:
+          for line in lines:
+            try:
+              entry = json.loads(line)
+            except ValueError:
+              # The last line can be cut off by whatever stopped the run
+              continue
+            weeks = np.array(entry["weeks"], dtype=float).reshape(len(entry["weeks"]), len(entry["labels"]))
+            checkpoint[(entry["url"], tuple(entry["labels"]))] = weeks
+        print "Resuming from checkpoint with {} gamelogs done".format(len(checkpoint))
+    return checkpoint
+
+def Save_Checkpoint(url, labels, weeks):
+  line = json.dumps({"url": url, "labels": labels, "weeks": [[None if np.isnan(value) else value for value in week] for week in weeks]})
+  with checkpoint_lock:
+    checkpoint[(url, tuple(labels))] = weeks
+    with open(Checkpoint_File(), "a") as out:
+      out.write(line + "\n")
+
+def Clear_Checkpoint():
+  global checkpoint
+  with checkpoint_lock:
+    checkpoint = None
+    if os.path.isfile(Checkpoint_File()):
+      os.remove(Checkpoint_File())
+
+# Resolves the players in the given table rows to their PFR player pages using a season table
+# index, then downloads and parses all of their gamelogs at once into weekly stat lines and
+# [mean, std] stats. Gamelogs already in the checkpoint aren't downloaded again, and each new one
+# is parsed and checkpointed as soon as it comes in, after which the page itself is dropped.
+# Players that couldn't be found or whose page failed to download get zeros. derive(row, weeks)
+# can fill in stats that are worked out from the others (ie a kicker's FG points by distance)
+# before the [mean, std] stats are taken.
+def Load_Gamelogs(table, rows, index, labels, derive=None):
+  done = Load_Checkpoint()
+  urls = {}
+  for row in rows:
+    print table.names[row]
+    href = Resolve_PFR_Player(table, row, index)
+    table.pfr_href[row] = href
+    if href:
+      urls[row] = Gamelog_Url(href, curr_year - 1)
+  todo = [url for url in set(urls.values()) if (url, tuple(labels)) not in done]
+  print " Fetching {} gamelogs ({} already checkpointed)".format(len(todo), len(set(urls.values())) - len(todo))
+
+  for url, game_page in Stream_Pages(todo):
+    if game_page is not None:
+      Save_Checkpoint(url, labels, Gamelog_Weeks(game_page, labels))
+
+  for row in rows:
+    weeks = done.get((urls.get(row), tuple(labels)))
+    if weeks is None:
+      weeks = Gamelog_Weeks(None, labels)
+    elif derive is not None:
+      weeks = derive(row, weeks.copy())
+    table.weeks[row] = weeks
+    table.set_stats(row, Weeks_Stats(weeks, labels))
+
+  # The weeks are in the table now, the checkpoint file still has them if the run is cut short
+  with checkpoint_lock:
+    for url in set(urls.values()):
+      done.pop((url, tuple(labels)), None)
+
+# Loads the league scoring settings (points per stat, which stats are TDs, how many standard
+# deviations to use for volatility and the boom/bust thresholds for the simulation) from a JSON
+# file. Defaults to league_settings.json next to this script.
+league_settings_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "league_settings.json")
+league_settings = None
+def Load_League_Settings(path=None):
+  global league_settings, league_settings_file
+  if path is not None:
+    league_settings_file = path
+    league_settings = None
+  if league_settings is None:
+    with open(league_settings_file) as settings:
+      league_settings = json.load(settings)
+  return league_settings
+
+# Returns the scoring weight vectors for a list of stat labels: one with every stat and one with
+# the TD stats zeroed out. Stats without a weight in the league settings score nothing.
+def Score_Weights(labels, settings):
+  weights = np.array([settings["scoring"].get(label, 0.0) for label in labels], dtype=float)
+  no_td_weights = np.array([0.0 if label in settings["td_stats"] else weight for label, weight in zip(labels, weights)])
+  return weights, no_td_weights
+
+# Scores a players x stats matrix of per-game means and standard deviations in a few array ops.
+# Returns arrays of average points, average points without TDs and point volatility, which is the
+# gap between a week N sigma worse and N sigma better than average in every non-TD stat.
+# The weights can also be stats x rule sets matrices (ie np.column_stack of several
+# Score_Weights vectors) to score every player under several leagues at once.
+def Score_Matrix(means, stds, weights, no_td_weights, num_dev):
+  avg = np.dot(means, weights)
+  no_td = np.dot(means, no_td_weights)
+  volatility = 2.0 * num_dev * np.dot(stds, np.abs(no_td_weights))
+  return avg, no_td, volatility
+
+# Scores the stats of the players in the given table rows with the current league settings and
+# stores them in the table's points column
+def Score_Players(table, rows, labels):
+  settings = Load_League_Settings()
+  means, stds = table.stat_matrices(rows, labels)
+  weights, no_td_weights = Score_Weights(labels, settings)
+  avg, no_td, volatility = Score_Matrix(means, stds, weights, no_td_weights, settings["volatility_devs"])
+  table.column("points", (3,))[rows] = np.column_stack([avg, no_td, volatility])
+
+# Ranks every player against the rest of their position for each stat label. The mean rank is 1 +
+# the number of players with a higher average and the std rank is 1 + the number of players with a
+# lower standard deviation, so tied players share the best rank. Rookies (no stats for the first
+# label) get [0, 0], and players that have no average for the label being ranked aren't ranked
+# against. Each label is ranked with a sort and a binary search per player, so
+# this is O(n log n) instead of comparing every pair of players. Stats in lower_is_better (ie
+# points allowed) are ranked the other way around, lowest average first.
+lower_is_better = set(["pts_def"])
+def Rank_Players(table, rows, labels):
   print " Adding pfr ranks"
-  for spot, player in enumerate(sorted_player_dict["RB"]):
-    ranks = player.get_pfr_ranks()
-    data = player.get_pfr_stats()
-    if data[rb_stat_labels[0]][0] == 0:
-      print "   " + player.get_name() + " is a rookie"
+  means, stds = table.stat_matrices(rows, labels)
+  ranks = np.zeros((len(rows), len(labels), 2), dtype=int)
+  veterans = means[:, 0] != 0
+  for col, label in enumerate(labels):
+    pool = means[:, col] != 0
+    if label in lower_is_better:
+      means[:, col] = -means[:, col]
+    pool_means = np.sort(means[pool, col])
+    pool_stds = np.sort(stds[pool, col])
+    ranks[veterans, col, 0] = 1 + len(pool_means) - np.searchsorted(pool_means, means[veterans, col], side="right")
+    ranks[veterans, col, 1] = 1 + np.searchsorted(pool_stds, stds[veterans, col], side="left")
+
+  for spot, row in enumerate(rows):
+    if not veterans[spot]:
+      print "   " + table.names[row] + " is a rookie"
+  for col, label in enumerate(labels):
+    table.column(label + "_rank", (2,), int)[rows] = ranks[:, col]
+
+# Simulates sim_count weeks for each of the players in the given table rows from their gamelogs
+# and stores the resulting weekly point distribution in the table's "sim_points" column as
+# [floor (p10), median (p50), ceiling (p90), boom rate, bust rate, risk adjusted points].
+# Each simulated week resamples one of the player's real weeks whole, so stats that move
+# together (ie catches and receiving yards) stay together, and scores it with the league weights.
+# Since scoring is linear in the stats the weeks are scored once up front and the points are
+# what gets resampled. A little Gaussian noise (Silverman's rule bandwidth) is added to each draw
+# so the distribution isn't limited to the handful of weeks actually played. A week is a boom or
+# a bust when it's at least / at most the position's thresholds in the league settings, and risk
+# adjusted points are the median moved towards the floor by the league's risk_aversion.
+# The same uniform and normal draws are reused for every player (only each player's own
+# distribution is reported, so they don't need to be independent of each other) and players are
+# simulated in blocks through preallocated buffers so no more than sim_batch draws are in memory.
+def Simulate_Players(table, rows, labels):
+  sim_points = table.column("sim_points", (6,))
+  if sim_count <= 0 or not len(rows):
+    return
+  print " Simulating {} weeks per player".format(sim_count)
+  settings = Load_League_Settings()
+  simulation = settings["simulation"]
+  weights, no_td_weights = Score_Weights(labels, settings)
+  points = [np.dot(np.nan_to_num(table.weeks[row]), weights) if table.weeks[row] is not None else np.zeros(0) for row in rows]
+  counts = np.array([len(week_points) for week_points in points])
+  padded = np.zeros((len(rows), max(1, counts.max())))
+  bandwidth = np.zeros(len(rows))
+  for spot, week_points in enumerate(points):
+    padded[spot, :len(week_points)] = week_points
+    if len(week_points) > 1:
+      bandwidth[spot] = 1.06 * np.std(week_points) * len(week_points) ** -0.2
+  boom = np.array([simulation["boom"].get(table.pos[row], np.inf) for row in rows])
+  bust = np.array([simulation["bust"].get(table.pos[row], -np.inf) for row in rows])
+
+  results = np.zeros((len(rows), 6))
+  played = np.flatnonzero(counts)
+  if not len(played):
+    # Nobody here has any weeks to resample (ie all rookies, or the gamelogs couldn't be fetched)
+    sim_points[rows] = results
+    return
+  block_size = min(len(played), max(1, sim_batch // sim_count))
+  uniform = np.random.random_sample(sim_count)
+  noise = np.random.standard_normal(sim_count)
+  picks = np.empty((block_size, sim_count), dtype=np.intp)
+  draws = np.empty((block_size, sim_count))
+  scratch = np.empty((block_size, sim_count))
+  hits = np.empty((block_size, sim_count), dtype=bool)
+  percentiles = [int(sim_count * 0.1), int(sim_count * 0.5), min(sim_count - 1, int(sim_count * 0.9))]
+  for start in range(0, len(played), block_size):
+    block = played[start:start + block_size]
+    block_picks, block_draws, block_scratch, block_hits = picks[:len(block)], draws[:len(block)], scratch[:len(block)], hits[:len(block)]
+    np.multiply(uniform, counts[block, None], out=block_scratch)
+    np.copyto(block_picks, block_scratch, casting="unsafe")
+    np.add(block_picks, (block * padded.shape[1])[:, None], out=block_picks)
+    np.take(padded, block_picks, out=block_draws)
+    np.multiply(noise, bandwidth[block, None], out=block_scratch)
+    np.add(block_draws, block_scratch, out=block_draws)
+    np.greater_equal(block_draws, boom[block, None], out=block_hits)
+    results[block, 3] = np.count_nonzero(block_hits, axis=1) / float(sim_count)
+    np.less_equal(block_draws, bust[block, None], out=block_hits)
+    results[block, 4] = np.count_nonzero(block_hits, axis=1) / float(sim_count)
+    block_draws.partition(percentiles, axis=1)
+    results[block, :3] = block_draws[:, percentiles]
+  results[:, 5] = results[:, 1] - simulation["risk_aversion"] * (results[:, 1] - results[:, 0])
+  sim_points[rows] = np.round(results, 3)
+
+# Returns the replacement level (season points) at each position: the points of the best player
+# left over once every starting spot in the league is filled with the best available players.
+# slots is the number of starting spots still open at each position and flex_slots the number of
+# open flex spots, which go to the best of the leftover flex-eligible players (so a deep RB class
+# pushes the RB replacement level down instead of the WR one).
+def Replacement_Levels(points, pos_num, available, slots, flex_slots, flex_positions):
+  ranked = [-np.sort(-points[available & (pos_num == pos_spot)]) for pos_spot in range(len(positions))]
+  leftover_points = [ranked[pos_spot][slots[pos_spot]:] for pos_spot, pos in enumerate(positions) if pos in flex_positions]
+  leftover_pos = [np.full(len(ranked[pos_spot][slots[pos_spot]:]), pos_spot) for pos_spot, pos in enumerate(positions) if pos in flex_positions]
+  flex_counts = np.zeros(len(positions), dtype=int)
+  if leftover_points and flex_slots > 0:
+    leftover_points = np.concatenate(leftover_points)
+    leftover_pos = np.concatenate(leftover_pos)
+    flex_counts = np.bincount(leftover_pos[np.argsort(-leftover_points, kind="mergesort")[:flex_slots]], minlength=len(positions))
+  levels = np.zeros(len(positions))
+  for pos_spot in range(len(positions)):
+    cut = slots[pos_spot] + flex_counts[pos_spot]
+    if len(ranked[pos_spot]):
+      levels[pos_spot] = ranked[pos_spot][min(cut, len(ranked[pos_spot]) - 1)]
+  return levels
+
+# Splits the available players at each position into tiers with a 1-D k-means over their values.
+# Centers start at evenly spaced percentiles, so clusters start out as runs of neighbouring players
+# and Lloyd's iterations (one assign and one update per pass, both array ops) settle quickly.
+# Tiers are numbered from 1 for the best cluster, without gaps from clusters that ended up empty.
+# Players that aren't available get tier 0.
+tier_iterations = 50
+def Tier_Players(values, pos_num, available, tier_counts):
+  tiers = np.zeros(len(values), dtype=int)
+  for pos_spot, pos in enumerate(positions):
+    members = np.flatnonzero(available & (pos_num == pos_spot))
+    clusters = min(tier_counts.get(pos, 5), len(members))
+    if clusters == 0:
       continue
-    for ind in range(0, pos_dict["RB"] - 1):
-      for label in rb_stat_labels:
-        comp_stats = sorted_player_dict["RB"][ind].get_pfr_stats()
-        if (ind == spot) or (comp_stats[label][0] == 0):
-          continue
+    member_values = values[members]
+    centers = np.percentile(member_values, np.linspace(100, 0, clusters))
+    for iteration in range(tier_iterations):
+      assign = np.argmin(np.abs(member_values[:, None] - centers[None, :]), axis=1)
+      counts = np.bincount(assign, minlength=clusters)
+      updated = np.where(counts > 0, np.bincount(assign, member_values, minlength=clusters) / np.maximum(counts, 1), centers)
+      if np.allclose(updated, centers):
+        break
+      centers = updated
+    distinct = np.unique(-centers[assign])
+    tiers[members] = np.searchsorted(distinct, -centers[assign]) + 1
+  return tiers
+
+# Works out value over replacement for every available player, in season points over the
+# replacement level at their position (see Replacement_Levels), along with:
+#   - ADP gap: the player's ADP rank minus their VOR rank among the available players, so a
+#     positive gap is a player going later than their value says they should
+#   - tier: their tier within their position by VOR (see Tier_Players)
+# drafted_counts is how many players have already been taken at each position, which fills that
+# many starting (and then flex) spots. Everything is array ops over the table so it can be redone
+# after every pick of a live draft. Returns arrays of VOR, ADP gap and tier over every row, with
+# zeros for players that aren't available.
+def Player_Values(table, available=None, drafted_counts=None):
+  settings = Load_League_Settings()
+  roster = settings["roster"]
+  if available is None:
+    available = np.ones(table.size, dtype=bool)
+  points = table.column("points", (3,))[:, 0] * roster["season_weeks"]
+  pos_num = np.array([positions.index(pos) for pos in table.pos], dtype=int)
+  slots = np.array([roster["teams"] * roster["starters"].get(pos, 0) for pos in positions])
+  flex_slots = roster["teams"] * roster["flex"]
+  if drafted_counts is not None:
+    extra = np.maximum(drafted_counts - slots, 0)
+    flex_slots = max(0, flex_slots - sum(extra[pos_spot] for pos_spot, pos in enumerate(positions) if pos in roster["flex_positions"]))
+    slots = np.maximum(slots - drafted_counts, 0)
+  levels = Replacement_Levels(points, pos_num, available, slots, flex_slots, roster["flex_positions"])
+  vor = np.where(available, points - levels[pos_num], 0.0)
+
+  rows = np.flatnonzero(available)
+  vor_rank = np.zeros(table.size, dtype=int)
+  adp_rank = np.zeros(table.size, dtype=int)
+  vor_rank[rows[np.argsort(-vor[rows], kind="mergesort")]] = np.arange(1, len(rows) + 1)
+  adp_rank[rows[np.argsort(table.column("avg_pick")[rows], kind="mergesort")]] = np.arange(1, len(rows) + 1)
+  gap = np.where(available, adp_rank - vor_rank, 0)
+  tiers = Tier_Players(vor, pos_num, available, settings["tiers"])
+  return vor, gap, tiers
+
+# Stores every player's VOR, ADP gap and tier in the table's "vor", "adp_gap" and "tier" columns
+def Value_Players(table):
+  print "Calculating value over replacement and tiers"
+  vor, gap, tiers = Player_Values(table)
+  table.column("vor")[:] = np.round(vor, 2)
+  table.column("adp_gap", (), int)[:] = gap
+  table.column("tier", (), int)[:] = tiers
+
+# Returns the key a gamelog row is stored under in a player's current_weeks: the week number, or
+# the game date for rows without one, or failing both the row's spot in the table
+def Week_Key(row, spot):
+  if row.get("week_num"):
+    return "week " + row["week_num"]
+  if row.get("game_date"):
+    return "date " + row["game_date"]
+  return "row {}".format(spot)
+
+# Parses a player's gamelog page into a weeks x labels array of their weekly stat lines, along
+# with the week key of each line (see Week_Key). Cells that aren't plain numbers (ie "Did Not
+# Play") count as zero, and stats missing from a week's row are NaN. Players without a gamelog get
+# an empty array.
+def Keyed_Gamelog_Weeks(game_page, labels):
+  keys = []
+  weeks = []
+  for row in Extract_Table_Rows(game_page, table_id="stats"):
+    if any(label in row for label in labels):
+      keys.append(Week_Key(row, len(keys)))
+      weeks.append([(float(row[label]) if unicode(row[label]).isnumeric() else 0.0) if label in row else np.nan for label in labels])
+  return keys, np.array(weeks, dtype=float).reshape(len(weeks), len(labels))
+
+# Parses a player's gamelog page into a weeks x labels array of their weekly stat lines
+def Gamelog_Weeks(game_page, labels):
+  return Keyed_Gamelog_Weeks(game_page, labels)[1]
 
-        if data[label][0] < comp_stats[label][0]:
-          ranks[label][0] += 1
-        if data[label][1] > comp_stats[label][1]:
-          ranks[label][1] += 1
-    player.set_pfr_ranks(ranks)
+# Collapses a weeks x labels array into [mean, std] per stat label over the weeks that had the
+# stat. Players without any weeks get zeros across the board.
+def Weeks_Stats(weeks, labels):
+  data_dict = {}
+  for col, label in enumerate(labels):
+    arr = weeks[~np.isnan(weeks[:, col]), col] if len(weeks) else []
+    if not len(arr):
+      arr = [0.0]
+    data_dict[label] = [round(np.mean(arr), 2), round(np.std(arr), 2)]
+  return data_dict
+
+# Parses a player's gamelog page into [mean, std] per stat label over the weeks played
+def Gamelog_Stats(game_page, labels):
+  return Weeks_Stats(Gamelog_Weeks(game_page, labels), labels)
+
+# Returns the rows that still need their PFR stats fetched: all of them unless a set of rows to
+# fetch was given (ie only the new players in an incremental run)
+def Rows_To_Fetch(rows, fetch_rows):
+  if fetch_rows is None:
+    return rows
+  return [row for row in rows if row in fetch_rows]
+
+# Function that scrapes RB stats a pro football reference based on the rushing stats page.
+# Only the players in fetch_rows have their gamelogs fetched if it is given, but every RB is
+# ranked and scored.
+def Add_RB_PFR_Stats(table, fetch_rows=None):
+  print "Adding RB PFR Data"
+  rows = table.rows("RB")
+  new_rows = Rows_To_Fetch(rows, fetch_rows)
+  Load_Gamelogs(table, new_rows, Load_PFR_Index("rushing"), rb_stat_labels)
+
+  Rank_Players(table, rows, rb_stat_labels)
 
   # Here three "stats" are calculated:
-  #   - Average points: (avg rush yard * 0.1) + (avg rec yards * 0.1) + (avg rec * 0.5) + (avg rush tds * 6)
+  #   - Average points: the player's average stat line scored with the league weights
   #   - "Expected" points: Average points without the TDs to give a better idea of a general floor
-  #   - Point volatility: crude approximation of point volatility using standard deviation of each stat.
-  # Score values are based on our league rules, like 6 points for a rushing TD.
-  # Receiving yards are excluded because, in my opinion, they don't represent an important enough
-  # component of RB points week to week to be a difference maker when evaluating different players.
+  #   - Point volatility: spread between a +/- N sigma week in each stat, without the TDs.
+  # Score values come from the league settings file, like 6 points for a rushing TD.
+  # The weekly points are then simulated for their floor, ceiling and boom/bust rates.
   print " Calulating expected points"
-  num_dev = 1
-  for player in sorted_player_dict["RB"]:
-    stats = player.get_pfr_stats()
-    rush_yds = stats["rush_yds"]
-    rec = stats["rec"]
-    rec_yds = stats["rec_yds"]
-    rush_td = stats["rush_td"]
-    bad = 0.0
-    avg = 0.0
-    good = 0.0
-    bad += ((rush_yds[0] - (rush_yds[1] * num_dev)) * 0.1)            
-    avg += (rush_yds[0] * 0.1)
-    good += ((rush_yds[0] + (rush_yds[1] * num_dev)) * 0.1)
-    bad += ((rec[0] + (rec[1] * num_dev)) * 0.5)    
-    avg += (rec[0] * 0.5)
-    good += ((rec[0] - (rec[1] * num_dev)) * 0.5)
-    bad += ((rec_yds[0] + (rec_yds[1] * num_dev)) * 0.1)            
-    avg += (rec_yds[0] * 0.1)
-    good += ((rec_yds[0] - (rec_yds[1] * num_dev)) * 0.1)            
-    avg_with_td = avg + (rush_td[0] * 6)
-    player.set_points([avg_with_td, avg, abs(bad - good)])            
+  Score_Players(table, rows, rb_stat_labels)
+  Simulate_Players(table, rows, rb_stat_labels)
 
 # Function that scrapes WR or TE stats a pro football reference based on the receiving stats page.
-def Add_Rec_PFR_Stats(receiver_type):
+def Add_Rec_PFR_Stats(table, receiver_type, fetch_rows=None):
   print "Adding " + receiver_type + " PFR Data"
-  wr_page = "https://www.pro-football-reference.com/years/" + str(curr_year-1) + "/receiving.htm"
-  table_strainer=SoupStrainer("table", id="receiving")
-  wr_page = requests.get(wr_page)
-  wr_soup = BeautifulSoup(wr_page.text, parse_only=table_strainer)
-
-  for player in sorted_player_dict[receiver_type]:
-    name = player.get_name()
-    print name
-    if re.search(" (.+?) ", name) != None:
-      name = re.search("(.+?) ", name).group(1) + " " + re.search(" (.+?) ", name).group(1)
-    pfr = Find_PFR_Entry(wr_soup, name)
-
-    wr_data_dict = {}
-    if pfr and len(pfr) == 1:
-      pfr_page = "https://www.pro-football-reference.com" + str(pfr[0].attrs.get("href") + "/gamelog/" + str(curr_year - 1) + "/")
-      game_strainer = SoupStrainer("table", id="stats")
-      game_page = requests.get(pfr_page)
-      game_soup = BeautifulSoup(game_page.text, parse_only=game_strainer)
-      game_body = game_soup.tbody
-      for label in wr_stat_labels:
-        arr = []
-        wr_data_dict[label] = game_body.find_all("td", {"data-stat": label})
-        for week in wr_data_dict[label]:
-          if week.text.isnumeric():
-            arr.append(float(week.text))
-          else:
-            arr.append(0.0)
-        wr_data_dict[label] = [round(np.mean(arr), 2), round(np.std(arr), 2)]
-    else:
-      for label in wr_stat_labels:
-        wr_data_dict[label] = [0, 0]
-    player.set_pfr_stats(wr_data_dict)
+  rows = table.rows(receiver_type)
+  new_rows = Rows_To_Fetch(rows, fetch_rows)
+  Load_Gamelogs(table, new_rows, Load_PFR_Index("receiving"), wr_stat_labels)
 
-  # Here three "stats" are calculated:
-  #   - Average points: (avg rec yards * 0.1) + (avg rec * 0.5) + (avg rec tds * 5)
+  Rank_Players(table, rows, wr_stat_labels)
+
+  # Here three "stats" are calculated, same as for RBs:
+  #   - Average points: the player's average stat line scored with the league weights
   #   - "Expected" points: Average points without the TDs to give a better idea of a general floor
-  #   - Point volatility: crude approximation of point volatility using standard deviation of each stat.
-  # Score values are based on our league rules, like 5 points for a receiving TD. 
+  #   - Point volatility: spread between a +/- N sigma week in each stat, without the TDs.
   print " Calulating expected points"
-  num_dev = 1
-  for player in sorted_player_dict[receiver_type]:
-    stats = player.get_pfr_stats()
-    rec_yds = stats["rec_yds"]
-    rec = stats["rec"]
-    rec_td = stats["rec_td"]
-    bad = 0.0
-    avg = 0.0
-    good = 0.0
-    bad += ((rec[0] - (rec[1] * num_dev)) * 0.5)    
-    avg += (rec[0] * 0.5)
-    good += ((rec[0] + (rec[1] * num_dev)) * 0.5)
-    bad += ((rec_yds[0] - (rec_yds[1] * num_dev)) * 0.1)            
-    avg += (rec_yds[0] * 0.1)
-    good += ((rec_yds[0] + (rec_yds[1] * num_dev)) * 0.1)            
-    avg_with_td = avg + (rec_td[0] * 5)
-    player.set_points([avg_with_td, avg, abs(bad - good)])            
+  Score_Players(table, rows, wr_stat_labels)
+  Simulate_Players(table, rows, wr_stat_labels)
 
 # Function that scrapes QB stats a pro football reference based on the passing stats page.
-def Add_QB_PFR_Stats():
+def Add_QB_PFR_Stats(table, fetch_rows=None):
   print "Adding QB PFR Data"
-  qb_page = "https://www.pro-football-reference.com/years/" + str(curr_year-1) + "/passing.htm"
-  table_strainer=SoupStrainer("table", id="passing")
-  qb_page = requests.get(qb_page)
-  qb_soup = BeautifulSoup(qb_page.text, parse_only=table_strainer)
-
-  for player in sorted_player_dict["QB"]:
-    name = player.get_name()
-    print name
-    if re.search(" (.+?) ", name) != None:
-      name = re.search("(.+?) ", name).group(1) + " " + re.search(" (.+?) ", name).group(1)
-    pfr = Find_PFR_Entry(qb_soup, name)
- 
-    qb_data_dict = {}
-    if pfr and len(pfr) == 1:
-      pfr_page = "https://www.pro-football-reference.com" + str(pfr[0].attrs.get("href") + "/gamelog/" + str(curr_year - 1) + "/")
-      game_strainer = SoupStrainer("table", id="stats")
-      game_page = requests.get(pfr_page)
-      game_soup = BeautifulSoup(game_page.text, parse_only=game_strainer)
-      game_body = game_soup.tbody
-      for label in qb_stat_labels:
-        arr = []
-        qb_data_dict[label] = game_body.find_all("td", {"data-stat": label})
-        for week in qb_data_dict[label]:
-          if week.text.isnumeric():
-            arr.append(float(week.text))
-          else:
-            arr.append(0.0)
-        qb_data_dict[label] = [round(np.mean(arr), 2), round(np.std(arr), 2)]
+  rows = table.rows("QB")
+  new_rows = Rows_To_Fetch(rows, fetch_rows)
+  Load_Gamelogs(table, new_rows, Load_PFR_Index("passing"), qb_stat_labels)
+
+  Rank_Players(table, rows, qb_stat_labels)
+
+  # Same calculation as for RBs and WRs, but only the average points (TDs included) and the
+  # volatility are passed along since TDs make up such a big part of QB scoring.
+  # Overall volatility is also very high for QBs relative to other positions, almost to the point
+  # of being useless.
+  print " Calulating expected points"
+  Score_Players(table, rows, qb_stat_labels)
+  Simulate_Players(table, rows, qb_stat_labels)
+
+# Returns what a made FG is worth on average for a kicker, from how many of their FGs last season
+# were made from each distance in the PFR kicking table (fgm1 is 0-19 yards up to fgm5 for 50+)
+# and the league's points per FG by distance. Kickers without any makes get the 30-39 yard value.
+def FG_Value(kick_row, fg_points):
+  makes = np.array([float(kick_row.get("fgm{}".format(bucket)) or 0) if kick_row else 0.0 for bucket in range(1, 6)])
+  if makes.sum() == 0:
+    return float(fg_points[2])
+  return float(np.dot(makes, fg_points) / makes.sum())
+
+# Function that scrapes K stats from pro football reference based on the kicking stats page.
+# Weekly XPs and FGs come from each kicker's gamelog. Gamelogs don't break FGs down by distance,
+# so each made FG is scored at the kicker's average FG value from last season's distances (the
+# "fg_dist_pts" stat), and the weekly stats go through the same ranking, scoring and simulation
+# as the other positions.
+def Add_K_PFR_Stats(table, fetch_rows=None):
+  print "Adding K PFR Data"
+  rows = table.rows("K")
+  Load_K_Gamelogs(table, Rows_To_Fetch(rows, fetch_rows))
+
+  Rank_Players(table, rows, k_stat_labels)
+  print " Calulating expected points"
+  Score_Players(table, rows, k_stat_labels)
+  Simulate_Players(table, rows, k_stat_labels)
+
+# Returns a derive(row, weeks) function (see Load_Gamelogs) that fills in kickers' FG points by
+# distance from their FG distances in last season's kicking table
+def K_Derive(table):
+  kick_rows = dict((entry["href"], entry["row"]) for entry in Load_PFR_Index("kicking")["entries"])
+  fg_points = np.array(Load_League_Settings()["fg_distance_points"], dtype=float)
+
+  def derive(row, weeks):
+    weeks[:, k_stat_labels.index("fg_dist_pts")] = np.nan_to_num(weeks[:, k_stat_labels.index("fgm")]) * FG_Value(kick_rows.get(table.pfr_href[row]), fg_points)
+    return weeks
+  return derive
+
+# Loads the kickers' gamelogs in the given rows, with FG points by distance filled in
+def Load_K_Gamelogs(table, rows):
+  Load_Gamelogs(table, rows, Load_PFR_Index("kicking"), k_stat_labels, K_Derive(table))
+
+# PFR team page codes by Yahoo team code, for the team gamelog URLs
+pfr_team_pages = {"ARI": "crd", "ATL": "atl", "BAL": "rav", "BUF": "buf", "CAR": "car", "CHI": "chi", "CIN": "cin", "CLE": "cle",
+                  "DAL": "dal", "DEN": "den", "DET": "det", "GB": "gnb", "HOU": "htx", "IND": "clt", "JAX": "jax", "KC": "kan",
+                  "LAC": "sdg", "LAR": "ram", "LV": "rai", "MIA": "mia", "MIN": "min", "NE": "nwe", "NO": "nor", "NYG": "nyg",
+                  "NYJ": "nyj", "PHI": "phi", "PIT": "pit", "SEA": "sea", "SF": "sfo", "TB": "tam", "TEN": "oti", "WAS": "was"}
+
+# Builds the PFR team gamelog URL for a Yahoo team code for the given year, or None for an
+# unknown team
+def Team_Gamelog_Url(team, year):
+  if team.upper() not in pfr_team_pages:
+    return None
+  return "https://www.pro-football-reference.com/teams/" + pfr_team_pages[team.upper()] + "/" + str(year) + "/gamelog/"
+
+# Where the weekly DEF stats live in a PFR team gamelog page: label -> (table, data-stats that are
+# added up). The "gamelog" table is the team's own games (points allowed is in there) and
+# "gamelog_opp" is what opponents did against them, so opponent sacks taken and turnovers are
+# the defense's sacks and takeaways.
+def_gamelog_stats = {"pts_def": ("gamelog", ["pts_def"]), "def_sacks": ("gamelog_opp", ["pass_sacked"]),
+                     "def_to": ("gamelog_opp", ["pass_int", "fumbles_lost"])}
+
+# Parses a PFR team gamelog page into a weeks x def_stat_labels array, along with the week key
+# of each week (see Week_Key). The team and opponent tables are lined up by week and "pa_pts" is
+# the league's points for each week's points allowed, looked up for every week at once with
+# np.digitize over the points allowed bins.
+def Keyed_Team_Gamelog_Weeks(team_page, year, settings):
+  games = {}
+  for table_name in set(table_name for table_name, stats in def_gamelog_stats.values()):
+    for row in Extract_Table_Rows(team_page, table_id=table_name + str(year)):
+      if row.get("week_num"):
+        games.setdefault(row["week_num"], {})[table_name] = row
+  order = sorted(games, key=lambda week: int(week) if week.isdigit() else 99)
+  weeks = np.zeros((len(games), len(def_stat_labels)))
+  for spot, week in enumerate(order):
+    for label, (table_name, stats) in def_gamelog_stats.items():
+      row = games[week].get(table_name, {})
+      weeks[spot, def_stat_labels.index(label)] = sum(float(row[stat]) for stat in stats if unicode(row.get(stat, "")).isnumeric())
+  allowed = settings["points_allowed"]
+  buckets = np.digitize(weeks[:, def_stat_labels.index("pts_def")], allowed["bins"])
+  weeks[:, def_stat_labels.index("pa_pts")] = np.array(allowed["points"], dtype=float)[buckets]
+  return ["week " + week for week in order], weeks
+
+# Parses a PFR team gamelog page into a weeks x def_stat_labels array
+def Team_Gamelog_Weeks(team_page, year, settings):
+  return Keyed_Team_Gamelog_Weeks(team_page, year, settings)[1]
+
+# Loads the team gamelogs of the defenses in the given rows, parsing each page as it comes in.
+# Teams without a PFR page or whose page failed to download get no weeks.
+def Load_Team_Gamelogs(table, rows):
+  settings = Load_League_Settings()
+  team_rows = {}
+  for row in rows:
+    url = Team_Gamelog_Url(table.teams[row], curr_year - 1)
+    if url is None:
+      identity_issues.append(["pfr", table.names[row], "DEF", table.teams[row], "unmatched", "", ""])
     else:
-      for label in qb_stat_labels:
-        qb_data_dict[label] = [0, 0]
-    player.set_pfr_stats(qb_data_dict)
+      team_rows.setdefault(url, []).append(row)
+    table.weeks[row] = np.zeros((0, len(def_stat_labels)))
+  print " Fetching {} team gamelogs".format(len(team_rows))
+  for url, page in Stream_Pages(team_rows.keys()):
+    if page:
+      weeks = Team_Gamelog_Weeks(page, curr_year - 1, settings)
+      for row in team_rows[url]:
+        table.weeks[row] = weeks
+  for row in rows:
+    table.set_stats(row, Weeks_Stats(table.weeks[row], def_stat_labels))
 
-  # Here three "stats" are calculated:
-  #   - Average points: (avg pass completions * 0.25) + (avg pass yards * 0.04) + (avg pass tds * 4) - (avg ints * 2)
-  #   - "Expected" points: Average points without the TDs to give a better idea of a general floor
-  #   - Point volatility: crude approximation of point volatility using standard deviation of each stat.
-  # Score values are based on our league rules, like 4 points for a passing TD. 
-  # The total avg points aren't currently passed along as they are so volatile for QBs generally.
-  # Overall volatility is also very high for QBs relative to other positions, almost to the point of being useless.
+# Function that scrapes DEF stats from the PFR team gamelogs (points allowed, sacks and
+# takeaways by week) and ranks, scores and simulates them like every other position
+def Add_DEF_PFR_Stats(table, fetch_rows=None):
+  print "Adding DEF PFR Data"
+  rows = table.rows("DEF")
+  Load_Team_Gamelogs(table, Rows_To_Fetch(rows, fetch_rows))
+
+  Rank_Players(table, rows, def_stat_labels)
   print " Calulating expected points"
-  num_dev = 1
-  for player in sorted_player_dict["QB"]:
-    stats = player.get_pfr_stats()
-    pass_yds = stats["pass_yds"]
-    pass_cmp = stats["pass_cmp"]
-    pass_td = stats["pass_td"]
-    ints = stats["pass_int"]
-    bad = 0.0
-    avg = 0.0
-    good = 0.0
-    bad += ((pass_cmp[0] - (pass_cmp[1] * num_dev)) * 0.25)   
-    avg += (pass_cmp[0] * 0.25)
-    good += ((pass_cmp[0] + (pass_cmp[1] * num_dev)) * 0.25)
-    bad += ((pass_yds[0] - (pass_yds[1] * num_dev)) * 0.04)           
-    avg += (pass_yds[0] * 0.04)
-    good += ((pass_yds[0] + (pass_yds[1] * num_dev)) * 0.04)             
-    bad += ((pass_td[0] - (pass_td[1] * num_dev)) * 4.0)            
-    avg += (pass_td[0] * 4.0)
-    good += ((pass_td[0] + (pass_td[1] * num_dev)) * 4.0)            
-    bad += ((ints[0] + (ints[1] * num_dev)) * -2.0)            
-    avg += (ints[0] * -2.0)
-    good += ((ints[0] + (ints[1] * num_dev)) * -2.0)            
-
-    player.set_points([avg, abs(bad - good)])            
+  Score_Players(table, rows, def_stat_labels)
+  Simulate_Players(table, rows, def_stat_labels)
 
 # Function that scrapes DEF DVOA stats from football outsiders
-def Add_DEF_DVOA():
+def Add_DEF_DVOA(table):
   print "Adding DEF DVOA Data"
   ovr_rank = 0
   pass_rank = 7
   run_rank = 9
   def_page = "https://www.footballoutsiders.com/stats/nfl/team-defense/" + str(curr_year - 1) 
-  table_strainer = SoupStrainer("table", {"class":"sticky-headers sortable stats"})
-  def_page = requests.get(def_page)
-  def_soup = BeautifulSoup(def_page.text, parse_only=table_strainer)
-  defenses = []
-  trs = def_soup.find_all("tr")
-  for tr in trs:
-    th = tr.find("td")
-    if th != None:
-      defenses.append(tr)
-  for player in sorted_player_dict["DEF"]:
-    for defense in defenses:
-      def_stats = defense.find_all("td")
-      if def_stats[1].text == player.get_team():
-        player.set_dvoa([def_stats[ovr_rank].text, def_stats[pass_rank].text, def_stats[run_rank].text])
+  def_page = Fetch_Page(def_page)
+  defenses = dict((def_stats[1], def_stats) for def_stats in Extract_Table_Rows(def_page, table_class="sticky-headers sortable stats"))
+  for row in table.rows("DEF"):
+    codes = [code for code in Team_Codes(table.teams[row]) if code in defenses]
+    if not codes:
+      identity_issues.append(["dvoa", table.names[row], "DEF", table.teams[row], "unmatched", "", ""])
+      continue
+    def_stats = defenses[codes[0]]
+    table.dvoa[row] = [def_stats[ovr_rank], def_stats[pass_rank], def_stats[run_rank]]
+
+# Settings for the historical backfill. Each season is written to its own file under
+# history_dir, and backfill_workers is the size of the process pool used to parse gamelogs
+# (None uses every core). Gamelogs are handed to the pool backfill_chunk pages at a time.
+history_dir = os.path.join(os.getcwd(), "football_history")
+backfill_workers = None
+backfill_chunk = 256
+backfill_tables = [("passing", "QB"), ("rushing", "RB"), ("receiving", "WR")]
+
+# Process pool worker for the backfill, parses one gamelog page. The worker's run_metrics is its
+# own copy, so the parse time and rows it recorded are sent back with the stats for the parent to
+# add to its own.
+def Backfill_Parse(args):
+  url, game_page, labels = args
+  before = dict(run_metrics.parse)
+  stats = Gamelog_Stats(game_page, labels)
+  return url, stats, dict((key, run_metrics.parse[key] - before[key]) for key in before)
+
+# Writes a season's player table as a columnar dataset: one array per column in a .npz file.
+# The file is written under a temporary name first so a season is only ever present when it's
+# complete.
+def Write_Season_Dataset(table, path):
+  columns = {"name": np.array(table.names, dtype=unicode), "team": np.array(table.teams, dtype=unicode),
+             "pos": np.array(table.pos, dtype=unicode), "pfr_href": np.array([href or "" for href in table.pfr_href], dtype=unicode)}
+  for name, values in table.columns.items():
+    columns[name] = values[:table.size]
+  with open(path + ".tmp", "wb") as out:
+    np.savez_compressed(out, **columns)
+  os.rename(path + ".tmp", path)
+
+# Scrapes and scores every player in one season's PFR rushing, receiving and passing tables.
+# Players are taken from the season tables themselves (there is no ADP for past seasons) and
+# placed by the position PFR lists for them, falling back to the table's position. Gamelogs are
+# streamed in with the usual thread pool and handed to a process pool in chunks as they arrive:
+# one chunk is parsed while the next is downloaded, so at most two chunks of pages are held at
+# once. The parsed stats are ranked and scored per position with the same vectorized stages as a
+# normal run.
+def Backfill_Season(year, pool):
+  table = PlayerTable()
+  seen = set()
+  for table_name, default_pos in backfill_tables:
+    for row in Extract_Table_Rows(Fetch_Page(Season_Table_Url(table_name, year)), table_id=table_name):
+      href = row.get("player@href")
+      csk = row.get("player@csk")
+      if href is None or href in seen or csk is None or "," not in csk:
+        continue
+      seen.add(href)
+      pos = re.sub("[^A-Z]", "", row.get("pos", "").upper())
+      if pos not in ("RB", "WR", "TE", "QB"):
+        pos = default_pos
+      last, first = csk.split(",", 1)
+      added = table.add_player(unidecode.unidecode(unicode(first + " " + last)), row.get("team", ""), pos, np.nan, np.nan)
+      table.pfr_href[added] = href
+
+  print " Fetching {} gamelogs for {}".format(table.size, year)
+  url_rows = {}
+  for row, href in enumerate(table.pfr_href):
+    url_rows.setdefault(Gamelog_Url(href, year), []).append(row)
+  pages = Stream_Pages(url_rows.keys())
+  parsing = []
+  while True:
+    chunk = [(url, page, pos_stat_labels[table.pos[url_rows[url][0]]]) for url, page in itertools.islice(pages, backfill_chunk)]
+    for url, stats, parse in parsing:
+      run_metrics.merge_parse(parse)
+      for row in url_rows[url]:
+        table.set_stats(row, stats)
+    if not chunk:
+      break
+    parsing = pool.imap_unordered(Backfill_Parse, chunk, chunksize=16)
+
+  for pos in ["RB", "WR", "TE", "QB"]:
+    rows = table.rows(pos)
+    if len(rows):
+      Rank_Players(table, rows, pos_stat_labels[pos])
+      Score_Players(table, rows, pos_stat_labels[pos])
+  return table
+
+# Backfills per-player stats and points for a range of seasons (inclusive) into history_dir.
+# Seasons that are already there are skipped, so re-running a range only does the missing ones.
+def Backfill_History(first_year, last_year):
+  if not os.path.isdir(history_dir):
+    os.makedirs(history_dir)
+  pool = multiprocessing.Pool(backfill_workers)
+  try:
+    for year in range(first_year, last_year + 1):
+      path = os.path.join(history_dir, "{}.npz".format(year))
+      if os.path.isfile(path):
+        print "Season {} already backfilled, skipping".format(year)
+        continue
+      print "Backfilling season {}".format(year)
+      with run_metrics.stage("backfill_{}".format(year)):
+        table = Backfill_Season(year, pool)
+      if table.size == 0:
+        print "No players found for season {}, not writing it".format(year)
+        continue
+      Write_Season_Dataset(table, path)
+      Save_Cache()
+      print "Season {} written to {}".format(year, path)
+  finally:
+    pool.close()
+    pool.join()
+
+# File the run state (the full player table) is saved to after every run
+def State_File():
+  return os.path.join(os.getcwd(), "football_state_{}.pkl".format(curr_year))
+
+# Lines up the players in a new table with the same players in an old one, returning a dict of
+# new row -> old row. Players are matched by name and position, or by name, position and team
+# when the name and position are shared. A player whose key is still shared by more than one
+# player in either table isn't matched at all, so they get fetched again instead of taking
+# someone else's stats.
+def Match_Old_Rows(table, old_table):
+  def Keys(player_table, row):
+    name = Normalize_Name(player_table.names[row])
+    return [(name, player_table.pos[row]), (name, player_table.pos[row], player_table.teams[row])]
+  old_rows = {}
+  for row in range(old_table.size):
+    for key in Keys(old_table, row):
+      old_rows.setdefault(key, []).append(row)
+  new_counts = {}
+  for row in range(table.size):
+    for key in Keys(table, row):
+      new_counts[key] = new_counts.get(key, 0) + 1
+
+  matches = {}
+  for row in range(table.size):
+    for key in Keys(table, row):
+      if len(old_rows.get(key, [])) == 1 and new_counts[key] == 1:
+        matches[row] = old_rows[key][0]
+        break
+  return matches
+
+# Refreshes a saved run with the latest Yahoo ADP. The draft analysis pages are pulled again and
+# every player that was already in the saved table keeps their PFR href and stats, so gamelogs
+# are only fetched for players that are new to the top total_players (or that can't be told apart
+# from another player, see Match_Old_Rows). Ranks and points are then recomputed for the merged
+# table, which is cheap.
+def Refresh_Table(old_table):
+  table = PlayerTable()
+  with run_metrics.stage("yahoo"):
+    Add_Yahoo_Stats(table, max_age=0)
+  matches = Match_Old_Rows(table, old_table)
+  new_rows = set()
+  for row in range(table.size):
+    if row in matches:
+      table.copy_player(row, old_table, matches[row])
+    else:
+      new_rows.add(row)
+  print "{} players are new since the last run".format(len(new_rows))
+
+  with run_metrics.stage("pfr_rb"):
+    Add_RB_PFR_Stats(table, new_rows)
+  with run_metrics.stage("pfr_wr"):
+    Add_Rec_PFR_Stats(table, "WR", new_rows)
+  with run_metrics.stage("pfr_te"):
+    Add_Rec_PFR_Stats(table, "TE", new_rows)
+  with run_metrics.stage("pfr_qb"):
+    Add_QB_PFR_Stats(table, new_rows)
+  with run_metrics.stage("pfr_k"):
+    Add_K_PFR_Stats(table, new_rows)
+  with run_metrics.stage("pfr_def"):
+    Add_DEF_PFR_Stats(table, new_rows)
+  with run_metrics.stage("def_dvoa"):
+    Add_DEF_DVOA(table)
+  with run_metrics.stage("value"):
+    Value_Players(table)
+  return table
+
+# Season stat tables used to find each position's players on PFR
+pos_season_tables = {"RB": "rushing", "WR": "receiving", "TE": "receiving", "QB": "passing", "K": "kicking"}
+
+# Loads the weekly stats of the players at a position in the given rows, from wherever that
+# position's stats come from
+def Load_Position_Stats(table, pos, rows):
+  if pos == "K":
+    Load_K_Gamelogs(table, rows)
+  elif pos == "DEF":
+    Load_Team_Gamelogs(table, rows)
+  else:
+    Load_Gamelogs(table, rows, Load_PFR_Index(pos_season_tables[pos]), pos_stat_labels[pos])
+
+# Settings for streaming runs: players go through the pipeline stream_chunk at a time (a Yahoo
+# page worth) and the output is written to football_stream_<year>_<time>.csv
+stream_chunk = 50
+stream_headers = (["Name", "Team", "Pos", "Avg Pick", "Avg Round", "Pos Rank"] + [label + " avg" for label in all_stat_labels] +
+                  ["Avg Total Points", "Avg Exp Points", "Point Volatility"] + sim_headers + ["Overall DVOA Rank", "Pass DVOA Rank", "Run DVOA Rank"])
+
+# Returns a player's row in the streamed CSV. Stats that aren't part of the player's position are
+# left blank.
+def Stream_Row(table, row):
+  labels = pos_stat_labels[table.pos[row]]
+  player_write = [table.names[row], table.teams[row], table.pos[row], table.column("avg_pick")[row], table.column("avg_round")[row], table.pos_count[row]]
+  player_write.extend([str(table.column(label + "_mean")[row]) if label in labels else "" for label in all_stat_labels])
+  player_write.extend(table.column("points", (3,))[row])
+  player_write.extend(table.column("sim_points", (6,))[row])
+  player_write.extend(table.dvoa[row] or [None, None, None])
+  return player_write
+
+# Runs the pipeline as a stream, for player pools too big to keep around whole. Players come off
+# the Yahoo pages stream_chunk at a time and each chunk gets its own small table that goes
+# through fetch -> parse -> score -> simulate and is written out and flushed before the next
+# chunk is read, so memory stays flat however many players there are and the output fills in
+# while the run goes. Ranks, VOR and tiers compare every player at a position against each other,
+# so they're left out of streaming runs along with the saved state and exports.
+def Stream_Pipeline():
+  player_file = os.path.join(os.getcwd(), "football_stream_{}_{}.csv".format(curr_year, int(time.time())))
+  pos_counts = dict((pos, 0) for pos in positions)
+  players = Yahoo_Players()
+  player_count = 0
+  with run_metrics.stage("stream"):
+    with open(player_file, "wb") as csvfile:
+      file_writer = csv.writer(csvfile, delimiter=',')
+      file_writer.writerow(stream_headers)
+      while True:
+        chunk = list(itertools.islice(players, stream_chunk))
+        if not chunk:
+          break
+        table = PlayerTable()
+        for player in chunk:
+          row = table.add_player(*player)
+          # Positional ranks carry on from the earlier chunks
+          pos_counts[table.pos[row]] += 1
+          table.pos_count[row] = table.pos[row] + str(pos_counts[table.pos[row]])
+        for pos in positions:
+          rows = table.rows(pos)
+          if len(rows):
+            Load_Position_Stats(table, pos, rows)
+            Score_Players(table, rows, pos_stat_labels[pos])
+            Simulate_Players(table, rows, pos_stat_labels[pos])
+        if len(table.rows("DEF")):
+          Add_DEF_DVOA(table)
+        for row in range(table.size):
+          file_writer.writerow(Stream_Row(table, row))
+        csvfile.flush()
+        player_count += table.size
+        print "{} players written to {}".format(player_count, player_file)
+  Save_Cache()
+  Save_Identity_Map()
+  Write_Identity_Report()
+  Clear_Checkpoint()
+
+# In-season weekly updates. Every player in the saved table (the draft pool, which covers the
+# rostered players and the free agents worth a look) has this season's gamelog checked for weeks
+# that aren't in their current_weeks yet. Weeks are matched up by week number (see Week_Key), not
+# by how many are stored, so rows added or moved around on the page don't throw the refresh off.
+# Only the new weeks are stored and folded into running per-stat counts, means and M2
+# ("<label>_wk_count", "<label>_wk_mean", "<label>_wk_m2") with Welford's method, and into a
+# running recency weighted sum of weekly points ("recent_points", [weighted points, total
+# weight]) that decays by the league's recency_decay every week. So a refresh after a week of
+# games only does a week's worth of work per player, however far into the season it is.
+
+# Folds new values into running counts, means and M2 (sum of squared deviations from the mean)
+# with Welford's online update. Works elementwise over arrays of any shape, and NaN values (stats
+# missing from a week) leave their running stats as they were.
+def Welford_Update(count, mean, m2, values):
+  seen = ~np.isnan(values)
+  values = np.where(seen, values, 0.0)
+  count = count + seen
+  delta = np.where(seen, values - mean, 0.0)
+  mean = mean + delta / np.maximum(count, 1)
+  m2 = m2 + np.where(seen, delta * (values - mean), 0.0)
+  return count, mean, m2
+
+# Folds the new weeks of the players at a position (row -> new weeks x labels array) into their
+# running stats and recency weighted points. All of the players' first new week is done at once,
+# then all of their second and so on (a regular weekly refresh only has one).
+def Fold_Weeks(table, new_weeks, labels):
+  if not new_weeks:
+    return
+  settings = Load_League_Settings()
+  decay = settings["weekly"]["recency_decay"]
+  weights, no_td_weights = Score_Weights(labels, settings)
+  rows = np.array(sorted(new_weeks), dtype=int)
+  count = np.column_stack([table.column(label + "_wk_count")[rows] for label in labels])
+  mean = np.column_stack([table.column(label + "_wk_mean")[rows] for label in labels])
+  m2 = np.column_stack([table.column(label + "_wk_m2")[rows] for label in labels])
+  recent = table.column("recent_points", (2,))[rows]
+  last = table.column("last_points")[rows]
+  for week in range(max(len(weeks) for weeks in new_weeks.values())):
+    values = np.full((len(rows), len(labels)), np.nan)
+    for spot, row in enumerate(rows):
+      if week < len(new_weeks[row]):
+        values[spot] = new_weeks[row][week]
+    count, mean, m2 = Welford_Update(count, mean, m2, values)
+    played = ~np.isnan(values).all(axis=1)
+    week_points = np.dot(np.nan_to_num(values), weights)
+    recent[:, 0] = np.where(played, recent[:, 0] * decay + week_points, recent[:, 0])
+    recent[:, 1] = np.where(played, recent[:, 1] * decay + 1.0, recent[:, 1])
+    last = np.where(played, week_points, last)
+  for col, label in enumerate(labels):
+    table.column(label + "_wk_count")[rows] = count[:, col]
+    table.column(label + "_wk_mean")[rows] = mean[:, col]
+    table.column(label + "_wk_m2")[rows] = m2[:, col]
+  table.column("recent_points", (2,))[rows] = recent
+  table.column("last_points")[rows] = last
+
+# Scores every player's season so far from their running stats into the "week_points" column
+# (avg total, avg without TDs, volatility, like "points") and works out their projection for the
+# coming week: the recency weighted average of their weekly points, with last season's average
+# points counted as prior_weight weeks' worth on top (players without a last season go on this
+# season alone).
+def Project_Players(table):
+  settings = Load_League_Settings()
+  weekly = settings["weekly"]
+  for pos in positions:
+    rows = table.rows(pos)
+    labels = pos_stat_labels[pos]
+    means = np.column_stack([table.column(label + "_wk_mean")[rows] for label in labels])
+    counts = np.column_stack([table.column(label + "_wk_count")[rows] for label in labels])
+    stds = np.sqrt(np.column_stack([table.column(label + "_wk_m2")[rows] for label in labels]) / np.maximum(counts, 1))
+    weights, no_td_weights = Score_Weights(labels, settings)
+    avg, no_td, volatility = Score_Matrix(means, stds, weights, no_td_weights, settings["volatility_devs"])
+    table.column("week_points", (3,))[rows] = np.column_stack([avg, no_td, volatility])
+  recent = table.column("recent_points", (2,))
+  has_prior = np.array([weeks is not None and len(weeks) > 0 for weeks in table.weeks], dtype=bool)
+  prior_weight = np.where(has_prior, weekly["prior_weight"], 0.0)
+  total_weight = prior_weight + recent[:, 1]
+  projection = (prior_weight * table.column("points", (3,))[:, 0] + recent[:, 0]) / np.maximum(total_weight, 1e-9)
+  table.column("projection")[:] = np.round(np.where(total_weight > 0, projection, 0.0), 2)
+
+# Checks this season's gamelogs for every player in the table and folds in any weeks that are new
+# since the last update. Players without a PFR page from last season (ie rookies) are looked up
+# in this season's tables. Pages are parsed as they come in and only the weeks that aren't stored
+# yet are kept, in the order they are on the page.
+def Weekly_Update(table):
+  settings = Load_League_Settings()
+  for pos in positions:
+    rows = table.rows(pos)
+    labels = pos_stat_labels[pos]
+    if not len(rows):
+      continue
+    print "Updating {} {} gamelogs".format(pos, curr_year)
+    urls = {}
+    for row in rows:
+      if pos == "DEF":
+        url = Team_Gamelog_Url(table.teams[row], curr_year)
+      else:
+        if table.pfr_href[row] is None:
+          table.pfr_href[row] = Resolve_PFR_Player(table, row, Load_PFR_Index(pos_season_tables[pos], curr_year))
+        url = Gamelog_Url(table.pfr_href[row], curr_year) if table.pfr_href[row] else None
+      if url:
+        urls.setdefault(url, []).append(row)
+    derive = K_Derive(table) if pos == "K" else None
+
+    new_weeks = {}
+    for url, page in Stream_Pages(urls.keys()):
+      if page is None:
+        continue
+      keys, weeks = Keyed_Team_Gamelog_Weeks(page, curr_year, settings) if pos == "DEF" else Keyed_Gamelog_Weeks(page, labels)
+      for row in urls[url]:
+        stored = dict(table.current_weeks[row] or {})
+        fresh_keys = []
+        for key in keys:
+          if key not in stored and key not in fresh_keys:
+            fresh_keys.append(key)
+        if not fresh_keys:
+          continue
+        fresh = weeks[[keys.index(key) for key in fresh_keys]]
+        if derive is not None:
+          fresh = derive(row, fresh)
+        new_weeks[row] = fresh
+        stored.update(zip(fresh_keys, fresh))
+        table.current_weeks[row] = stored
+    print " {} players have new weeks".format(len(new_weeks))
+    Fold_Weeks(table, new_weeks, labels)
+  Project_Players(table)
+
+# Writes the weekly start/sit sheet: every position's players ordered by their projection for
+# the coming week, with their season so far next to it
+def Write_Weekly_CSV(table):
+  player_file = os.path.join(os.getcwd(), "football_weekly_{}_{}.csv".format(curr_year, int(time.time())))
+  week_points = table.column("week_points", (3,))
+  with open(player_file, "wb") as csvfile:
+    file_writer = csv.writer(csvfile, delimiter=',')
+    file_writer.writerow(["Name", "Team", "Pos Rank", "Games"])
+    for pos in positions:
+      labels = pos_stat_labels[pos]
+      file_writer.writerow([pos, "", "", ""] + [label + " avg" for label in labels] +
+                           ["Avg Total Points", "Avg Exp Points", "Point Volatility", "Last Week Points", "Last Season Points", "Projection"])
+      rows = table.rows(pos)
+      for row in rows[np.argsort(-table.column("projection")[rows], kind="mergesort")]:
+        player_write = [table.names[row], table.teams[row], table.pos_count[row], len(table.current_weeks[row]) if table.current_weeks[row] is not None else 0]
+        player_write.extend([round(table.column(label + "_wk_mean")[row], 2) for label in labels])
+        player_write.extend(np.round(week_points[row], 2))
+        player_write.extend([round(table.column("last_points")[row], 2), round(table.column("points", (3,))[row, 0], 2), table.column("projection")[row]])
+        file_writer.writerow(player_write)
+      file_writer.writerow([])
+  print "File {} written.".format(player_file)
+
+# Runs a weekly update on the saved table from this season's preseason run
+def Weekly_Pipeline():
+  if not os.path.isfile(State_File()):
+    print "No saved run at {}, run the script once before the season first.".format(State_File())
+    return
+  table = PlayerTable.load(State_File())
+  with run_metrics.stage("weekly"):
+    Weekly_Update(table)
+  with run_metrics.stage("write"):
+    table.save(State_File())
+    Save_Cache()
+    Save_Identity_Map()
+    Write_Weekly_CSV(table)
+    Write_Identity_Report()
 
 # Function that writes player list with stats to a CSV file in local directory.
-# The "sort_type" parameter determines if players are listed by position or if its a raw list of all positions.
-def Write_CSV(sort_type):
-  global player_list
+# The "sort_type" parameter determines if players are listed by position or if its a raw list of
+# all positions.
+def Write_CSV(table, sort_type):
   print "Starting CSV Write"
   headers = ["Name", "Team", "Avg Pick", "Avg Round", "Pos Rank"]
   curr_dir = os.getcwd()
@@ -434,71 +1982,58 @@ def Write_CSV(sort_type):
   csvfile = open(player_file, "wb")
   file_writer = csv.writer(csvfile, delimiter=',')
   file_writer.writerow(headers)
-  pos_order = ["RB", "WR", "TE", "QB", "K", "DEF"]
+  avg_pick = table.column("avg_pick")
+  avg_round = table.column("avg_round")
+  points = table.column("points", (3,))
+  sim_points = table.column("sim_points", (6,))
+  vor = table.column("vor")
+  adp_gap = table.column("adp_gap", (), int)
+  tier = table.column("tier", (), int)
 
   if sort_type == 0:
-    for player in player_list:
-      player_list = []
-      player_list.append(player.name)
-      player_list.append(player.team)
-      player_list.append(player.avg_pick)
-      player_list.append(player.avg_round)
-      player_list.append(player.pos_count)
-      file_writer.writerow(player_list)
+    for row in range(table.size):
+      file_writer.writerow([table.names[row], table.teams[row], avg_pick[row], avg_round[row], table.pos_count[row]])
 
   elif sort_type == 1:
-    for pos in pos_order:
+    for pos in positions:
       print pos
       sub_header = [pos] + ["" for x in range(len(headers)-1)]
-      if pos == "RB":
-        for label in rb_stat_labels:
-          sub_header.append(label + " avg")
-      elif pos == "WR" or pos == "TE":
-        for label in wr_stat_labels:
-          sub_header.append(label + " avg")
-      elif pos == "QB":
-        for label in qb_stat_labels:
-          sub_header.append(label + " avg")
-      if pos != "QB" and pos != "DEF":
+      for label in pos_stat_labels.get(pos, []):
+        sub_header.append(label + " avg")
+      for label in pos_stat_labels.get(pos, []):
+        sub_header.append(label + " rank")
+      if pos != "QB":
         sub_header.append("Avg Total Points")
-      if pos != "DEF":
-        sub_header.append("Avg Exp Points")
-        sub_header.append("Point Volatility")
-      else:
+      sub_header.append("Avg Exp Points")
+      sub_header.append("Point Volatility")
+      sub_header.extend(sim_headers)
+      sub_header.extend(["VOR", "ADP Gap", "Tier"])
+      if pos == "DEF":
         sub_header.append("Overall DVOA Rank")
         sub_header.append("Pass DVOA Rank")
         sub_header.append("Run DVOA Rank")
       file_writer.writerow(sub_header)
 
-      for player in sorted_player_dict[pos]:
+      for row in table.rows(pos):
         player_write = []
-        player_write.append(player.name)
-        player_write.append(player.team)
-        player_write.append(player.avg_pick)
-        player_write.append(player.avg_round)
-        player_write.append(player.pos_count)
-        if player.get_pos() == "DEF":
-          stats = player.get_dvoa()
-          player_write.append(stats[0])
-          player_write.append(stats[1])
-          player_write.append(stats[2])
+        player_write.append(table.names[row])
+        player_write.append(table.teams[row])
+        player_write.append(avg_pick[row])
+        player_write.append(avg_round[row])
+        player_write.append(table.pos_count[row])
+        for label in pos_stat_labels.get(pos, []):
+          player_write.append(str(table.column(label + "_mean")[row]))
+        for label in pos_stat_labels.get(pos, []):
+          player_write.append(table.column(label + "_rank", (2,), int)[row, 0])
+        # QBs only get their average points (TDs included) and volatility
+        if pos == "QB":
+          player_write.extend([points[row, 0], points[row, 2]])
         else:
-          stat_dict = player.get_pfr_stats()
-          points = player.get_points()
-          if pos == "RB":
-            for label in rb_stat_labels:
-              stat = stat_dict[label]
-              player_write.append(str(stat[0]))
-          elif pos == "WR" or pos == "TE":
-            for label in wr_stat_labels:
-              stat = stat_dict[label]
-              player_write.append(str(stat[0]))
-          elif pos == "QB":
-            for label in qb_stat_labels:
-              stat = stat_dict[label]
-              player_write.append(str(stat[0]))
-          for point in points:
-            player_write.append(point)
+          player_write.extend(points[row])
+        player_write.extend(sim_points[row])
+        player_write.extend([vor[row], adp_gap[row], tier[row]])
+        if pos == "DEF":
+          player_write.extend(table.dvoa[row] or [None, None, None])
 
         file_writer.writerow(player_write)
       file_writer.writerow([])
@@ -506,34 +2041,207 @@ def Write_CSV(sort_type):
   csvfile.close()
   print "File {} written.".format(player_file)
 
+# Flattens the player table into the export schema: one row per player with every column typed,
+# position as a column and the same columns for every position (stats a position doesn't have
+# are zero). DVOA ranks are numbers, NaN for players without one. Returns an ordered list of
+# (column name, numpy array).
+export_formats = ["csv", "npy", "arrow", "parquet"]
+def Export_Columns(table):
+  columns = [("name", np.array(table.names, dtype=unicode)),
+             ("team", np.array(table.teams, dtype=unicode)),
+             ("position", np.array(table.pos, dtype=unicode)),
+             ("pos_rank", np.array(table.pos_count, dtype=unicode)),
+             ("pfr_href", np.array([href or "" for href in table.pfr_href], dtype=unicode)),
+             ("avg_pick", table.column("avg_pick").copy()),
+             ("avg_round", table.column("avg_round").copy())]
+  for label in all_stat_labels:
+    columns.append((label + "_mean", table.column(label + "_mean").copy()))
+    columns.append((label + "_std", table.column(label + "_std").copy()))
+    columns.append((label + "_rank", table.column(label + "_rank", (2,), int)[:, 0].copy()))
+  points = table.column("points", (3,))
+  columns.append(("points_total", points[:, 0].copy()))
+  columns.append(("points_no_td", points[:, 1].copy()))
+  columns.append(("points_volatility", points[:, 2].copy()))
+  sim_points = table.column("sim_points", (6,))
+  for spot, name in enumerate(["sim_floor", "sim_median", "sim_ceiling", "sim_boom_rate", "sim_bust_rate", "sim_risk_adjusted"]):
+    columns.append((name, sim_points[:, spot].copy()))
+  columns.append(("vor", table.column("vor").copy()))
+  columns.append(("adp_gap", table.column("adp_gap", (), int).copy()))
+  columns.append(("tier", table.column("tier", (), int).copy()))
+  for spot, name in enumerate(["dvoa_total_rank", "dvoa_pass_rank", "dvoa_run_rank"]):
+    ranks = np.full(table.size, np.nan)
+    for row, dvoa in enumerate(table.dvoa):
+      if dvoa is not None and re.match("^\d+$", dvoa[spot] or ""):
+        ranks[row] = float(dvoa[spot])
+    columns.append((name, ranks))
+  return columns
+
+# Writes the export columns as a flat CSV with a single header row
+def Write_Export_CSV(columns, path):
+  with open(path, "wb") as csvfile:
+    file_writer = csv.writer(csvfile, delimiter=',')
+    file_writer.writerow([name for name, values in columns])
+    for row in range(len(columns[0][1]) if columns else 0):
+      file_writer.writerow([values[row].encode("utf-8") if isinstance(values[row], unicode) else values[row] for name, values in columns])
+
+# Writes the export columns as a numpy structured array (.npy) that can be loaded without
+# parsing, or memory-mapped with np.load(path, mmap_mode="r")
+def Write_Export_NPY(columns, path):
+  records = np.rec.fromarrays([values for name, values in columns], names=[str(name) for name, values in columns])
+  np.save(path, records)
+
+# Writes the export columns as an Arrow IPC file and/or a Parquet file. Needs pyarrow.
+def Write_Export_Arrow(columns, path, file_format):
+  arrow_table = pyarrow.Table.from_arrays([pyarrow.array(values) for name, values in columns], [name for name, values in columns])
+  if file_format == "parquet":
+    pyarrow.parquet.write_table(arrow_table, path)
+  else:
+    with open(path, "wb") as sink:
+      writer = pyarrow.RecordBatchFileWriter(sink, arrow_table.schema)
+      writer.write_table(arrow_table)
+      writer.close()
+
+# Exports the player table in each of the requested formats (any of export_formats) next to the
+# regular CSV output
+def Export_Table(table, formats):
+  columns = Export_Columns(table)
+  base_file = os.path.join(os.getcwd(), "football_players_{}_{}".format(curr_year, int(time.time())))
+  for file_format in formats:
+    path = base_file + "." + file_format
+    if file_format == "csv":
+      Write_Export_CSV(columns, path)
+    elif file_format == "npy":
+      Write_Export_NPY(columns, path)
+    elif pyarrow is None:
+      print "pyarrow is not installed, skipping the {} export".format(file_format)
+      continue
+    else:
+      Write_Export_Arrow(columns, path, file_format)
+    print "File {} written.".format(path)
+
 # Function for if incorrect or "help" parameter is passed to the script
 def Print_Help():
   print "Permitted arguments for this script:"
   print "   > no arguments: generate unsorted list of players with stats"
   print "   > \"sorted\": generate list of players sorted and separated by position"
+  print "   > \"--local <dir>\": serve pages from saved copies in <dir> through a local stand-in server"
+  print "   > \"--offline\": only use pages already in the response cache, never hit the network"
+  print "   > \"--record <dir>\": save every page the run loads into <dir> so it can be replayed with --local"
+  print "   > \"--league <file>\": score players with the league settings in <file> instead of league_settings.json"
+  print "   > \"--sims <n>\": number of weeks to simulate per player for the point distributions, 0 to skip them"
+  print "   > \"--incremental\": only refresh Yahoo ADP and fetch stats for new players since the last run"
+  print "   > \"--weekly\": in season, add the newest weeks of this season's gamelogs to the saved run and write weekly projections"
+  print "   > \"--stream\": stream players through the pipeline in chunks and write them out as they finish, with flat memory (no ranks, VOR, tiers, saved state or exports)"
+  print "   > \"--export <formats>\": also export one typed row per player, formats is a comma separated list of csv,npy,arrow,parquet"
+  print "   > \"--report <file>\": write stage timings, request, cache and parse numbers for the run to <file> as JSON"
+  print "   > \"--profile <file>\": write a cProfile dump of the run to <file>"
+  print "   > \"backfill <first year> <last year>\": score every player for a range of past seasons into football_history/"
   print "   > \"-h\": print this help message"
 
 # Main function that does a small argument check for a small set of options
 def main():
+  global offline, record_dir, sim_count
   sort_type = 0
-  if len(sys.argv) != 1:
-    if sys.argv[1] == "-h":
+  incremental = False
+  stream = False
+  weekly = False
+  backfill = None
+  formats = []
+  report_file = None
+  profile_file = None
+  args = sys.argv[1:]
+  while args:
+    arg = args.pop(0)
+    if arg == "-h":
       Print_Help()
       return
-    elif sys.argv[1] == "sorted":
+    elif arg == "sorted":
       sort_type = 1
+    elif arg == "--local" and args:
+      Start_Local_Server(args.pop(0))
+    elif arg == "--offline":
+      offline = True
+    elif arg == "--record" and args:
+      record_dir = args.pop(0)
+    elif arg == "--league" and args:
+      Load_League_Settings(args.pop(0))
+    elif arg == "--sims" and args and args[0].isdigit():
+      sim_count = int(args.pop(0))
+    elif arg == "--incremental":
+      incremental = True
+    elif arg == "--stream":
+      stream = True
+    elif arg == "--weekly":
+      weekly = True
+    elif arg == "--export" and args and all(fmt in export_formats for fmt in args[0].split(",")):
+      formats = args.pop(0).split(",")
+    elif arg == "--report" and args:
+      report_file = args.pop(0)
+    elif arg == "--profile" and args:
+      profile_file = args.pop(0)
+    elif arg == "backfill" and len(args) >= 2 and args[0].isdigit() and args[1].isdigit():
+      backfill = (int(args.pop(0)), int(args.pop(0)))
     else:
       print "Invalid input."
       Print_Help()
       return
 
-  Add_Yahoo_Stats()
-  Add_RB_PFR_Stats()
-  Add_Rec_PFR_Stats("WR")
-  Add_Rec_PFR_Stats("TE")
-  Add_QB_PFR_Stats()
-  Add_DEF_DVOA()
-  Write_CSV(sort_type)
+  profiler = cProfile.Profile() if profile_file else None
+  if profiler:
+    profiler.enable()
+  if backfill is not None:
+    Backfill_History(backfill[0], backfill[1])
+  elif weekly:
+    Weekly_Pipeline()
+  elif stream:
+    Stream_Pipeline()
+  else:
+    Run_Pipeline(sort_type, incremental, formats)
+  if profiler:
+    profiler.disable()
+    profiler.dump_stats(profile_file)
+    print "Profile written to {}".format(profile_file)
+
+  run_metrics.print_summary()
+  if report_file:
+    with open(report_file, "w") as report:
+      json.dump(run_metrics.report(), report, indent=2)
+    print "Report written to {}".format(report_file)
+
+# Runs the regular pipeline (or an incremental refresh of the last run), timing each stage
+def Run_Pipeline(sort_type, incremental, formats):
+  if incremental and os.path.isfile(State_File()):
+    table = Refresh_Table(PlayerTable.load(State_File()))
+  else:
+    if incremental:
+      print "No saved run at {}, doing a full run.".format(State_File())
+    table = PlayerTable()
+    with run_metrics.stage("yahoo"):
+      Add_Yahoo_Stats(table)
+    with run_metrics.stage("pfr_rb"):
+      Add_RB_PFR_Stats(table)
+    with run_metrics.stage("pfr_wr"):
+      Add_Rec_PFR_Stats(table, "WR")
+    with run_metrics.stage("pfr_te"):
+      Add_Rec_PFR_Stats(table, "TE")
+    with run_metrics.stage("pfr_qb"):
+      Add_QB_PFR_Stats(table)
+    with run_metrics.stage("pfr_k"):
+      Add_K_PFR_Stats(table)
+    with run_metrics.stage("pfr_def"):
+      Add_DEF_PFR_Stats(table)
+    with run_metrics.stage("def_dvoa"):
+      Add_DEF_DVOA(table)
+    with run_metrics.stage("value"):
+      Value_Players(table)
+  with run_metrics.stage("write"):
+    table.save(State_File())
+    Save_Cache()
+    Save_Identity_Map()
+    Write_CSV(table, sort_type)
+    Export_Table(table, formats)
+    Write_Identity_Report()
+  Clear_Checkpoint()
 
 # Entry point of script
 if __name__ == "__main__":
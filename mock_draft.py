@@ -0,0 +1,221 @@
+# Script for comparing draft strategies over batches of mock drafts using the player table saved
+# by generate_football_list.py
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import draft_assistant
+import generate_football_list as football
+
+# Useful globals, num_drafts is how many mock drafts each strategy is run through, split into
+# chunks of chunk_size drafts that are spread over a process pool of mock_workers processes
+# (None uses every core). draft_slot fixes our spot in the draft, None gives every mock draft a
+# random spot.
+num_drafts = 20000
+chunk_size = 1000
+mock_workers = None
+draft_slot = None
+
+# Draft strategies. "first" lists the positions we take in the opening rounds (as long as one is
+# left) and "earliest" holds back positions until the given round. Outside of that every strategy
+# takes the player with the most average points it still has a roster spot for. Kickers and
+# defenses are always left for the last two rounds.
+strategies = {
+  "best_available": {"first": [], "earliest": {}},
+  "rb_heavy": {"first": ["RB", "RB", "RB"], "earliest": {}},
+  "zero_rb": {"first": [], "earliest": {"RB": 6}},
+  "late_qb": {"first": [], "earliest": {"QB": 9}},
+}
+
+# Player table shared with the pool workers, loaded once per process
+mock_table = None
+def Init_Worker(state_file):
+  global mock_table
+  mock_table = football.PlayerTable.load(state_file)
+
+# Returns the 1-based draft slot on the clock for every pick of a snake draft
+def Pick_Slots(teams, rounds):
+  slots = []
+  for round_num in range(1, rounds + 1):
+    order = range(1, teams + 1)
+    slots.extend(order if round_num % 2 else order[::-1])
+  return slots
+
+# Scores the rosters of a batch of drafts (drafts x rounds arrays of player positions and average
+# points) as the points of the best starting lineup over a season: the top players at each
+# position fill the starting spots and the best of the rest fill the flex spots.
+def Lineup_Points(roster_pos, roster_points, roster):
+  total = np.zeros(len(roster_pos))
+  flex_pool = []
+  for pos_num, pos in enumerate(football.positions):
+    ranked = -np.sort(-np.where(roster_pos == pos_num, roster_points, -np.inf), axis=1)
+    starters = roster["starters"].get(pos, 0)
+    total += np.where(np.isfinite(ranked[:, :starters]), ranked[:, :starters], 0).sum(axis=1)
+    if pos in roster["flex_positions"]:
+      flex_pool.append(ranked[:, starters:])
+  if roster["flex"] and flex_pool:
+    flex = -np.sort(-np.concatenate(flex_pool, axis=1), axis=1)[:, :roster["flex"]]
+    total += np.where(np.isfinite(flex), flex, 0).sum(axis=1)
+  return total * roster["season_weeks"]
+
+# Runs a chunk of mock drafts for one strategy and returns the season points of our roster in
+# each one along with how many of each position we drafted. All of the drafts in the chunk
+# advance a pick at a time together:
+#   - Opponents take the next player left on their board, which is the players ordered by ADP
+#     plus noise (the same spread around ADP the draft assistant uses for availability). Each
+#     draft keeps a pointer into its board so this is O(drafts) per pick.
+#   - Our pick is the best player by average points out of the ones the strategy allows at that
+#     round, with position limits from the roster settings, and positions we still need
+#     starters at once the remaining picks run short. It's one masked argmax over the drafts.
+def Run_Drafts(args):
+  strategy_name, count, seed = args
+  table = mock_table
+  strategy = strategies[strategy_name]
+  roster = football.Load_League_Settings()["roster"]
+  teams, rounds = roster["teams"], roster["rounds"]
+  rng = np.random.RandomState(seed)
+  players = table.size
+  drafts = np.arange(count)
+  points = table.column("points", (3,))[:, 0]
+  adp = table.column("avg_pick")
+  pos_num = np.array([football.positions.index(pos) for pos in table.pos])
+  max_count = np.array([roster["max"].get(pos, rounds) for pos in football.positions])
+  starters = np.array([roster["starters"].get(pos, 0) for pos in football.positions])
+
+  spread = np.maximum(draft_assistant.adp_sd_floor, draft_assistant.adp_sd_scale * adp)
+  boards = np.argsort(adp + rng.standard_normal((count, players)) * spread, axis=1)
+  board_spot = np.zeros(count, dtype=int)
+  taken = np.zeros((count, players), dtype=bool)
+  our_slot = np.full(count, draft_slot) if draft_slot else rng.randint(1, teams + 1, count)
+  our_picks = np.zeros((count, rounds), dtype=int)
+  our_counts = np.zeros((count, len(football.positions)), dtype=int)
+
+  for pick, slot in enumerate(Pick_Slots(teams, rounds)):
+    round_num = pick // teams + 1
+    ours = our_slot == slot
+    theirs = drafts[~ours]
+    while len(theirs):
+      candidates = boards[theirs, board_spot[theirs]]
+      gone = taken[theirs, candidates]
+      if not gone.any():
+        taken[theirs, candidates] = True
+        board_spot[theirs] += 1
+        break
+      board_spot[theirs[gone]] += 1
+
+    mine = drafts[ours]
+    if not len(mine):
+      continue
+    allowed = our_counts[mine] < max_count
+    for pos, first_round in strategy["earliest"].items():
+      if round_num < first_round:
+        allowed[:, football.positions.index(pos)] = False
+    for pos in ["K", "DEF"]:
+      if round_num < rounds - 1:
+        allowed[:, football.positions.index(pos)] = False
+    if round_num <= len(strategy["first"]):
+      allowed[:, :] = False
+      allowed[:, football.positions.index(strategy["first"][round_num - 1])] = True
+    needed = np.maximum(starters - our_counts[mine], 0)
+    short = needed.sum(axis=1) >= rounds - round_num + 1
+    allowed[short] = needed[short] > 0
+    # Players at positions the strategy doesn't allow are only taken if nothing else is left
+    value = np.where(taken[mine], -np.inf, points - 1e9 * ~allowed[:, pos_num])
+    chosen = np.argmax(value, axis=1)
+    taken[mine, chosen] = True
+    our_picks[mine, round_num - 1] = chosen
+    our_counts[mine, pos_num[chosen]] += 1
+
+  season = Lineup_Points(pos_num[our_picks], points[our_picks], roster)
+  return season, our_counts
+
+# Runs num_drafts mock drafts for each strategy across the process pool and returns
+# strategy -> (season points per draft, positions drafted per draft)
+def Run_Strategies(state_file, names, seed):
+  pool = multiprocessing.Pool(mock_workers, Init_Worker, (state_file,))
+  try:
+    results = {}
+    for strategy_num, name in enumerate(names):
+      jobs = []
+      for chunk, start in enumerate(range(0, num_drafts, chunk_size)):
+        jobs.append((name, min(chunk_size, num_drafts - start), seed + 1000003 * strategy_num + chunk))
+      chunks = pool.map(Run_Drafts, jobs)
+      results[name] = (np.concatenate([season for season, counts in chunks]), np.concatenate([counts for season, counts in chunks]))
+    return results
+  finally:
+    pool.close()
+    pool.join()
+
+# Prints expected season points per strategy (best first) along with the spread of outcomes and
+# the average number of players drafted at each position
+def Print_Summary(results):
+  print "{:<16} {:>9} {:>8} {:>9} {:>9} {:>9}   {}".format("Strategy", "Mean", "Std", "p10", "p50", "p90", "  ".join("{:>4}".format(pos) for pos in football.positions))
+  for name, (season, counts) in sorted(results.items(), key=lambda item: -item[1][0].mean()):
+    p10, p50, p90 = np.percentile(season, [10, 50, 90])
+    print "{:<16} {:>9.1f} {:>8.1f} {:>9.1f} {:>9.1f} {:>9.1f}   {}".format(name, season.mean(), season.std(), p10, p50, p90,
+                                                                         "  ".join("{:>4.1f}".format(avg) for avg in counts.mean(axis=0)))
+
+# Function for if incorrect or "help" parameter is passed to the script
+def Print_Help():
+  print "Permitted arguments for this script:"
+  print "   > no arguments: run every strategy through mock drafts with the last run of generate_football_list.py"
+  print "   > \"--state <file>\": load the player table from <file> instead of this year's saved run"
+  print "   > \"--drafts <n>\": number of mock drafts per strategy (default 20000)"
+  print "   > \"--strategies <names>\": comma separated list of strategies to run, out of " + ", ".join(sorted(strategies))
+  print "   > \"--slot <n>\": always draft from this spot instead of a random one"
+  print "   > \"--workers <n>\": number of processes to run drafts on (default every core)"
+  print "   > \"--league <file>\": roster settings from <file> instead of league_settings.json"
+  print "   > \"--seed <n>\": random seed, to repeat a set of mock drafts"
+  print "   > \"-h\": print this help message"
+
+# Main function that does a small argument check for a small set of options
+def main():
+  global num_drafts, draft_slot, mock_workers
+  state_file = football.State_File()
+  names = sorted(strategies)
+  seed = int(time.time())
+  args = sys.argv[1:]
+  while args:
+    arg = args.pop(0)
+    if arg == "-h":
+      Print_Help()
+      return
+    elif arg == "--state" and args:
+      state_file = args.pop(0)
+    elif arg == "--drafts" and args and args[0].isdigit():
+      num_drafts = int(args.pop(0))
+    elif arg == "--strategies" and args and all(name in strategies for name in args[0].split(",")):
+      names = args.pop(0).split(",")
+    elif arg == "--slot" and args and args[0].isdigit():
+      draft_slot = int(args.pop(0))
+    elif arg == "--workers" and args and args[0].isdigit():
+      mock_workers = int(args.pop(0))
+    elif arg == "--league" and args:
+      football.Load_League_Settings(args.pop(0))
+    elif arg == "--seed" and args and args[0].isdigit():
+      seed = int(args.pop(0))
+    else:
+      print "Invalid input."
+      Print_Help()
+      return
+
+  if not os.path.isfile(state_file):
+    print "No saved player table at {}, run generate_football_list.py first.".format(state_file)
+    return
+  roster = football.Load_League_Settings()["roster"]
+  if draft_slot is not None and not 1 <= draft_slot <= roster["teams"]:
+    print "Draft slot has to be between 1 and the number of teams."
+    return
+  players = football.PlayerTable.load(state_file).size
+  if roster["teams"] * roster["rounds"] > players:
+    print "{} teams x {} rounds needs more than the {} players in {}.".format(roster["teams"], roster["rounds"], players, state_file)
+    return
+  start = time.time()
+  results = Run_Strategies(state_file, names, seed)
+  print "Ran {} mock drafts per strategy in {:.1f}s (seed {})".format(num_drafts, time.time() - start, seed)
+  Print_Summary(results)
+
+# Entry point of script
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,117 @@
+# Shared helpers for the tests: fixture page builders and a test case base that runs
+# generate_football_list.py against a local stand-in server in a scratch directory, the same way
+# --local does
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generate_football_list as football
+
+# Module globals the tests change, put back after every test
+saved_globals = ["cache_dir", "cache_index", "cache_max_bytes", "local_base", "polite_delay", "host_limit", "fetch_workers", "http_session",
+                 "offline", "identity_map", "checkpoint", "record_dir", "sim_count", "league_settings", "league_settings_file",
+                 "run_metrics", "fetch_retries", "backoff_base", "max_retry_wait"]
+
+# Builds a PFR style gamelog page. weeks is a list of dicts of data-stat -> value, one per row,
+# and footer an optional dict for a totals row in the table's tfoot.
+def Gamelog_Page(weeks, footer=None, table_id="stats"):
+  head = "<thead><tr><th data-stat=\"week_num\">Week</th></tr></thead>"
+  body = "".join("<tr>" + "".join("<td data-stat=\"{}\">{}</td>".format(key, value) for key, value in sorted(week.items())) + "</tr>" for week in weeks)
+  foot = ""
+  if footer is not None:
+    foot = "<tfoot><tr>" + "".join("<td data-stat=\"{}\">{}</td>".format(key, value) for key, value in sorted(footer.items())) + "</tr></tfoot>"
+  return "<html><body><table id=\"{}\">{}<tbody>{}</tbody>{}</table></body></html>".format(table_id, head, body, foot)
+
+# Builds a PFR season table page out of (first, last, href, team, pos) players
+def Season_Table_Page(table_id, players):
+  rows = ["<tr><td data-stat=\"player\" csk=\"{1},{0}\"><a href=\"{2}\">{0} {1}</a></td><td data-stat=\"team\">{3}</td>"
+          "<td data-stat=\"pos\">{4}</td></tr>".format(*player) for player in players]
+  return "<html><body><!--<table id=\"{}\"><tbody>{}</tbody></table>--></body></html>".format(table_id, "".join(rows))
+
+# Season table rows the way Extract_Table_Rows returns them, out of (first, last, href, team, pos)
+# players
+def Index_Rows(players):
+  return [{"player@csk": last + "," + first, "player@href": href, "team": team, "pos": pos} for first, last, href, team, pos in players]
+
+# Stand-in handler that keeps the path and time of every request it gets
+class Recording_Handler(football.Local_Page_Handler):
+  lock = threading.Lock()
+  requests = []
+
+  def do_GET(self):
+    with Recording_Handler.lock:
+      Recording_Handler.requests.append((self.path, time.time()))
+    football.Local_Page_Handler.do_GET(self)
+
+# Stand-in handler that answers the first busy_count requests for every path with busy_status
+# (and a Retry-After of retry_after, if set) before serving the page
+class Busy_Handler(Recording_Handler):
+  busy_status = 429
+  busy_count = 2
+  retry_after = None
+  seen = {}
+
+  def do_GET(self):
+    with Recording_Handler.lock:
+      Recording_Handler.requests.append((self.path, time.time()))
+      Busy_Handler.seen[self.path] = Busy_Handler.seen.get(self.path, 0) + 1
+      busy = Busy_Handler.seen[self.path] <= self.busy_count
+    if not busy:
+      football.Local_Page_Handler.do_GET(self)
+      return
+    self.send_response(self.busy_status)
+    if self.retry_after is not None:
+      self.send_header("Retry-After", self.retry_after)
+    self.send_header("Content-Length", "0")
+    self.end_headers()
+
+class FootballTestCase(unittest.TestCase):
+  def setUp(self):
+    self.saved = dict((name, getattr(football, name)) for name in saved_globals)
+    self.work_dir = tempfile.mkdtemp()
+    self.page_dir = os.path.join(self.work_dir, "pages")
+    self.cwd = os.getcwd()
+    os.chdir(self.work_dir)
+    football.cache_dir = os.path.join(self.work_dir, ".football_cache")
+    football.cache_index = None
+    football.http_session = None
+    football.identity_map = None
+    football.checkpoint = None
+    football.pfr_indexes.clear()
+    football.host_buckets.clear()
+    del football.identity_issues[:]
+    football.run_metrics = football.RunMetrics()
+    del Recording_Handler.requests[:]
+    Busy_Handler.seen.clear()
+    self.server = None
+    # The pipeline prints every step, keep it out of the test output
+    self.stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+
+  def tearDown(self):
+    sys.stdout.close()
+    sys.stdout = self.stdout
+    if self.server is not None:
+      self.server.shutdown()
+      self.server.server_close()
+    for name, value in self.saved.items():
+      setattr(football, name, value)
+    os.chdir(self.cwd)
+    shutil.rmtree(self.work_dir)
+
+  # Saves a page under the fixture directory for the URL it stands in for
+  def write_page(self, url, text):
+    page_file = football.Fixture_Path(self.page_dir, url)
+    if not os.path.isdir(os.path.dirname(page_file)):
+      os.makedirs(os.path.dirname(page_file))
+    with open(page_file, "wb") as page:
+      page.write(text)
+
+  # Starts the local stand-in server over the fixture directory
+  def serve(self, handler=football.Local_Page_Handler):
+    self.server = football.Start_Local_Server(self.page_dir, handler)
@@ -0,0 +1,118 @@
+# Tests for the on-disk response cache: TTLs, ETag revalidation, offline mode and eviction
+import hashlib
+import os
+import time
+import unittest
+from football_fixtures import FootballTestCase, football
+
+# Stand-in for a server response
+class Fake_Response:
+  def __init__(self, status_code, text="", headers=None):
+    self.status_code = status_code
+    self.text = text
+    self.headers = headers or {}
+
+class CacheTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    self.requests = []
+    self.responses = []
+    self.timed_get = football.Timed_Get
+    football.Timed_Get = self.fake_get
+
+  def tearDown(self):
+    football.Timed_Get = self.timed_get
+    FootballTestCase.tearDown(self)
+
+  # Records the request and answers with the next queued response
+  def fake_get(self, url, headers=None):
+    self.requests.append((url, dict(headers or {})))
+    return self.responses.pop(0)
+
+  def age_entry(self, url, seconds):
+    football.Load_Cache()[url]["fetched"] -= seconds
+
+  def test_fresh_page_is_served_from_cache(self):
+    url = "https://www.pro-football-reference.com/players/L/LastFi00/gamelog/{}/".format(football.curr_year)
+    self.responses.append(Fake_Response(200, u"week one", {"ETag": "\"v1\""}))
+    self.assertEqual(football.Load_Page(url), u"week one")
+    self.assertEqual(football.Load_Page(url), u"week one")
+    self.assertEqual(len(self.requests), 1)
+
+  def test_stale_page_is_revalidated(self):
+    url = "https://www.pro-football-reference.com/players/L/LastFi00/gamelog/{}/".format(football.curr_year)
+    self.responses.append(Fake_Response(200, u"week one", {"ETag": "\"v1\"", "Last-Modified": "Mon, 05 Oct 2020 10:00:00 GMT"}))
+    football.Load_Page(url)
+    self.age_entry(url, football.Cache_TTL(url) + 1)
+
+    self.responses.append(Fake_Response(304))
+    self.assertEqual(football.Load_Page(url), u"week one")
+    self.assertEqual(self.requests[1][1], {"If-None-Match": "\"v1\"", "If-Modified-Since": "Mon, 05 Oct 2020 10:00:00 GMT"})
+    self.assertLess(time.time() - football.Load_Cache()[url]["fetched"], 60)
+
+    self.age_entry(url, football.Cache_TTL(url) + 1)
+    self.responses.append(Fake_Response(200, u"week two", {"ETag": "\"v2\""}))
+    self.assertEqual(football.Load_Page(url), u"week two")
+    self.assertEqual(football.Load_Cache()[url]["etag"], "\"v2\"")
+    self.assertEqual(football.Load_Page(url), u"week two")
+    self.assertEqual(len(self.requests), 3)
+
+  def test_max_age_overrides_ttl(self):
+    url = "https://football.fantasysports.yahoo.com/f1/draftanalysis"
+    self.responses.append(Fake_Response(200, u"adp", {"ETag": "\"a\""}))
+    football.Load_Page(url)
+    self.responses.append(Fake_Response(304))
+    self.assertEqual(football.Load_Page(url, max_age=0), u"adp")
+    self.assertEqual(self.requests[1][1], {"If-None-Match": "\"a\""})
+
+  def test_past_seasons_never_expire(self):
+    url = "https://www.pro-football-reference.com/years/{}/rushing.htm".format(football.curr_year - 1)
+    self.assertIsNone(football.Cache_TTL(url))
+    self.responses.append(Fake_Response(200, u"rushing"))
+    football.Load_Page(url)
+    self.age_entry(url, 10 * 365 * 24 * 60 * 60)
+    self.assertEqual(football.Load_Page(url), u"rushing")
+    self.assertEqual(len(self.requests), 1)
+
+  def test_offline_mode(self):
+    url = "https://www.pro-football-reference.com/players/L/LastFi00/gamelog/{}/".format(football.curr_year)
+    self.responses.append(Fake_Response(200, u"week one"))
+    football.Load_Page(url)
+    self.age_entry(url, football.Cache_TTL(url) + 1)
+    football.offline = True
+    self.assertEqual(football.Load_Page(url), u"week one")
+    self.assertIsNone(football.Load_Page(url + "?other"))
+    self.assertEqual(len(self.requests), 1)
+
+  def test_index_survives_save_and_load(self):
+    url = "https://www.pro-football-reference.com/years/{}/passing.htm".format(football.curr_year - 1)
+    self.responses.append(Fake_Response(200, u"passing"))
+    football.Load_Page(url)
+    football.Save_Cache()
+    football.cache_index = None
+    self.assertEqual(football.Load_Page(url), u"passing")
+    self.assertEqual(len(self.requests), 1)
+
+  def test_least_recently_used_pages_are_evicted(self):
+    urls = ["https://www.pro-football-reference.com/years/{}/{}.htm".format(football.curr_year - 1, name) for name in ["a", "b", "c", "d"]]
+    football.cache_max_bytes = 25
+    for url, body in zip(urls[:2], [u"a" * 10, u"b" * 10]):
+      self.responses.append(Fake_Response(200, body))
+      football.Load_Page(url)
+    # Reading the first page makes the second one the least recently used
+    self.assertEqual(football.Load_Page(urls[0]), u"a" * 10)
+    self.responses.append(Fake_Response(200, u"c" * 10))
+    football.Load_Page(urls[2])
+    self.assertEqual(sorted(football.Load_Cache()), [urls[0], urls[2]])
+    self.assertEqual(football.cache_bytes, 20)
+    self.assertFalse(os.path.isfile(football.Cache_Body_Path(hashlib.sha1("b" * 10).hexdigest())))
+
+    # A body shared by two URLs only counts once
+    self.responses.append(Fake_Response(200, u"c" * 10))
+    football.Load_Page(urls[3])
+    self.assertEqual(sorted(football.Load_Cache()), [urls[0], urls[2], urls[3]])
+    self.assertEqual(football.cache_bytes, 20)
+    self.assertEqual(len(self.requests), 4)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,106 @@
+# Tests for the live draft assistant's board and API
+import httplib
+import json
+import threading
+import unittest
+import numpy as np
+from football_fixtures import FootballTestCase, football
+import draft_assistant
+
+# Builds a player table with random points per game for a full draft's worth of players
+def Draft_Table(rng, players=240):
+  table = football.PlayerTable()
+  for spot in range(players):
+    pos = football.positions[rng.choice(len(football.positions), p=[0.3, 0.3, 0.12, 0.12, 0.08, 0.08])]
+    row = table.add_player("Player {}".format(spot), "SF", pos, spot + 1.0 + rng.rand(), spot // 12 + 1.0)
+    points = rng.uniform(2.0, 25.0)
+    table.column("points", (3,))[row] = [points, points * 0.8, 3.0]
+    table.column("sim_points", (6,))[row] = [points - 5.0, points, points + 5.0, 0.1, 0.1, points - 2.5]
+  return table
+
+class DraftBoardTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    self.rng = np.random.RandomState(11)
+    self.table = Draft_Table(self.rng)
+    self.board = draft_assistant.DraftBoard(self.table, 12, 1)
+
+  # Checks the board's VOR, ADP gaps and tiers against working them all out again from scratch
+  def check_values(self):
+    drafted_counts = np.bincount(self.board.pos_num[~self.board.available], minlength=len(football.positions))
+    vor, gaps, tiers = football.Player_Values(self.table, self.board.available, drafted_counts)
+    for row in np.flatnonzero(self.board.available):
+      info = self.board.player(row)
+      self.assertAlmostEqual(info["vor"], vor[row], places=2)
+      self.assertEqual(info["adp_gap"], gaps[row])
+    self.assertEqual(self.board.tiers.tolist(), tiers.tolist())
+    best = self.board.best("vor", "ALL", 20)
+    self.assertEqual(best, list(np.argsort(-np.where(self.board.available, vor, -np.inf), kind="mergesort")[:20]))
+
+  def test_values_follow_picks_and_undos(self):
+    self.check_values()
+    for spot in range(60):
+      self.board.pick(self.board.best("adp", "ALL", 3)[self.rng.randint(3)])
+      if spot % 10 == 9:
+        self.check_values()
+    for spot in range(15):
+      self.board.undo()
+    self.check_values()
+
+  def test_best_by_position(self):
+    self.board.pick(self.board.best("points", "RB", 1)[0])
+    points = self.table.column("points", (3,))[:, 0]
+    rows = [row for row in self.table.rows("RB") if self.board.available[row]]
+    self.assertEqual(self.board.best("vor", "RB", 5), sorted(rows, key=lambda row: -points[row])[:5])
+    self.assertRaises(ValueError, self.board.best, "speed", "RB", 5)
+    self.assertRaises(ValueError, self.board.best, "vor", "OL", 5)
+
+  def test_state(self):
+    self.board.pick(0)
+    state = self.board.state()
+    self.assertEqual((state["current_pick"], state["next_pick"], len(state["picks"])), (2, 24, 1))
+    self.assertEqual([draft_assistant.Next_Pick(now, 5, 12) for now in [1, 5, 6, 20, 21]], [5, 5, 20, 20, 29])
+
+class DraftApiTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    draft_assistant.Draft_Handler.board = draft_assistant.DraftBoard(Draft_Table(np.random.RandomState(3)), 12, 1)
+    self.api = football.Local_Server(("127.0.0.1", 0), draft_assistant.Draft_Handler)
+    thread = threading.Thread(target=self.api.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+  def tearDown(self):
+    self.api.shutdown()
+    self.api.server_close()
+    FootballTestCase.tearDown(self)
+
+  # Posts a body to the API and returns (status, decoded JSON response)
+  def post(self, path, body):
+    connection = httplib.HTTPConnection("127.0.0.1", self.api.server_address[1])
+    try:
+      connection.request("POST", path, body, {"Content-Type": "application/json"})
+      response = connection.getresponse()
+      return response.status, json.loads(response.read())
+    finally:
+      connection.close()
+
+  def test_pick_by_name_and_row(self):
+    status, result = self.post("/pick", json.dumps({"name": "Player 4"}))
+    self.assertEqual((status, result["pick"], result["player"]["row"]), (200, 1, 4))
+    status, result = self.post("/pick", json.dumps({"row": 7}))
+    self.assertEqual((status, result["pick"], result["player"]["row"]), (200, 2, 7))
+    status, result = self.post("/undo", "")
+    self.assertEqual((status, result["undone"]["row"]), (200, 7))
+
+  def test_bad_bodies_are_rejected(self):
+    for body in ["not json", "[1, 2]", "5", json.dumps({"name": 5}), json.dumps({"name": "Player 4", "pos": ["RB"]}),
+                 json.dumps({"row": "x"}), json.dumps({"row": 1.5}), json.dumps({"row": True}), json.dumps({"row": 10 ** 6}),
+                 json.dumps({"name": "Nobody"})]:
+      status, result = self.post("/pick", body)
+      self.assertEqual(status, 400, body)
+      self.assertIn("error", result)
+    self.assertEqual(draft_assistant.Draft_Handler.board.picks, [])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,146 @@
+# Tests for fetching and parsing gamelogs through the local stand-in server
+import os
+import threading
+import time
+import unittest
+from football_fixtures import Busy_Handler, FootballTestCase, Gamelog_Page, Recording_Handler, Season_Table_Page, football
+
+# Stand-in handler that holds every request for a moment and tracks how many are in flight at once
+class Counting_Handler(football.Local_Page_Handler):
+  lock = threading.Lock()
+  active = 0
+  peak = 0
+
+  def do_GET(self):
+    with Counting_Handler.lock:
+      Counting_Handler.active += 1
+      Counting_Handler.peak = max(Counting_Handler.peak, Counting_Handler.active)
+    time.sleep(0.05)
+    # Counted as done before the response goes out, so the client can't start its next request
+    # before this one has left the count
+    with Counting_Handler.lock:
+      Counting_Handler.active -= 1
+    football.Local_Page_Handler.do_GET(self)
+
+# Stand-in handler that is rate limited twice for every page, asking for a long wait each time
+class Retry_After_Handler(Busy_Handler):
+  retry_after = "5"
+
+# Stand-in handler that never gets past a 503 without a Retry-After
+class Down_Handler(Busy_Handler):
+  busy_status = 503
+  busy_count = 100
+
+class FetchTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    self.players = []
+    for num in range(8):
+      href = "/players/L/LastFi{:02d}".format(num)
+      self.players.append(("First{}".format(num), "Last{}".format(num), href, "SF", "RB"))
+      weeks = [{"week_num": week, "rush_att": num + week, "rush_yds": 10 * week, "rec": 1, "rec_yds": 5, "rush_td": week % 2}
+               for week in range(1, 5)]
+      self.write_page(football.Gamelog_Url(href, football.curr_year - 1), Gamelog_Page(weeks))
+    self.write_page(football.Season_Table_Url("rushing", football.curr_year - 1), Season_Table_Page("rushing", self.players))
+
+  def test_gamelog_stats(self):
+    self.serve()
+    table = football.PlayerTable()
+    for first, last, href, team, pos in self.players:
+      table.add_player(first + " " + last, team, pos, 1.0, 1.0)
+    rows = table.rows("RB")
+    football.Load_Gamelogs(table, rows, football.Load_PFR_Index("rushing"), football.rb_stat_labels)
+    for num, row in enumerate(rows):
+      self.assertEqual(table.pfr_href[row], self.players[num][2])
+      self.assertEqual(table.weeks[row].shape, (4, len(football.rb_stat_labels)))
+      self.assertAlmostEqual(table.column("rush_att_mean")[row], num + 2.5)
+      self.assertAlmostEqual(table.column("rush_yds_mean")[row], 25.0)
+      self.assertAlmostEqual(table.column("rush_td_std")[row], 0.5)
+
+  def test_host_limit(self):
+    football.host_limit = 2
+    football.fetch_workers = 6
+    Counting_Handler.peak = 0
+    self.serve(Counting_Handler)
+    urls = [football.Gamelog_Url(player[2], football.curr_year - 1) for player in self.players]
+    pages = football.Fetch_Pages(urls)
+    self.assertEqual(sorted(pages), sorted(urls))
+    self.assertTrue(all(pages.values()))
+    self.assertEqual(Counting_Handler.peak, 2)
+
+  def test_missing_page(self):
+    self.serve()
+    url = football.Gamelog_Url("/players/N/Nobody00", football.curr_year - 1)
+    self.assertEqual(football.Fetch_Pages([url]), {url: None})
+
+  def test_retry_after(self):
+    # Retry-After waits are capped at max_retry_wait, keep them short
+    football.max_retry_wait = 0.2
+    self.serve(Retry_After_Handler)
+    football.polite_delay = 0.01
+    url = football.Gamelog_Url(self.players[0][2], football.curr_year - 1)
+    pages = football.Fetch_Pages([url])
+    self.assertIn("<table", pages[url])
+    times = [stamp for path, stamp in Recording_Handler.requests]
+    self.assertEqual(len(times), 3)
+    for before, after in zip(times, times[1:]):
+      self.assertGreaterEqual(after - before, 0.19)
+    stats = football.run_metrics.hosts["www.pro-football-reference.com"]
+    self.assertEqual((stats["requests"], stats["errors"], stats["retries"]), (3, 2, 2))
+
+  def test_retries_give_up(self):
+    football.fetch_retries = 2
+    football.backoff_base = 0.01
+    self.serve(Down_Handler)
+    url = football.Gamelog_Url(self.players[0][2], football.curr_year - 1)
+    self.assertEqual(football.Fetch_Pages([url]), {url: None})
+    self.assertEqual(len(Recording_Handler.requests), 3)
+    self.assertEqual(football.run_metrics.hosts["www.pro-football-reference.com"]["retries"], 2)
+
+  def test_token_bucket(self):
+    bucket = football.TokenBucket(20.0, 2)
+    start = time.time()
+    for request in range(6):
+      bucket.acquire()
+    # The burst of 2 goes straight away, the other 4 wait a twentieth of a second each
+    self.assertGreaterEqual(time.time() - start, 0.19)
+    self.assertLess(time.time() - start, 1.0)
+    bucket.pause(0.1)
+    start = time.time()
+    bucket.acquire()
+    self.assertGreaterEqual(time.time() - start, 0.09)
+
+  def test_resume_from_checkpoint(self):
+    self.serve(Recording_Handler)
+    index = football.Load_PFR_Index("rushing")
+    first = football.PlayerTable()
+    for first_name, last, href, team, pos in self.players:
+      first.add_player(first_name + " " + last, team, pos, 1.0, 1.0)
+    football.Load_Gamelogs(first, first.rows("RB"), index, football.rb_stat_labels)
+    with open(football.Checkpoint_File()) as lines:
+      saved = lines.readlines()
+    self.assertEqual(len(saved), len(self.players))
+
+    # Cut the run off after a few gamelogs, partway through writing the next one
+    with open(football.Checkpoint_File(), "w") as out:
+      out.writelines(saved[:3])
+      out.write(saved[3][:len(saved[3]) // 2])
+    done = set(football.json.loads(line)["url"] for line in saved[:3])
+    football.checkpoint = None
+    del Recording_Handler.requests[:]
+    resumed = football.PlayerTable()
+    for first_name, last, href, team, pos in self.players:
+      resumed.add_player(first_name + " " + last, team, pos, 1.0, 1.0)
+    football.Load_Gamelogs(resumed, resumed.rows("RB"), index, football.rb_stat_labels)
+
+    fetched = set(football.Local_Url(football.Gamelog_Url(href, football.curr_year - 1)) for first_name, last, href, team, pos in self.players)
+    fetched -= set(football.Local_Url(url) for url in done)
+    self.assertEqual(set(football.local_base + path for path, stamp in Recording_Handler.requests), fetched)
+    for row in resumed.rows("RB"):
+      self.assertEqual(resumed.weeks[row].tolist(), first.weeks[row].tolist())
+      self.assertEqual(resumed.column("rush_att_mean")[row], first.column("rush_att_mean")[row])
+    football.Clear_Checkpoint()
+    self.assertFalse(os.path.isfile(football.Checkpoint_File()))
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,76 @@
+# Tests for fuzzy name matching and the persistent Yahoo -> PFR identity map
+import unittest
+from football_fixtures import FootballTestCase, Index_Rows, football
+
+class IdentityTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    self.index = football.Build_PFR_Index(Index_Rows([
+      ("Jonathan", "Taylor", "/players/T/TaylJo02", "IND", "RB"),
+      ("Mike", "Evans", "/players/E/EvanMi00", "TAM", "WR"),
+      ("Mika", "Evens", "/players/E/EvenMi00", "TAM", "WR"),
+      ("Travis", "Kelce", "/players/K/KelcTr00", "KAN", "TE"),
+      ("Mike", "Williams", "/players/W/WillMi05", "TAM", "WR"),
+      ("Mike", "Williams", "/players/W/WillMi06", "LAC", "WR"),
+    ]))
+    self.table = football.PlayerTable()
+
+  def test_close_name_on_the_same_team_is_fuzzy(self):
+    self.assertEqual(football.Match_PFR_Entry(self.index, "Jonathon Taylor", "IND", "RB"), ("/players/T/TaylJo02", "fuzzy", []))
+
+  def test_close_name_on_another_team_is_ambiguous(self):
+    self.assertEqual(football.Match_PFR_Entry(self.index, "Jonathon Taylor", "NYJ", "RB"), (None, "ambiguous", ["/players/T/TaylJo02"]))
+    self.assertEqual(football.Match_PFR_Entry(self.index, "Jonathon Taylor", "IND", "QB"), (None, "ambiguous", ["/players/T/TaylJo02"]))
+
+  def test_close_names_within_the_margin_are_ambiguous(self):
+    href, status, candidates = football.Match_PFR_Entry(self.index, "Mika Evans", "TB", "WR")
+    self.assertEqual((href, status), (None, "ambiguous"))
+    self.assertEqual(sorted(candidates), ["/players/E/EvanMi00", "/players/E/EvenMi00"])
+
+  def test_nobody_close_is_unmatched(self):
+    self.assertEqual(football.Match_PFR_Entry(self.index, "Zeke Quimby", "IND", "RB"), (None, "unmatched", []))
+
+  def test_matches_are_saved_in_the_map(self):
+    row = self.table.add_player("Jonathon Taylor", "IND", "RB", 1.0, 1.0)
+    self.assertEqual(football.Resolve_PFR_Player(self.table, row, self.index), "/players/T/TaylJo02")
+    self.assertEqual(football.Load_Identity_Map(), {"RB:jonathon taylor": "/players/T/TaylJo02"})
+    self.assertEqual(football.identity_issues, [["pfr", "Jonathon Taylor", "RB", "IND", "fuzzy", "/players/T/TaylJo02", ""]])
+
+    football.Save_Identity_Map()
+    football.identity_map = None
+    self.assertEqual(football.Load_Identity_Map(), {"RB:jonathon taylor": "/players/T/TaylJo02"})
+
+  def test_map_entries_override_the_index(self):
+    kelce = self.table.add_player("Travis Kelce", "KC", "TE", 1.0, 1.0)
+    taylor = self.table.add_player("Jonathan Taylor", "IND", "RB", 2.0, 1.0)
+    football.Load_Identity_Map().update({"TE:travis kelce": "/players/K/KelcTr99", "RB:jonathan taylor": None})
+    self.assertEqual(football.Resolve_PFR_Player(self.table, kelce, self.index), "/players/K/KelcTr99")
+    # null pins a player to no PFR page
+    self.assertIsNone(football.Resolve_PFR_Player(self.table, taylor, self.index))
+    self.assertEqual(football.identity_issues, [])
+
+  def test_unmatched_players_are_reported_and_not_saved(self):
+    row = self.table.add_player("Zeke Quimby", "IND", "RB", 1.0, 1.0)
+    self.assertIsNone(football.Resolve_PFR_Player(self.table, row, self.index))
+    self.assertEqual(football.Load_Identity_Map(), {})
+    self.assertEqual(football.identity_issues, [["pfr", "Zeke Quimby", "RB", "IND", "unmatched", "", ""]])
+
+  def test_namesakes_are_kept_apart_by_team(self):
+    chargers = self.table.add_player("Mike Williams", "LAC", "WR", 1.0, 1.0)
+    bucs = self.table.add_player("Mike Williams", "TB", "WR", 2.0, 1.0)
+    # A map entry saved without the team before namesakes were keyed apart doesn't count for them
+    football.Load_Identity_Map()["WR:mike williams"] = "/players/W/WillMi05"
+    self.assertEqual(football.Resolve_PFR_Player(self.table, chargers, self.index), "/players/W/WillMi06")
+    self.assertEqual(football.Resolve_PFR_Player(self.table, bucs, self.index), "/players/W/WillMi05")
+    self.assertEqual(football.Load_Identity_Map(), {"WR:mike williams": "/players/W/WillMi05", "WR:mike williams:LAC": "/players/W/WillMi06",
+                                                    "WR:mike williams:TB": "/players/W/WillMi05"})
+
+    football.Save_Identity_Map()
+    football.identity_map = None
+    football.Load_Identity_Map()["WR:mike williams:LAC"] = "/players/W/WillMi99"
+    self.assertEqual(football.Resolve_PFR_Player(self.table, chargers, self.index), "/players/W/WillMi99")
+    self.assertEqual(football.Resolve_PFR_Player(self.table, bucs, self.index), "/players/W/WillMi05")
+    self.assertEqual(football.identity_issues, [])
+
+if __name__ == "__main__":
+  unittest.main()
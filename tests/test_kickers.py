@@ -0,0 +1,63 @@
+# Tests for scoring kickers' FGs by distance
+import os
+import unittest
+import numpy as np
+from football_fixtures import FootballTestCase, Gamelog_Page, football
+
+# Builds a PFR kicking table page out of (first, last, href, team, makes) kickers, where makes is
+# the number of FGs made from each of the five distance buckets
+def Kicking_Page(kickers):
+  rows = []
+  for first, last, href, team, makes in kickers:
+    cells = "".join("<td data-stat=\"fgm{}\">{}</td>".format(bucket + 1, made) for bucket, made in enumerate(makes))
+    rows.append("<tr><td data-stat=\"player\" csk=\"{1},{0}\"><a href=\"{2}\">{0} {1}</a></td><td data-stat=\"team\">{3}</td>"
+                "<td data-stat=\"pos\">K</td>{4}</tr>".format(first, last, href, team, cells))
+  return "<html><body><!--<table id=\"kicking\"><tbody>{}</tbody></table>--></body></html>".format("".join(rows))
+
+class KickerTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    settings_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "league_settings.json")
+    self.fg_points = football.Load_League_Settings(settings_file)["fg_distance_points"]
+
+  def test_fg_value_by_distance(self):
+    # The league's short FGs are all worth the same, so also check that every bucket lines up with
+    # its own distance
+    for fg_points in [self.fg_points, [1.0, 2.0, 3.0, 4.0, 5.0]]:
+      for bucket in range(5):
+        kick_row = dict(("fgm{}".format(spot + 1), "3" if spot == bucket else "") for spot in range(5))
+        self.assertEqual(football.FG_Value(kick_row, fg_points), fg_points[bucket])
+    kick_row = {"fgm1": "2", "fgm2": "", "fgm3": "0", "fgm4": "1", "fgm5": "1"}
+    self.assertAlmostEqual(football.FG_Value(kick_row, self.fg_points), (2 * self.fg_points[0] + self.fg_points[3] + self.fg_points[4]) / 4.0)
+    # Kickers without any makes (or a row) get the 30-39 yard value
+    self.assertEqual(football.FG_Value({"fgm1": "0"}, self.fg_points), self.fg_points[2])
+    self.assertEqual(football.FG_Value(None, self.fg_points), self.fg_points[2])
+
+  def test_kicker_gamelogs(self):
+    kickers = [("Long", "Leg", "/players/L/LegLo00", "BAL", [0, 0, 0, 0, 4]),
+               ("Short", "Range", "/players/R/RangSh00", "SFO", [0, 2, 0, 2, 0])]
+    self.write_page(football.Season_Table_Url("kicking", football.curr_year - 1), Kicking_Page(kickers))
+    for num, (first, last, href, team, makes) in enumerate(kickers):
+      weeks = [{"week_num": week, "xpm": 3, "fgm": week + num, "fga": week + num + 1} for week in range(1, 4)]
+      self.write_page(football.Gamelog_Url(href, football.curr_year - 1), Gamelog_Page(weeks))
+    self.serve()
+    table = football.PlayerTable()
+    for first, last, href, team, makes in kickers:
+      table.add_player(first + " " + last, team, "K", 1.0, 1.0)
+    table.add_player("No Body", "NYJ", "K", 3.0, 1.0)
+    rows = table.rows("K")
+    football.Load_K_Gamelogs(table, rows)
+
+    fgm = football.k_stat_labels.index("fgm")
+    dist_pts = football.k_stat_labels.index("fg_dist_pts")
+    values = [self.fg_points[4], (self.fg_points[1] + self.fg_points[3]) / 2.0]
+    for num, row in enumerate(rows[:2]):
+      self.assertEqual(table.weeks[row][:, fgm].tolist(), [1.0 + num, 2.0 + num, 3.0 + num])
+      self.assertTrue(np.allclose(table.weeks[row][:, dist_pts], table.weeks[row][:, fgm] * values[num]))
+      self.assertAlmostEqual(table.column("fg_dist_pts_mean")[row], (2.0 + num) * values[num])
+    # A kicker without a PFR page scores nothing
+    self.assertIsNone(table.pfr_href[rows[2]])
+    self.assertEqual(table.column("fg_dist_pts_mean")[rows[2]], 0.0)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,50 @@
+# Tests for matching Yahoo names to PFR season table players through the normalized name index
+import unittest
+from football_fixtures import Index_Rows, football
+
+class NameIndexTest(unittest.TestCase):
+  def setUp(self):
+    self.index = football.Build_PFR_Index(Index_Rows([
+      ("D.J.", "Moore", "/players/M/MoorDJ00", "CAR", "WR"),
+      ("Odell", "Beckham Jr.", "/players/B/BeckOd00", "CLE", "WR"),
+      ("Patrick", "Mahomes II", "/players/M/MahoPa00", "KAN", "QB"),
+      ("Mike", "Williams", "/players/W/WillMi05", "LAC", "WR"),
+      ("Mike", "Williams", "/players/W/WillMi06", "TB", "WR"),
+      ("Josh", "Allen", "/players/A/AlleJo02", "BUF", "QB"),
+      ("Josh", "Allen", "/players/A/AlleJo03", "JAX", "LB"),
+      ("Chris", "Herndon IV", "/players/H/HernCh00", "NYJ", ""),
+    ]))
+
+  def test_normalize_name(self):
+    self.assertEqual(football.Normalize_Name(u"D.J. Moore"), "dj moore")
+    self.assertEqual(football.Normalize_Name(u"Odell Beckham Jr."), "odell beckham")
+    self.assertEqual(football.Normalize_Name(u"Patrick Mahomes II"), "patrick mahomes")
+    self.assertEqual(football.Normalize_Name(u"Le'Veon Bell"), "leveon bell")
+    self.assertEqual(football.Normalize_Name(u"Am\u00f3n-Ra St. Brown"), "amon ra st brown")
+    # A two word name is never cut down to one word
+    self.assertEqual(football.Normalize_Name(u"Tommy V"), "tommy v")
+
+  def test_exact_matches(self):
+    self.assertEqual(football.Match_PFR_Entry(self.index, "DJ Moore"), ("/players/M/MoorDJ00", "exact", []))
+    self.assertEqual(football.Find_PFR_Entry(self.index, "Odell Beckham"), "/players/B/BeckOd00")
+    self.assertEqual(football.Find_PFR_Entry(self.index, "Patrick Mahomes"), "/players/M/MahoPa00")
+    self.assertEqual(football.Find_PFR_Entry(self.index, "Chris Herndon"), "/players/H/HernCh00")
+
+  def test_middle_names_are_dropped(self):
+    self.assertEqual(football.Find_PFR_Entry(self.index, "Josh Hines Allen", "BUF"), "/players/A/AlleJo02")
+
+  def test_shared_names_narrowed_by_team_and_position(self):
+    self.assertEqual(football.Find_PFR_Entry(self.index, "Mike Williams", "LAC", "WR"), "/players/W/WillMi05")
+    self.assertEqual(football.Find_PFR_Entry(self.index, "Mike Williams", "TB", "WR"), "/players/W/WillMi06")
+    # Yahoo's KC is PFR's KAN
+    self.assertEqual(football.Find_PFR_Entry(self.index, "Josh Allen", "KC", "QB"), "/players/A/AlleJo02")
+    self.assertEqual(football.Find_PFR_Entry(self.index, "Josh Allen", "JAX", "DEF"), "/players/A/AlleJo03")
+
+  def test_shared_names_without_context_are_ambiguous(self):
+    href, status, candidates = football.Match_PFR_Entry(self.index, "Mike Williams", "NYG", "WR")
+    self.assertIsNone(href)
+    self.assertEqual(status, "ambiguous")
+    self.assertEqual(sorted(candidates), ["/players/W/WillMi05", "/players/W/WillMi06"])
+
+if __name__ == "__main__":
+  unittest.main()
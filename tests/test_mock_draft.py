@@ -0,0 +1,96 @@
+# Tests for the mock draft strategy runner
+import StringIO
+import sys
+import numpy as np
+from football_fixtures import FootballTestCase, football
+import mock_draft
+
+# Points per game for every player at a position, so any full starting lineup scores the same
+pos_points = {"QB": 20.0, "RB": 15.0, "WR": 12.0, "TE": 10.0, "K": 8.0, "DEF": 7.0}
+
+# Builds a player table with players at every position in ADP order
+def Mock_Table(players=60):
+  table = football.PlayerTable()
+  for spot in range(players):
+    pos = football.positions[spot % len(football.positions)]
+    row = table.add_player("Player {}".format(spot), "SF", pos, spot + 1.0, spot // 4 + 1.0)
+    table.column("points", (3,))[row] = [pos_points[pos], pos_points[pos] * 0.8, 3.0]
+  return table
+
+class MockDraftTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    self.saved_mock = dict((name, getattr(mock_draft, name)) for name in ["mock_table", "mock_workers", "num_drafts", "chunk_size", "draft_slot"])
+    football.league_settings = {"roster": {"teams": 4, "rounds": 5, "starters": {"QB": 1, "RB": 1, "WR": 1, "TE": 0, "K": 1, "DEF": 1},
+                                           "flex": 0, "flex_positions": ["RB", "WR", "TE"],
+                                           "max": {"QB": 1, "RB": 3, "WR": 2, "TE": 1, "K": 1, "DEF": 1}, "season_weeks": 16}}
+    mock_draft.mock_table = Mock_Table()
+
+  def tearDown(self):
+    for name, value in self.saved_mock.items():
+      setattr(mock_draft, name, value)
+    FootballTestCase.tearDown(self)
+
+  def roster(self):
+    return football.league_settings["roster"]
+
+  def test_pick_slots(self):
+    self.assertEqual(mock_draft.Pick_Slots(3, 3), [1, 2, 3, 3, 2, 1, 1, 2, 3])
+    self.assertEqual(mock_draft.Pick_Slots(1, 2), [1, 1])
+
+  def test_lineup_points(self):
+    qb, rb, wr, te = [football.positions.index(pos) for pos in ["QB", "RB", "WR", "TE"]]
+    roster = {"starters": {"QB": 1, "RB": 2, "WR": 1}, "flex": 1, "flex_positions": ["RB", "WR", "TE"], "season_weeks": 2}
+    roster_pos = np.array([[qb, rb, rb, rb, wr, te],
+                           [qb, qb, rb, wr, wr, wr]])
+    roster_points = np.array([[18.0, 14.0, 9.0, 11.0, 10.0, 6.0],
+                              [20.0, 15.0, 12.0, 13.0, 7.0, 8.0]])
+    # First roster: QB 18, RBs 14 + 11, WR 10 and the 9 point RB at flex. The second is a RB short,
+    # so it only scores the one, and the backup QB can't play flex.
+    expected = [2 * (18.0 + 14.0 + 11.0 + 10.0 + 9.0), 2 * (20.0 + 12.0 + 13.0 + 8.0)]
+    self.assertEqual(mock_draft.Lineup_Points(roster_pos, roster_points, roster).tolist(), expected)
+
+  def test_drafts_fill_the_starting_lineup(self):
+    # Five rounds for five starters leaves no room to take anyone else
+    season, counts = mock_draft.Run_Drafts(("best_available", 50, 3))
+    self.assertEqual(season.shape, (50,))
+    starters = [self.roster()["starters"][pos] for pos in football.positions]
+    self.assertEqual(counts.tolist(), [starters] * 50)
+    lineup = sum(pos_points[pos] * self.roster()["starters"][pos] for pos in football.positions)
+    self.assertTrue(np.allclose(season, lineup * self.roster()["season_weeks"]))
+
+  def test_strategy_and_seed(self):
+    self.roster()["rounds"] = 9
+    season, counts = mock_draft.Run_Drafts(("rb_heavy", 40, 5))
+    self.assertEqual(counts.sum(axis=1).tolist(), [9] * 40)
+    self.assertTrue((counts[:, football.positions.index("RB")] == 3).all())
+    self.assertTrue((counts <= [self.roster()["max"][pos] for pos in football.positions]).all())
+    again, again_counts = mock_draft.Run_Drafts(("rb_heavy", 40, 5))
+    self.assertEqual(season.tolist(), again.tolist())
+    self.assertEqual(counts.tolist(), again_counts.tolist())
+
+  def test_strategies_over_the_pool(self):
+    mock_draft.mock_table.save("state.pkl")
+    mock_draft.mock_workers = 1
+    mock_draft.num_drafts = 30
+    mock_draft.chunk_size = 20
+    results = mock_draft.Run_Strategies("state.pkl", ["zero_rb"], 9)
+    season, counts = results["zero_rb"]
+    first, first_counts = mock_draft.Run_Drafts(("zero_rb", 20, 9))
+    second, second_counts = mock_draft.Run_Drafts(("zero_rb", 10, 10))
+    self.assertEqual(season.tolist(), first.tolist() + second.tolist())
+    self.assertEqual(counts.tolist(), first_counts.tolist() + second_counts.tolist())
+
+  def test_too_few_players(self):
+    Mock_Table(12).save("state.pkl")
+    saved_argv = sys.argv
+    sys.argv = ["mock_draft.py", "--state", "state.pkl", "--workers", "1"]
+    quiet = sys.stdout
+    output = StringIO.StringIO()
+    sys.stdout = output
+    try:
+      mock_draft.main()
+    finally:
+      sys.argv = saved_argv
+      sys.stdout = quiet
+    self.assertIn("4 teams x 5 rounds needs more than the 12 players", output.getvalue())
@@ -0,0 +1,46 @@
+# Tests for pulling stat lines out of PFR tables
+import unittest
+from football_fixtures import Gamelog_Page, football
+
+class ParseTest(unittest.TestCase):
+  def test_header_and_footer_rows_are_skipped(self):
+    page = Gamelog_Page([{"week_num": 1, "rush_att": 10}, {"week_num": 2, "rush_att": 20}], footer={"rush_att": 30})
+    rows = football.Extract_Table_Rows(page, table_id="stats")
+    self.assertEqual([(row["week_num"], row["rush_att"]) for row in rows], [("1", "10"), ("2", "20")])
+
+  # A season totals row in the tfoot used to count as a week: 10 and 20 plus a footer of 30 had a
+  # mean of 20 instead of 15
+  def test_footer_totals_are_not_a_week(self):
+    page = Gamelog_Page([{"week_num": 1, "rush_att": 10}, {"week_num": 2, "rush_att": 20}], footer={"rush_att": 30})
+    self.assertEqual(football.Gamelog_Weeks(page, ["rush_att"]).shape, (2, 1))
+    self.assertEqual(football.Gamelog_Stats(page, ["rush_att"]), {"rush_att": [15.0, 5.0]})
+
+  def test_team_gamelog_footer(self):
+    year = football.curr_year - 1
+    games = Gamelog_Page([{"week_num": 1, "pts_def": 3}, {"week_num": 2, "pts_def": 28}],
+                         footer={"week_num": 17, "pts_def": 31}, table_id="gamelog{}".format(year))
+    opponents = Gamelog_Page([{"week_num": 1, "pass_sacked": 4, "pass_int": 1, "fumbles_lost": 1},
+                              {"week_num": 2, "pass_sacked": 0, "pass_int": 0, "fumbles_lost": 0}],
+                             footer={"week_num": 17, "pass_sacked": 4, "pass_int": 1, "fumbles_lost": 1},
+                             table_id="gamelog_opp{}".format(year))
+    # Both tables on one page, like PFR's team gamelog
+    page = games.replace("</body></html>", "") + opponents.replace("<html><body>", "")
+    weeks = football.Team_Gamelog_Weeks(page, year, football.Load_League_Settings())
+    self.assertEqual(weeks.shape, (2, len(football.def_stat_labels)))
+    self.assertEqual(weeks[:, football.def_stat_labels.index("pts_def")].tolist(), [3.0, 28.0])
+    self.assertEqual(weeks[:, football.def_stat_labels.index("def_sacks")].tolist(), [4.0, 0.0])
+    self.assertEqual(weeks[:, football.def_stat_labels.index("def_to")].tolist(), [2.0, 0.0])
+
+  def test_parse_is_recorded_when_the_caller_stops_early(self):
+    page = Gamelog_Page([{"week_num": week, "rush_att": week} for week in range(1, 6)])
+    before = dict(football.run_metrics.parse)
+    for row in football.Extract_Table_Rows(page, table_id="stats"):
+      break
+    self.assertEqual(football.run_metrics.parse["pages"], before["pages"] + 1)
+    self.assertEqual(football.run_metrics.parse["rows"], before["rows"] + 1)
+    list(football.Extract_Table_Rows(page, table_id="stats"))
+    self.assertEqual(football.run_metrics.parse["pages"], before["pages"] + 2)
+    self.assertEqual(football.run_metrics.parse["rows"], before["rows"] + 6)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,58 @@
+# Tests for ranking players against their position with a sort and binary search
+import unittest
+import numpy as np
+from football_fixtures import FootballTestCase, football
+
+class RankTest(FootballTestCase):
+  def make_table(self, pos, stats):
+    table = football.PlayerTable()
+    for num, stat_line in enumerate(stats):
+      row = table.add_player("Player {}".format(num), "SF", pos, num + 1.0, 1.0)
+      table.set_stats(row, stat_line)
+    return table
+
+  def ranks(self, table, pos, label):
+    football.Rank_Players(table, table.rows(pos), football.pos_stat_labels[pos])
+    return table.column(label + "_rank", (2,), int)[table.rows(pos)].tolist()
+
+  # Brute force ranks for the first stat label: 1 + players with a higher mean, 1 + players with a
+  # lower std, only counting players that have the stat. Players without it are rookies.
+  def expected_ranks(self, means, stds):
+    pool = [spot for spot, mean in enumerate(means) if mean != 0]
+    return [[1 + sum(means[other] > means[spot] for other in pool), 1 + sum(stds[other] < stds[spot] for other in pool)]
+            if means[spot] != 0 else [0, 0] for spot in range(len(means))]
+
+  def test_ties_share_the_best_rank(self):
+    table = self.make_table("WR", [{"rec": [5.0, 2.0], "rec_yds": [60.0, 10.0], "rec_td": [0.5, 0.5]},
+                                   {"rec": [7.0, 1.0], "rec_yds": [60.0, 20.0], "rec_td": [0.5, 0.5]},
+                                   {"rec": [5.0, 2.0], "rec_yds": [90.0, 10.0], "rec_td": [0.5, 0.5]},
+                                   {"rec": [3.0, 3.0], "rec_yds": [30.0, 30.0], "rec_td": [0.2, 0.4]}])
+    self.assertEqual(self.ranks(table, "WR", "rec"), [[2, 2], [1, 1], [2, 2], [4, 4]])
+    self.assertEqual(self.ranks(table, "WR", "rec_yds"), [[2, 1], [2, 3], [1, 1], [4, 4]])
+    self.assertEqual(self.ranks(table, "WR", "rec_td"), [[1, 2], [1, 2], [1, 2], [4, 1]])
+
+  def test_rookies_are_unranked(self):
+    table = self.make_table("WR", [{"rec": [5.0, 2.0], "rec_yds": [60.0, 10.0], "rec_td": [0.5, 0.5]},
+                                   {"rec": [0.0, 0.0], "rec_yds": [0.0, 0.0], "rec_td": [0.0, 0.0]},
+                                   {"rec": [4.0, 1.0], "rec_yds": [70.0, 12.0], "rec_td": [0.0, 0.0]}])
+    self.assertEqual(self.ranks(table, "WR", "rec"), [[1, 2], [0, 0], [2, 1]])
+    # A veteran without the stat is ranked, but isn't part of the pool others are ranked against
+    self.assertEqual(self.ranks(table, "WR", "rec_td"), [[1, 1], [0, 0], [2, 1]])
+
+  def test_matches_pairwise_ranks(self):
+    rng = np.random.RandomState(5)
+    means = rng.randint(0, 8, 200).astype(float)
+    means[0] = 1.0
+    stds = rng.randint(0, 4, 200).astype(float)
+    table = self.make_table("TE", [{"rec": [mean, std], "rec_yds": [1.0, 1.0], "rec_td": [1.0, 1.0]} for mean, std in zip(means, stds)])
+    self.assertEqual(self.ranks(table, "TE", "rec"), self.expected_ranks(list(means), list(stds)))
+
+  def test_lower_is_better(self):
+    table = self.make_table("DEF", [{"pts_def": [24.0, 5.0], "def_sacks": [2.0, 1.0], "def_to": [1.0, 1.0], "pa_pts": [1.0, 1.0]},
+                                    {"pts_def": [17.0, 6.0], "def_sacks": [3.0, 1.0], "def_to": [1.0, 1.0], "pa_pts": [4.0, 1.0]},
+                                    {"pts_def": [17.0, 4.0], "def_sacks": [1.0, 1.0], "def_to": [1.0, 1.0], "pa_pts": [4.0, 1.0]}])
+    self.assertEqual(self.ranks(table, "DEF", "pts_def"), [[3, 2], [1, 3], [1, 1]])
+    self.assertEqual(self.ranks(table, "DEF", "def_sacks"), [[2, 1], [1, 1], [3, 1]])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,32 @@
+# Tests for lining up a refreshed player table with the saved one
+import unittest
+from football_fixtures import football
+
+# Builds a player table out of (name, team, pos) players
+def Player_Table(players):
+  table = football.PlayerTable()
+  for spot, (name, team, pos) in enumerate(players):
+    table.add_player(name, team, pos, spot + 1.0, 1.0)
+  return table
+
+class MatchOldRowsTest(unittest.TestCase):
+  def test_unique_names_match_across_teams(self):
+    old = Player_Table([("D.J. Moore", "CAR", "WR"), ("Josh Allen", "BUF", "QB")])
+    new = Player_Table([("Josh Allen", "BUF", "QB"), ("DJ Moore", "CHI", "WR"), ("Rookie Back", "SF", "RB")])
+    self.assertEqual(football.Match_Old_Rows(new, old), {0: 1, 1: 0})
+
+  def test_shared_names_are_told_apart_by_team(self):
+    old = Player_Table([("Mike Williams", "LAC", "WR"), ("Mike Williams", "TB", "WR")])
+    new = Player_Table([("Mike Williams", "TB", "WR"), ("Mike Williams", "LAC", "WR")])
+    self.assertEqual(football.Match_Old_Rows(new, old), {0: 1, 1: 0})
+
+  def test_players_that_cant_be_told_apart_are_refetched(self):
+    old = Player_Table([("Mike Williams", "LAC", "WR"), ("Mike Williams", "LAC", "WR"), ("Josh Allen", "BUF", "QB")])
+    new = Player_Table([("Mike Williams", "LAC", "WR"), ("Mike Williams", "LAC", "WR"), ("Josh Allen", "BUF", "QB")])
+    self.assertEqual(football.Match_Old_Rows(new, old), {2: 2})
+    # Only one of the two is in the new table, but which one isn't known
+    new = Player_Table([("Mike Williams", "LAC", "WR")])
+    self.assertEqual(football.Match_Old_Rows(new, old), {})
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,55 @@
+# Tests for the Monte Carlo simulation of each player's weekly points
+import unittest
+import numpy as np
+from football_fixtures import FootballTestCase, football
+
+class SimulationTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    football.sim_count = 20000
+    np.random.seed(7)
+    self.table = football.PlayerTable()
+
+  # Adds an RB whose weeks are only rushing yards, so each week scores a tenth of them
+  def add_back(self, week_points):
+    row = self.table.add_player("Back {}".format(self.table.size), "SF", "RB", 1.0, 1.0)
+    weeks = np.zeros((len(week_points), len(football.rb_stat_labels)))
+    weeks[:, football.rb_stat_labels.index("rush_yds")] = np.array(week_points) * 10.0
+    self.table.weeks[row] = weeks
+    return row
+
+  def test_steady_player(self):
+    row = self.add_back([12.0] * 8)
+    football.Simulate_Players(self.table, self.table.rows("RB"), football.rb_stat_labels)
+    floor, median, ceiling, boom, bust, risk = self.table.column("sim_points", (6,))[row]
+    self.assertEqual((floor, median, ceiling, risk), (12.0, 12.0, 12.0, 12.0))
+    self.assertEqual((boom, bust), (0.0, 0.0))
+
+  def test_percentiles_follow_the_weeks(self):
+    week_points = [2.0, 4.0, 8.0, 10.0, 12.0, 15.0, 22.0, 30.0]
+    row = self.add_back(week_points)
+    rookie = self.table.add_player("Rookie", "SF", "RB", 2.0, 1.0)
+    football.Simulate_Players(self.table, self.table.rows("RB"), football.rb_stat_labels)
+    sim_points = self.table.column("sim_points", (6,))
+    self.assertEqual(sim_points.shape, (2, 6))
+    floor, median, ceiling, boom, bust, risk = sim_points[row]
+    # The same smoothed resampling drawn separately: a real week plus Silverman's rule noise
+    rng = np.random.RandomState(3)
+    bandwidth = 1.06 * np.std(week_points) * len(week_points) ** -0.2
+    reference = rng.choice(week_points, 200000) + rng.standard_normal(200000) * bandwidth
+    self.assertTrue(floor < median < ceiling)
+    for value, pct in [(floor, 10), (median, 50), (ceiling, 90)]:
+      self.assertAlmostEqual(value, np.percentile(reference, pct), delta=0.6)
+    self.assertAlmostEqual(boom, np.mean(reference >= 20.0), delta=0.015)
+    self.assertAlmostEqual(bust, np.mean(reference <= 5.0), delta=0.015)
+    self.assertAlmostEqual(risk, median - 0.5 * (median - floor), places=2)
+    self.assertEqual(sim_points[rookie].tolist(), [0.0] * 6)
+
+  def test_nobody_with_weeks(self):
+    rows = [self.table.add_player("Rookie {}".format(spot), "SF", "RB", 1.0, 1.0) for spot in range(3)]
+    self.table.weeks[rows[1]] = np.zeros((0, len(football.rb_stat_labels)))
+    football.Simulate_Players(self.table, self.table.rows("RB"), football.rb_stat_labels)
+    self.assertEqual(self.table.column("sim_points", (6,)).tolist(), [[0.0] * 6] * 3)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,62 @@
+# Tests for streaming runs against the committed synthetic benchmark pages
+import csv
+import glob
+import os
+import StringIO
+import unittest
+from football_fixtures import FootballTestCase, football
+import benchmark_football_list
+
+class StreamTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    self.saved_stream = (football.total_players, football.stream_chunk)
+    football.total_players = benchmark_football_list.synthetic_players
+    football.sim_count = 500
+    self.page_dir = benchmark_football_list.corpus_dir
+    self.serve()
+
+  def tearDown(self):
+    football.total_players, football.stream_chunk = self.saved_stream
+    FootballTestCase.tearDown(self)
+
+  # Returns the streamed CSV's rows the way csv.reader reads them back
+  def stream_rows(self):
+    stream_files = glob.glob(os.path.join(self.work_dir, "football_stream_*.csv"))
+    self.assertEqual(len(stream_files), 1)
+    with open(stream_files[0], "rb") as csvfile:
+      return list(csv.reader(csvfile))
+
+  def test_small_chunks_match_the_sorted_run(self):
+    football.Run_Pipeline(1, False, [])
+    table = football.PlayerTable.load(football.State_File())
+    football.pfr_indexes.clear()
+    football.identity_map = None
+    os.remove(football.Identity_Map_File())
+
+    # Chunks this small leave some positions with nobody in the chunk that has any weeks
+    football.stream_chunk = 5
+    chunks = [range(start, min(start + 5, table.size)) for start in range(0, table.size, 5)]
+    self.assertTrue(any(not [row for row in chunk if table.pos[row] == pos and table.pfr_href[row]]
+                        for chunk in chunks for pos in set(table.pos[row] for row in chunk)))
+    football.Stream_Pipeline()
+
+    expected = StringIO.StringIO()
+    file_writer = csv.writer(expected, delimiter=',')
+    file_writer.writerow(football.stream_headers)
+    for row in range(table.size):
+      file_writer.writerow(football.Stream_Row(table, row))
+    expected = list(csv.reader(StringIO.StringIO(expected.getvalue())))
+    streamed = self.stream_rows()
+    self.assertEqual(len(streamed), table.size + 1)
+    # The simulated points are random draws, so only the rest of each row has to match
+    sim_columns = [football.stream_headers.index(header) for header in football.sim_headers]
+    for streamed_row, expected_row in zip(streamed, expected):
+      self.assertEqual([value for col, value in enumerate(streamed_row) if col not in sim_columns],
+                       [value for col, value in enumerate(expected_row) if col not in sim_columns])
+    for row in range(table.size):
+      if table.weeks[row] is None or not len(table.weeks[row]):
+        self.assertEqual([float(streamed[row + 1][col]) for col in sim_columns], [0.0] * len(sim_columns))
+
+if __name__ == "__main__":
+  unittest.main()
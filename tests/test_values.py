@@ -0,0 +1,76 @@
+# Tests for value over replacement, ADP gaps and tiers
+import unittest
+import numpy as np
+from football_fixtures import FootballTestCase, football
+
+class ValueTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    football.league_settings = {"roster": {"teams": 2, "starters": {"QB": 1, "RB": 2, "WR": 1, "TE": 1, "K": 0, "DEF": 0},
+                                           "flex": 1, "flex_positions": ["RB", "WR", "TE"], "season_weeks": 10},
+                                "tiers": {"QB": 2, "RB": 3, "WR": 2, "TE": 2, "K": 2, "DEF": 2}}
+
+  def make_table(self, players):
+    table = football.PlayerTable()
+    for name, pos, avg_pick, points in players:
+      row = table.add_player(name, "SF", pos, avg_pick, 1.0)
+      table.column("points", (3,))[row] = [points, points, 0.0]
+    return table
+
+  def test_flex_spots_go_to_the_best_leftover_players(self):
+    points = np.array([20.0, 18.0, 16.0, 15.0, 14.0, 13.0, 12.0, 11.0, 30.0, 9.0])
+    pos_num = np.array([football.positions.index(pos) for pos in ["RB"] * 6 + ["WR"] * 2 + ["TE"] * 2])
+    slots = np.array([4, 2, 1, 0, 0, 0])
+    # The leftover RBs (13) beat the leftover WR (none) and TE (9), so both flex spots go to RBs
+    levels = football.Replacement_Levels(points, pos_num, np.ones(10, dtype=bool), slots, 2, ["RB", "WR", "TE"])
+    self.assertEqual(levels.tolist(), [13.0, 11.0, 9.0, 0.0, 0.0, 0.0])
+    # Without the best RB there's one RB left over, so the second flex spot goes to the TE
+    available = np.arange(10) != 0
+    levels = football.Replacement_Levels(points, pos_num, available, slots, 2, ["RB", "WR", "TE"])
+    self.assertEqual(levels.tolist(), [13.0, 11.0, 9.0, 0.0, 0.0, 0.0])
+    # With no RBs left over the replacement RB is the last starter
+    levels = football.Replacement_Levels(points, pos_num, available & (np.arange(10) != 5), slots, 2, ["RB", "WR", "TE"])
+    self.assertEqual(levels.tolist(), [14.0, 11.0, 9.0, 0.0, 0.0, 0.0])
+
+  def test_vor_and_adp_gap(self):
+    table = self.make_table([("RB1", "RB", 1.0, 20.0), ("RB2", "RB", 2.0, 15.0), ("RB3", "RB", 3.0, 12.0),
+                             ("RB4", "RB", 4.0, 10.0), ("RB5", "RB", 5.0, 9.0), ("RB6", "RB", 6.0, 5.0),
+                             ("WR1", "WR", 7.0, 18.0), ("WR2", "WR", 8.0, 11.0), ("WR3", "WR", 9.0, 8.0),
+                             ("QB1", "QB", 10.0, 25.0), ("QB2", "QB", 11.0, 22.0), ("QB3", "QB", 12.0, 17.0)])
+    # 4 RB and 2 WR starters, then the 2 flex spots go to RB5 (9) and WR3 (8)
+    vor, gap, tiers = football.Player_Values(table)
+    self.assertEqual(np.round(vor, 6).tolist(), [150.0, 100.0, 70.0, 50.0, 40.0, 0.0, 100.0, 30.0, 0.0, 80.0, 50.0, 0.0])
+    self.assertEqual(gap.tolist(), [0, 0, -2, -2, -3, -4, 4, -1, -2, 6, 4, 0])
+
+  def test_drafted_players_fill_starting_spots(self):
+    table = self.make_table([("RB1", "RB", 1.0, 20.0), ("RB2", "RB", 2.0, 15.0), ("RB3", "RB", 3.0, 12.0),
+                             ("RB4", "RB", 4.0, 10.0), ("QB1", "QB", 5.0, 25.0), ("QB2", "QB", 6.0, 22.0), ("QB3", "QB", 7.0, 17.0)])
+    available = np.array([False, True, True, True, False, True, True])
+    drafted_counts = np.array([1, 0, 0, 1, 0, 0])
+    vor, gap, tiers = football.Player_Values(table, available, drafted_counts)
+    # 3 RB starting spots and both flex spots left for 3 RBs, so the last one is the replacement;
+    # one QB spot is left, so QB3 is the replacement
+    self.assertEqual(np.round(vor, 6).tolist(), [0.0, 50.0, 20.0, 0.0, 0.0, 50.0, 0.0])
+    self.assertEqual(gap.tolist(), [0, 0, -1, -1, 0, 2, 0])
+    self.assertEqual(tiers[~available].tolist(), [0, 0])
+
+  def test_tiers_are_contiguous_from_one(self):
+    rng = np.random.RandomState(8)
+    values = np.concatenate([rng.normal(center, 1.0, 10) for center in [50.0, 30.0, 10.0]] + [rng.normal(40.0, 5.0, 15)])
+    pos_num = np.array([football.positions.index("RB")] * 30 + [football.positions.index("WR")] * 15)
+    available = np.ones(45, dtype=bool)
+    available[[3, 33]] = False
+    tiers = football.Tier_Players(values, pos_num, available, {"RB": 3, "WR": 6})
+    self.assertEqual(tiers[~available].tolist(), [0, 0])
+    self.assertEqual(tiers[:10][available[:10]].tolist(), [1] * 9)
+    self.assertEqual(tiers[10:30].tolist(), [2] * 10 + [3] * 10)
+    for pos_spot in [football.positions.index("RB"), football.positions.index("WR")]:
+      members = available & (pos_num == pos_spot)
+      used = np.unique(tiers[members])
+      self.assertEqual(used.tolist(), range(1, len(used) + 1))
+      # Better players never land in a worse tier
+      order = np.argsort(-values[members])
+      self.assertTrue((np.diff(tiers[members][order]) >= 0).all())
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,81 @@
+# Tests for the in-season weekly update: running stats, refreshes and projections
+import unittest
+import numpy as np
+from football_fixtures import FootballTestCase, Gamelog_Page, football
+
+# A week of RB stats for the gamelog fixtures
+def Rb_Week(week, rush_att, rush_yds, rec=2, rec_yds=15, rush_td=0):
+  return {"week_num": week, "rush_att": rush_att, "rush_yds": rush_yds, "rec": rec, "rec_yds": rec_yds, "rush_td": rush_td}
+
+class WelfordTest(unittest.TestCase):
+  def test_matches_numpy_with_missing_stats(self):
+    rng = np.random.RandomState(4)
+    weeks = rng.normal(10.0, 4.0, (12, 3, 2))
+    weeks[rng.rand(12, 3, 2) < 0.3] = np.nan
+    count = np.zeros((3, 2))
+    mean = np.zeros((3, 2))
+    m2 = np.zeros((3, 2))
+    for week in weeks:
+      count, mean, m2 = football.Welford_Update(count, mean, m2, week)
+    self.assertEqual(count.tolist(), (~np.isnan(weeks)).sum(axis=0).tolist())
+    self.assertTrue(np.allclose(mean, np.nanmean(weeks, axis=0)))
+    self.assertTrue(np.allclose(m2 / count, np.nanvar(weeks, axis=0)))
+
+class WeeklyUpdateTest(FootballTestCase):
+  def setUp(self):
+    FootballTestCase.setUp(self)
+    self.table = football.PlayerTable()
+    self.row = self.table.add_player("First Last", "SF", "RB", 1.0, 1.0)
+    self.table.pfr_href[self.row] = "/players/L/LastFi00"
+    self.url = football.Gamelog_Url("/players/L/LastFi00", football.curr_year)
+    self.serve()
+
+  def refresh(self, weeks, footer=None):
+    self.write_page(self.url, Gamelog_Page(weeks, footer))
+    football.Weekly_Update(self.table)
+
+  def check_stats(self, weeks):
+    for label in football.rb_stat_labels:
+      values = np.array([week[label] for week in weeks], dtype=float)
+      self.assertEqual(self.table.column(label + "_wk_count")[self.row], len(values))
+      self.assertAlmostEqual(self.table.column(label + "_wk_mean")[self.row], values.mean())
+      self.assertAlmostEqual(self.table.column(label + "_wk_m2")[self.row] / len(values), values.var())
+    self.assertEqual(len(self.table.current_weeks[self.row]), len(weeks))
+
+  def test_refresh_after_a_new_week(self):
+    weeks = [Rb_Week(1, 15, 60), Rb_Week(2, 20, 95, rush_td=1), Rb_Week(3, 9, 30)]
+    self.refresh(weeks, footer=Rb_Week("", 44, 185, 6, 45, 1))
+    self.check_stats(weeks)
+    weeks.append(Rb_Week(4, 18, 77, rush_td=2))
+    self.refresh(weeks, footer=Rb_Week("", 62, 262, 8, 60, 3))
+    self.check_stats(weeks)
+    # Nothing new, nothing folded in again
+    self.refresh(weeks)
+    self.check_stats(weeks)
+
+  def test_rows_inserted_or_moved_on_the_page(self):
+    first, second, third, fourth = Rb_Week(1, 15, 60), Rb_Week(2, 20, 95), Rb_Week(3, 9, 30), Rb_Week(4, 18, 77)
+    # A postponed week 2 shows up after weeks 1 and 3 were already stored
+    self.refresh([first, third])
+    self.check_stats([first, third])
+    self.refresh([first, second, third, fourth])
+    self.check_stats([first, second, third, fourth])
+    self.refresh([fourth, third, second, first])
+    self.check_stats([first, second, third, fourth])
+
+  def test_projection_weights_recent_weeks(self):
+    settings = football.Load_League_Settings()
+    weights, no_td_weights = football.Score_Weights(football.rb_stat_labels, settings)
+    self.table.weeks[self.row] = np.ones((16, len(football.rb_stat_labels)))
+    self.table.column("points", (3,))[self.row] = [12.0, 10.0, 4.0]
+    weeks = [Rb_Week(1, 15, 60), Rb_Week(2, 20, 95, rush_td=1), Rb_Week(3, 9, 30)]
+    self.refresh(weeks)
+    points = np.array([np.dot([week[label] for label in football.rb_stat_labels], weights) for week in weeks])
+    decay = settings["weekly"]["recency_decay"] ** np.arange(len(points))[::-1]
+    prior = settings["weekly"]["prior_weight"]
+    expected = (prior * 12.0 + np.dot(decay, points)) / (prior + decay.sum())
+    self.assertAlmostEqual(self.table.column("projection")[self.row], round(expected, 2))
+    self.assertAlmostEqual(self.table.column("last_points")[self.row], points[-1])
+
+if __name__ == "__main__":
+  unittest.main()